@@ -1,16 +1,19 @@
+import time
+T_INICIO = time.perf_counter()
 import streamlit as st
-import pandas as pd
-from datetime import datetime, date
+from collections import deque
+from datetime import date
+import logging
 import re
-import io
 import os
-import json
-import unicodedata
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
-from email.mime.application import MIMEApplication
-from supabase import create_client, Client
+from comun import LISTAS, TAM_LOTE, limpiar_texto, get_primer_dia_mes, unir_ubicaciones
+from bd import usuarios_registrados, envios_en_curso
+from ingreso import leer_libros, validar_usuarios, notificar_ingreso, guardar_ingreso, ADJUNTO_POLITICA
+from geo import cargar_indice
+import trazas
+# pandas (tabla, validacion, duplicados, masivo), supabase, correo y plantilla se importan al primer uso:
+# el primer pintado solo necesita comun/geo/bd.
+T_IMPORTS = time.perf_counter()
 
 # --- CONFIGURACIÓN ---
 st.set_page_config(
@@ -21,57 +24,50 @@ st.set_page_config(
 )
 
 # --- GESTIÓN DE SECRETOS ---
+def si_no(v):
+    """Booleano de secrets.toml; acepta también texto ("false", "no", "0" -> False)."""
+    return v.strip().lower() in ("1", "true", "si", "sí", "yes", "on") if isinstance(v, str) else bool(v)
+
 try:
     SUPABASE_URL = st.secrets["SUPABASE_URL"]
     SUPABASE_KEY = st.secrets["SUPABASE_KEY"]
     GMAIL_USER = st.secrets.get("GMAIL_USER", "")
     GMAIL_PASSWORD = st.secrets.get("GMAIL_PASSWORD", "")
     EMAIL_DESTINO_INTERNO = st.secrets.get("EMAIL_DESTINO_INTERNO", GMAIL_USER)
+    OPTIMIZAR_ADJUNTOS = si_no(st.secrets.get("OPTIMIZAR_ADJUNTOS", False))  # recomprime la imagen adjunta (Pillow)
+    AUTOGUARDADO_SEG = int(st.secrets.get("AUTOGUARDADO_SEG", 0))  # 0 = sin autoguardado en disco
 except:
-    SUPABASE_URL = ""; SUPABASE_KEY = ""; GMAIL_USER = ""; GMAIL_PASSWORD = ""; EMAIL_DESTINO_INTERNO = ""
+    SUPABASE_URL = ""; SUPABASE_KEY = ""; GMAIL_USER = ""; GMAIL_PASSWORD = ""; EMAIL_DESTINO_INTERNO = ""; OPTIMIZAR_ADJUNTOS = False; AUTOGUARDADO_SEG = 0
 
-try:
-    if SUPABASE_URL and SUPABASE_KEY:
-        supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
-    else: supabase = None
-except: supabase = None
+@st.cache_resource
+def cliente_supabase():
+    """Un cliente por proceso (antes se creaba en cada rerun)."""
+    if not (SUPABASE_URL and SUPABASE_KEY): return None
+    try:
+        from supabase import create_client
+        return create_client(SUPABASE_URL, SUPABASE_KEY)
+    except: return None
+
+LIMITE_LOTES_MB = 2
+PAGINA = 1000
+CACHE_CLIENTES_SEG, CACHE_CLIENTES_MAX = 600, 512
 
 # --- CARGAR DATOS COLOMBIA ---
-@st.cache_data
+@st.cache_resource
 def cargar_datos_colombia():
-    archivo = "ciudades.csv"
-    bkp = {"BOGOTA D.C.": ["BOGOTA D.C."], "ANTIOQUIA": ["MEDELLIN"]}
-    if not os.path.exists(archivo): return bkp
-    try:
-        try: df = pd.read_csv(archivo, sep=";", encoding='utf-8')
-        except: df = pd.read_csv(archivo, sep=";", encoding='latin-1')
-        cols = {'Nombre Departamento', 'Nombre Municipio'}
-        if not cols.issubset(df.columns): return bkp
-        df = df.apply(lambda x: x.astype(str).str.upper())
-        return {k: sorted(g['Nombre Municipio'].tolist()) for k, g in df.groupby('Nombre Departamento')}
-    except: return bkp
-
-COLOMBIA_DATA = cargar_datos_colombia()
-DEPARTAMENTOS = sorted(list(COLOMBIA_DATA.keys()))
-
-# --- LISTAS MAESTRAS ---
-LISTAS = {
-    "TIPO_DOC": ["CC", "CE", "TI", "PA (PASAPORTE)", "PEP", "PPT"],
-    "NIVEL_EDUCATIVO": ["PRIMARIA", "SECUNDARIA", "TECNICO", "TECNOLOGO", "PROFESIONAL", "ESPECIALISTA", "MAGISTER", "DOCTORADO"],
-    "TITULO": ["MIEMBROS FUERZAS MILITARES, POLICIA", "DIRECTORES, GERENTES Y PERSONAL ADMINISTRATIVO", "FISICOS", "FISICOS MEDICOS", "MEDICOS GENERALES", "MEDICOS ESPECIALISTAS", "MEDICOS NUCLEARES", "MEDICOS RADIONCOLOGOS", "MEDICOS RADIOLOGOS", "TECNICOS Y TECNOLOGOS EN IMAGENES DIAGNOSTICAS", "TECNICOS EN TECNOLOGOS EN RADIOTERAPIA", "TECNICOS Y TECNOLOGOS EN MEDICINA NUCLEAR", "OTROS TECNICOS Y TECNOLOGOS EN SALUD", "ODONTOLOGOS", "PROFESIONALES DE ENFERMERIA", "TECNICOS Y PROFESIONALES DEL NIVEL MEDIO DE ENFERMERIA", "PARAMEDICOS E INSTRUMENTADORES QUIRURGICOS", "OTROS PROFESIONALES DE LA SALUD", "VETERINARIOS", "TECNICOS Y ASISTENTES VETERINARIOS", "PROFESIONALES DE LA INGENIERIA", "QUIMICOS Y QUIMICOS FARMACEUTICOS", "PROFESIONALES DE LAS CIENCIAS NATURALES", "PROFESIONALES DE LA PROTECCION MEDIOAMBIENTAL", "DOCENTES E INVESTIGADORES", "TECNICOS Y TECNOLOGOS EN CIENCIAS NATURALES E INGENIERIA", "TECNICOS Y CONTROLADORES EN NAVEGACION MARITIMA Y AERONAUTICA", "FUNCIONARIOS E INSPECTORES GUBERNAMENTALES", "EMPLEADOS TRANSPORTE MATERIAL RADIACTIVO", "BOMBEROS", "MINEROS", "OBREROS MINAS", "OPERADORES PORTUARIOS", "OTROS TRABAJADORES INDUSTRIALES", "OTROS TRABAJADORES NIVEL TECNICO"],
-    "OCUPACION": ["MEDICO RADIOLOGO" ,"MEDICO CARDIOLOGO", "MEDICO ONCOLOGO", "MEDICO NUCLEAR", "MEDICO CIRUJANO", "MEDICO HEMODINAMISTA", "NEUROCIRUJANO", "CIRUJANO VASCULAR", "RESIDENTE", "ORTOPEDISTA", "ANESTESIOLOGO", "INSTRUMENTADOR QUIRURGICO", "JEFE ENFERMERIA", "AUX. ENFERMERIA", "TEC. EN IMAGENES", "TRANCRIPTOR", "ODONTOLOGO", "PERIODONCISTA", "ENDODONCISTA", "AUX. ODONTOLOGIA", "HIGIENE ORAL", "ING. BIOMEDICO", "FISICO MEDICO", "DOCENCIA", "INVESTIGACION", "OTRO"],
-    "AREA": ["RADIOLOGIA", "HEMODINAMIA", "CIRUGIA", "ODONTOLOGIA", "MEDICINA NUCLEAR", "RADIOTERAPIA", "VETERINARIA", "INDUSTRIA EQUIPOS", "INDUSTRIA FUENTES", "OTRO"],
-    "COBERTURA": ["ARL","PARTICULAR"],
-    "TECNOLOGIA": ["TLD", "OSL", "DIS"],
-    "UBICACION_CORPO": ["TORAX (CUERPO ENTERO)", "CRISTALINO", "ANILLO", "FETAL", "ZONA CONTROLADA", "ZONA SUPERVISADA"],
-    "PERIODICIDAD": ["MENSUAL", "BIMENSUAL", "TRIMESTRAL"],
-    "GENERO": ["FEMENINO", "MASCULINO", "OTRO"],
-    "MESES": ["ENERO", "FEBRERO", "MARZO", "ABRIL", "MAYO", "JUNIO", "JULIO", "AGOSTO", "SEPTIEMBRE", "OCTUBRE", "NOVIEMBRE", "DICIEMBRE"]
-}
+    """Índice DANE compartido por todas las sesiones del proceso (ver geo.py)."""
+    return cargar_indice("ciudades.csv")
+
+GEO = cargar_datos_colombia()
+DEPARTAMENTOS = GEO.departamentos
+
+# Índices de los selectbox Depto/Muni (listas con "OTRO" al final), tolerando tildes y variantes
+def posicion_depto(vd): return len(DEPARTAMENTOS) if vd == "OTRO" else GEO.posicion_departamento(vd)
+def posicion_muni(dp, vm): return len(GEO.municipios(dp)) if vm == "OTRO" else GEO.posicion_municipio(dp, vm)
 
 # --- ESTILOS CSS ---
-def inyectar_estilos():
-    st.markdown("""
+@st.cache_resource
+def estilos(): return """
         <style>
         @import url('https://fonts.googleapis.com/css2?family=Inter:wght@300;400;500;700&display=swap');
         :root { --primary: #002060; --secondary: #58207C; --bg-page: #f4f7f9; --bg-card: #ffffff; --text-main: #2c3e50; }
@@ -91,283 +87,289 @@ def inyectar_estilos():
         header[data-testid="stHeader"] { display: none; }
         .block-container { padding-top: 1rem; max-width: 98%; }
         </style>
-        <link rel="stylesheet" href="https://cdnjs.cloudflare.com/ajax/libs/font-awesome/6.5.1/css/all.min.css" />
-    """, unsafe_allow_html=True)
-inyectar_estilos()
+    """
+
+@st.cache_resource
+def logo(ruta="logo.png"):
+    if not os.path.exists(ruta): return None
+    with open(ruta, "rb") as f: return f.read()
+
+st.markdown(estilos(), unsafe_allow_html=True)
+
+# --- TIEMPOS ---
+# Marcas de cada rerun (ms desde T_INICIO): imports, primer pintado (encabezado y badges) y total.
+# El primer rerun del proceso queda como "arranque"; el primero de cada sesión como "sesion". Se ven en ⚙️ y van al log.
+# Las fases (Excel, validación, BD, SMTP) dejan tramos en trazas.py; el panel 🩺 de ⚙️ los resume.
+log = logging.getLogger("sievert.app")
+
+@st.cache_resource
+def configurar_log():
+    """Los loggers sievert.* (rerun y tramos en JSON) salen por stderr una sola vez por proceso."""
+    raiz = logging.getLogger("sievert")
+    if not raiz.handlers:
+        h = logging.StreamHandler(); h.setFormatter(logging.Formatter("%(asctime)s %(name)s %(levelname)s %(message)s"))
+        raiz.addHandler(h); raiz.setLevel(logging.INFO); raiz.propagate = False
+    return raiz
+
+configurar_log()
+
+@st.cache_resource
+def tiempos_proceso(): return {"arranque": None}
+
+def registrar_tiempos(**marcas):
+    t = {k: round((v - T_INICIO) * 1000, 1) for k, v in marcas.items()}
+    proc = tiempos_proceso()
+    if proc["arranque"] is None: proc["arranque"] = t
+    if "tiempos" not in st.session_state: st.session_state.tiempos = {"sesion": t, "reruns": deque(maxlen=50)}
+    st.session_state.tiempos["reruns"].append(t)
+    trazas.registrar("rerun", t["total"], **{k: v for k, v in t.items() if k != "total"})
+
+def resumen_tiempos():
+    proc, ses = tiempos_proceso()["arranque"], st.session_state.get("tiempos")
+    if not proc or not ses: return "⏱️ Sin mediciones aún."
+    tot = sorted(t["total"] for t in ses["reruns"])
+    return (f"⏱️ Arranque proceso: {proc['total']:.0f} ms (pintado {proc['pintado']:.0f}) · "
+            f"inicio sesión: {ses['sesion']['total']:.0f} ms · rerun p50 {tot[len(tot) // 2]:.0f} / máx {tot[-1]:.0f} ms ({len(tot)})")
+
+def panel_diagnostico():
+    """Resumen por fase de esta sesión y de todo el proceso (últimos trazas.MAX_TRAZAS tramos)."""
+    propias = [t for t in trazas.trazas(st.session_state.sesion_id) if t["fase"] != "rerun"]
+    st.markdown("**Esta sesión**")
+    if propias: st.dataframe(trazas.resumen(propias), hide_index=True)
+    else: st.caption("Sin tramos aún (cargue un Excel o envíe).")
+    st.markdown("**Proceso** (incluye los envíos SMTP de la bandeja)"); st.dataframe(trazas.resumen(trazas.trazas()), hide_index=True)
+    if propias:
+        st.markdown("**Últimos tramos**")
+        st.dataframe([{k: v for k, v in t.items() if k not in ("sesion", "ts")} for t in reversed(propias[-30:])], hide_index=True)
 
 # --- ESTADO ---
 if 'cliente' not in st.session_state: st.session_state.cliente = {"razon_social": "", "nit": "", "responsable": "", "cargo": "", "email": "", "telefono": "", "direccion": "", "municipio": "", "departamento": ""}
 if 'sedes' not in st.session_state: st.session_state.sedes = []
-if 'usuarios' not in st.session_state: st.session_state.usuarios = []
+if 'usuarios' not in st.session_state: st.session_state.usuarios = None  # DataFrame desde el primer registro
+if 'ed_ver' not in st.session_state: st.session_state.ed_ver = 0; st.session_state.ed_ini = 0
 if 'last_sede' not in st.session_state: st.session_state.last_sede = None
 if 'last_area' not in st.session_state: st.session_state.last_area = None
+if 'sesion_id' not in st.session_state: st.session_state.sesion_id = os.urandom(4).hex()
+trazas.SESION.set(st.session_state.sesion_id)  # los tramos de este rerun (y de sus hilos) quedan con la sesión
 
 # --- FUNCIONES ---
-def limpiar_texto(texto):
-    if pd.isna(texto) or texto is None: return ""
-    texto = str(texto).strip().upper()
-    return ''.join(c for c in unicodedata.normalize('NFD', texto) if unicodedata.category(c) != 'Mn')
-
-def validar_email(email):
-    return re.match(r"^[\w\.-]+@[\w\.-]+\.\w+$", str(email)) is not None
-
-def get_primer_dia_mes(mes_nombre, anio):
-    try: return date(anio, LISTAS["MESES"].index(mes_nombre.upper()) + 1, 1)
-    except: return date.today().replace(day=1)
-
 def verificar_estado_general():
     cli = st.session_state.cliente
     cli_ok = True if cli["razon_social"] else False
     sed_ok = len(st.session_state.sedes) > 0
     return cli_ok, sed_ok
 
+# --- TABLA DE USUARIOS ---
+# st.session_state.usuarios es la tabla base (DataFrame). Mientras se edita, los cambios viven en el
+# delta del st.data_editor y se aplican bajo demanda; la base solo se reescribe al consolidar.
+# Es None hasta el primer registro, así una sesión nueva no importa pandas.
+def clave_editor(): return f"ed_{st.session_state.ed_ver}"
+def hay_tabla(): return st.session_state.usuarios is not None
+
+def usuarios_actuales():
+    """Base + delta del editor. Aplicar el delta copia la tabla: el resultado se memoriza por (base, versión,
+    página, delta), así las varias llamadas de un rerun (contadores, validación, borrador) hacen una sola copia."""
+    import json
+    from tabla import tabla_vacia, aplicar_cambios
+    if not hay_tabla(): st.session_state.usuarios = tabla_vacia()
+    base, cambios = st.session_state.usuarios, st.session_state.get(clave_editor())
+    if not cambios or not any(cambios.values()): return base
+    clave = (st.session_state.ed_ver, st.session_state.ed_ini, json.dumps(cambios, sort_keys=True, default=str))
+    memo = st.session_state.get("memo_usuarios")
+    if memo and memo[0] is base and memo[1] == clave: return memo[2]
+    df = aplicar_cambios(base, cambios, st.session_state.ed_ini)
+    st.session_state.memo_usuarios = (base, clave, df)
+    return df
+
+def n_registros():
+    if not hay_tabla(): return 0
+    from tabla import n_asignaciones
+    return n_asignaciones(usuarios_actuales())
+
+def consolidar():
+    """Pasa el delta del editor a la base. Sin delta no hace nada: cambiar ed_ver remonta el editor (scroll, celda en edición)."""
+    cambios, d = st.session_state.get(clave_editor()), st.session_state.get("diario")
+    if not cambios or not any(cambios.values()): return
+    st.session_state.usuarios = usuarios_actuales(); st.session_state.pop("memo_usuarios", None)  # no retener la base anterior
+    if d: d.anotar("delta", ver=st.session_state.ed_ver, inicio=st.session_state.ed_ini, cambios=cambios)
+    st.session_state.ed_ver += 1
+
+def indice_duplicados():
+    """Índice de duplicados al día con la tabla y con lo ya guardado para el NIT (una consulta por NIT)."""
+    from duplicados import IndiceDuplicados
+    if 'duplicados' not in st.session_state: st.session_state.duplicados = IndiceDuplicados()
+    consolidar(); idx = st.session_state.duplicados.sincronizar(usuarios_actuales())  # sin delta: la base misma
+    nit, sb = st.session_state.cliente.get("nit"), cliente_supabase()
+    if sb and nit:
+        try: idx.cargar_bd(nit, lambda: usuarios_registrados(sb, nit, envios_en_curso(nit)))
+        except Exception as e:  # sin consulta a BD se revisa solo la tabla
+            log.warning("duplicados: no se pudo consultar la BD para %s: %s", nit, e); st.toast("⚠️ Sin conexión a la BD: los duplicados se revisaron solo en la tabla.")
+    return idx
+
+def agregar_usuarios(registros, filtrado=False):
+    """Agrega a la tabla sin duplicados; retorna los avisos. filtrado: ya pasó por IndiceDuplicados.filtrar."""
+    from tabla import agregar
+    idx, avisos = indice_duplicados(), []
+    if not filtrado: registros, avisos = idx.filtrar(registros)
+    st.session_state.usuarios = idx.tabla = agregar(st.session_state.usuarios, registros)
+    d = st.session_state.get("diario")
+    if d and d.con_base and len(registros):
+        from tabla import a_tabla, a_columnas
+        d.anotar("agregar", usuarios=a_columnas(a_tabla(registros)))
+    return avisos
+
+def reporte_paginado(rep):
+    """Con el editor paginado (y sin índice visible) 'Fila N' no se ubica a simple vista: se agrega Página y Fila en página."""
+    if len(st.session_state.usuarios) <= PAGINA: return rep
+    rep = rep.copy(); i = rep.columns.get_loc("Fila") + 1
+    rep.insert(i, "Página", (rep["Fila"] - 1) // PAGINA + 1); rep.insert(i + 1, "Fila en página", (rep["Fila"] - 1) % PAGINA + 1)
+    return rep
+
 def validar_tabla_usuarios_estricta():
-    usuarios = st.session_state.usuarios
-    if not usuarios: return False, "⚠️ Tabla vacía."
-    for i, u in enumerate(usuarios):
-        f = i + 1
-        for k in ["Nombres", "Apellidos", "Documento", "Correo", "Sede", "Ubicaciones"]:
-            if not u.get(k) or str(u.get(k)).strip() == "": return False, f"⛔ Fila {f}: Falta '{k}'."
-        if not validar_email(u.get("Correo")): return False, f"⛔ Fila {f}: Email inválido."
-        if u.get("Area") == "OTRO" and not u.get("Otra Area"): return False, f"⛔ Fila {f}: Falta 'Otra Area'."
-    return True, "OK"
+    if not hay_tabla(): return False, "⚠️ Tabla vacía."
+    from validacion import ValidadorUsuarios
+    usuarios = usuarios_actuales()
+    if not len(usuarios): return False, "⚠️ Tabla vacía."
+    if 'validador' not in st.session_state: st.session_state.validador = ValidadorUsuarios()
+    ok, msg, st.session_state.reporte_validacion = validar_usuarios(usuarios, st.session_state.validador, indice_duplicados())
+    return ok, msg
+
+# --- CLIENTES YA REGISTRADOS ---
+# Al escribir el NIT se busca el cliente y todas sus sedes en una consulta (bd.buscar_cliente). El resultado se
+# comparte entre sesiones (TTL y tope de entradas) y se invalida al guardar ese NIT; al guardar se reutilizan sus ids.
+@st.cache_data(ttl=CACHE_CLIENTES_SEG, max_entries=CACHE_CLIENTES_MAX, show_spinner=False)
+def cliente_existente(nit):
+    from bd import buscar_cliente
+    sb = cliente_supabase()
+    return buscar_cliente(sb, nit) if sb else None
+
+def soltar_ubicacion():
+    """Los selectbox Depto/Muni guardan su propio valor: sin esto, tras reemplazar el cliente volverían a escribir el anterior."""
+    for k in ("cd", "cm"): st.session_state.pop(k, None)
+
+def usar_existente(nit, ex):
+    """Carga cliente y sedes registrados; las sedes ya escritas en la sesión se conservan."""
+    nombres = {s["nombre"] for s in st.session_state.sedes}
+    st.session_state.cliente = dict(ex["cliente"]); soltar_ubicacion()
+    st.session_state.sedes = [s for s in ex["sedes"] if s["nombre"] not in nombres] + st.session_state.sedes
+    st.session_state.existente = {"nit": nit, "id": ex["id"], "ids_sedes": ex["ids_sedes"]}
+
+def existente_actual():
+    ex = st.session_state.get("existente")
+    return ex if ex and ex["nit"] == st.session_state.cliente["nit"].strip() else None
+
+def ofrecer_existente():
+    nit = st.session_state.cliente["nit"].strip()
+    if not nit or existente_actual() or st.session_state.get("existente_visto") == nit: return
+    try: ex = cliente_existente(nit)
+    except Exception as e: log.warning("cliente existente: no se pudo consultar la BD para %s: %s", nit, e); return  # sin consulta a BD se sigue como cliente nuevo
+    if not ex: return
+    cli = st.session_state.cliente
+    if not st.session_state.sedes and not any(v for k, v in cli.items() if k not in ("nit", "departamento", "municipio")):
+        usar_existente(nit, ex); st.toast(f"Cliente registrado: {len(ex['sedes'])} sedes cargadas"); st.rerun()
+    c_i, c_r, c_d = st.columns([4,1,1]); c_i.info(f"🔁 NIT ya registrado: {ex['cliente']['razon_social']} ({len(ex['sedes'])} sedes).")
+    if c_r.button("Cargar", use_container_width=True): usar_existente(nit, ex); st.rerun()
+    if c_d.button("Ignorar", use_container_width=True): st.session_state.existente_visto = nit; st.rerun()
 
 # --- 📧 GMAIL SMTP ---
-def enviar_correo_gmail(destinatario, asunto, cuerpo_html, archivos_adjuntos=[]):
-    """Retorna (Exito: bool, Mensaje: str)"""
-    if not GMAIL_USER or not GMAIL_PASSWORD: 
+@st.cache_resource
+def bandeja_proceso():
+    """Bandeja de salida única por proceso; su hilo envía en segundo plano."""
+    if not GMAIL_USER or not GMAIL_PASSWORD: return None
+    from correo import BandejaSalida
+    return BandejaSalida(GMAIL_USER, GMAIL_PASSWORD, optimizar_adjuntos=OPTIMIZAR_ADJUNTOS).precargar([ADJUNTO_POLITICA])
+
+def obtener_bandeja():
+    """La bandeja del proceso con su hilo vivo (iniciar() lo relanza solo si murió)."""
+    b = bandeja_proceso()
+    return b.iniciar() if b else None
+
+def enviar_correo_gmail(destinatario, asunto, cuerpo_html, archivos_adjuntos=[], referencia=""):
+    """Encola el correo. Retorna (Exito: bool, Mensaje: str)"""
+    bandeja = obtener_bandeja()
+    if not bandeja: 
         return False, "Faltan credenciales de Gmail en secrets.toml"
-    
-    msg = MIMEMultipart()
-    msg['From'] = f"Sievert Dosimetría <{GMAIL_USER}>"
-    msg['To'] = destinatario
-    msg['Subject'] = asunto
-    msg.attach(MIMEText(cuerpo_html, 'html'))
-
-    if archivos_adjuntos:
-        for nombre_archivo in archivos_adjuntos:
-            try:
-                if os.path.exists(nombre_archivo):
-                    with open(nombre_archivo, "rb") as f:
-                        part = MIMEApplication(f.read(), Name=nombre_archivo)
-                    part['Content-Disposition'] = f'attachment; filename="{nombre_archivo}"'
-                    msg.attach(part)
-                else: print(f"⚠️ Archivo no encontrado: {nombre_archivo}")
-            except Exception as e: print(f"Error adjuntando: {e}")
-
     try:
-        server = smtplib.SMTP_SSL('smtp.gmail.com', 465)
-        server.login(GMAIL_USER, GMAIL_PASSWORD)
-        server.sendmail(GMAIL_USER, destinatario, msg.as_string())
-        server.quit()
-        return True, "Enviado correctamente"
+        mid = bandeja.encolar(destinatario, asunto, cuerpo_html, archivos_adjuntos, referencia=referencia)
+        return True, f"En cola (#{mid})"
     except Exception as e:
-        return False, f"Error SMTP: {str(e)}"
+        return False, f"Error bandeja: {str(e)}"
 
-def procesar_notificaciones(cliente, n_sedes, n_usuarios):
-    fecha = datetime.now().strftime("%Y-%m-%d %H:%M")
-    errores = []
-    
-    # 1. Alerta Interna
-    html_interno = f"""
-    <div style="font-family: Arial; color: #333;">
-        <h2 style="color: #d9534f;">⚠️ ACCIÓN REQUERIDA: Creación nuevo cliente</h2>
-        <p>Pendiente de validación en plataforma.</p>
-        <ul>
-            <li><b>Cliente:</b> {cliente['razon_social']}</li>
-            <li><b>NIT:</b> {cliente['nit']}</li>
-            <li><b>Servicios:</b> {n_usuarios}</li>
-            <li><b>Sedes:</b> {n_sedes}</li>
-        </ul>
-    </div>
-    """
-    ok_int, msg_int = enviar_correo_gmail(EMAIL_DESTINO_INTERNO, f"🔔 Ingreso: {cliente['razon_social']}", html_interno)
-    if not ok_int: errores.append(f"Fallo correo interno: {msg_int}")
-
-    # 2. Bienvenida Cliente
-    if validar_email(cliente['email']):
-        # Limpieza de NIT para credenciales
-        nit_limpio = re.sub(r'\D', '', str(cliente['nit']))
-        
-        html_cliente = f"""
-        <div style="font-family: 'Helvetica Neue', Helvetica, Arial, sans-serif; color: #333; line-height: 1.6; max-width: 600px; margin: 0 auto; background-color: #ffffff;">
-            <div style="background-color: #002060; padding: 25px; text-align: center; border-radius: 8px 8px 0 0;">
-                <h1 style="color: white; margin: 0; font-size: 24px;">¡Bienvenido a Sievert S.A.S!</h1>
-                <p style="color: #e0e0e0; margin: 5px 0 0; font-size: 14px;">Expertos en Protección Radiológica</p>
-            </div>
-            
-            <div style="padding: 30px; border: 1px solid #e0e0e0; border-top: none;">
-                <p style="font-size: 16px;">Hola <b>{cliente['responsable']}</b>,</p>
-                <p>Es un gusto saludarte. Confirmamos que hemos recibido exitosamente la información de tu personal ({n_usuarios} usuarios) para el inicio del servicio.</p>
-
-                <div style="background-color: #f0f7ff; padding: 20px; border-radius: 8px; margin: 25px 0; border-left: 5px solid #002060;">
-                    <h3 style="color: #002060; margin-top: 0; font-size: 18px;">🔐 Tus Credenciales de Acceso</h3>
-                    <p style="margin-bottom: 15px;">Ya puedes ingresar a nuestra plataforma de gestión de dosimetría:</p>
-                    
-                    <div style="background-color: white; padding: 15px; border-radius: 6px; text-align: center; border: 1px solid #ddd;">
-                        <p style="margin: 5px; font-size: 15px;">👤 <b>Usuario:</b> <span style="font-family: monospace; font-size: 16px; color: #002060;">{nit_limpio}</span></p>
-                        <p style="margin: 5px; font-size: 15px;">🔑 <b>Contraseña:</b> <span style="font-family: monospace; font-size: 16px; color: #002060;">{nit_limpio}</span></p>
-                    </div>
-
-                    <div style="text-align: center; margin-top: 20px;">
-                        <a href="https://dosimetria.sievert.com.co/" style="background-color: #002060; color: white; padding: 12px 30px; text-decoration: none; border-radius: 50px; font-weight: bold; display: inline-block; font-size: 14px;">Ingresar al Software</a>
-                    </div>
-                </div>
-
-                <div style="background-color: #fff3cd; padding: 20px; border-radius: 8px; margin: 25px 0; border-left: 5px solid #ffc107;">
-                    <h3 style="color: #856404; margin-top: 0; font-size: 18px;">☢️ El Dosímetro de Control es Vital</h3>
-                    <p style="font-size: 14px; color: #856404; margin-bottom: 10px;">
-                        Con el envío de los dosímetros personales, recibirás un <b>Dosímetro de Control</b>. Este permite registrar la dosis no ocupacional (transporte y almacenamiento) y es indispensable para el análisis correcto.
-                    </p>
-                    <ul style="font-size: 14px; color: #856404; padding-left: 20px;">
-                        <li>📍 <b>Ubicación:</b> Guárdalo lejos del equipo de Rayos X (fuera de la sala).</li>
-                        <li>📦 <b>Devolución:</b> Envíalo de regreso junto con los dosímetros personales de cada periodo.</li>
-                        <li>🚫 <b>Uso:</b> NUNCA lo asignes a una persona.</li>
-                    </ul>
-                </div>
-
-                <div style="margin-top: 30px; padding-top: 20px; border-top: 1px solid #eee;">
-                    <h4 style="color: #002060; margin: 0 0 10px 0;">📋 Política de Devolución y Pérdida</h4>
-                    <p style="font-size: 13px; color: #666; line-height: 1.5;">
-                        La devolución oportuna de los dosímetros es necesaria para el cumplimiento normativo. Recuerda que la pérdida, daño o no devolución de los equipos genera costos de reposición. Te invitamos a revisar la <b>Política de Cartera</b> adjunta (Imagen) para más detalles.
-                    </p>
-                </div>
-                
-                <p style="margin-top: 30px; font-size: 14px; color: #555;">
-                    Cualquier inquietud técnica, estoy a tu disposición:<br>
-                    <b>Diego Orjuela</b> - Coordinador Técnico<br>
-                    <a href="mailto:diego@sievert.com.co" style="color: #002060;">diego@sievert.com.co</a> | +57 318 3731885
-                </p>
-            </div>
-            
-            <div style="background-color: #f8f9fa; padding: 15px; text-align: center; font-size: 11px; color: #999; border-radius: 0 0 8px 8px;">
-                <p>Sievert S.A.S - Protección Radiológica<br>Medellín, Colombia | <a href="https://www.sievert.com.co" style="color: #999;">www.sievert.com.co</a></p>
-            </div>
-        </div>
-        """
-        
-        ok_cli, msg_cli = enviar_correo_gmail(
-            cliente['email'], 
-            "✨ Bienvenida al servicio de dosimetría - Sievert S.A.S", 
-            html_cliente,
-            archivos_adjuntos=["Política_Cartera.jpg"]
-        )
-        if not ok_cli: errores.append(f"Fallo correo cliente: {msg_cli}")
-    
-    return errores
+def procesar_notificaciones(cliente, n_sedes, n_usuarios, sedes=None, usuarios=None):
+    return notificar_ingreso(cliente, n_sedes, n_usuarios, enviar_correo_gmail, EMAIL_DESTINO_INTERNO, [ADJUNTO_POLITICA], sedes=sedes, usuarios=usuarios)
 
 # --- GUARDADO BD ---
 def guardar_en_base_datos(cliente, sedes, usuarios):
-    if not supabase: return False, "Sin conexión a BD."
-    try:
-        # Guardar Cliente
-        data_cli = {
-            "razon_social": cliente["razon_social"], "nit": cliente["nit"],
-            "email": cliente["email"], "telefono": cliente["telefono"],
-            "responsable": cliente["responsable"], "cargo_responsable": cliente["cargo"],
-            "direccion": cliente["direccion"], "departamento": cliente["departamento"],
-            "municipio": cliente["municipio"]
-        }
-        res_cli = supabase.table("clientes").insert(data_cli).execute()
-        cid = res_cli.data[0]['id']
-
-        # Guardar Sedes
-        map_sid = {} 
-        for s in sedes:
-            res_s = supabase.table("sedes").insert({
-                "cliente_id": cid, "nombre": s["nombre"], "direccion": s["direccion"],
-                "departamento": s["departamento"], "municipio": s["municipio"],
-                "responsable": s["responsable"], "email": s["email"], "telefono": s["telefono"]
-            }).execute()
-            map_sid[s["nombre"]] = res_s.data[0]['id']
-
-        # Guardar Usuarios
-        chunk = 100
-        ubd = []
-        for u in usuarios:
-            sid = map_sid.get(u["Sede"])
-            if sid:
-                ubd.append({
-                    "sede_id": sid, "nombres": u["Nombres"], "apellidos": u["Apellidos"],
-                    "tipo_doc": u["Tipo Doc"], "documento": u["Documento"],
-                    "email": u["Correo"], "fecha_nacimiento": u["F. Nacimiento"],
-                    "genero": u["Genero"], "nivel_educativo": u["Nivel"],
-                    "titulo": u["Titulo"], "ocupacion": u["Ocupacion"],
-                    "area": u["Area"], "otra_area": u.get("Otra Area", ""),
-                    "cobertura": u["Cobertura"], "tecnologia": u["Tecnologia"],
-                    "periodicidad": u["Periodicidad"], "ubicaciones": u["Ubicaciones"],
-                    "fecha_inicio": u["F. Inicio"]
-                })
-        
-        for i in range(0, len(ubd), chunk):
-            supabase.table("usuarios").insert(ubd[i:i+chunk]).execute()
-            
-        # --- ENVIAR CORREOS Y CAPTURAR ERRORES ---
-        lista_errores = procesar_notificaciones(cliente, len(sedes), len(usuarios))
-        
-        if lista_errores:
-            return True, f"Datos guardados, pero hubo errores de correo: {'; '.join(lista_errores)}"
-        
-        return True, "OK"
-        
-    except Exception as e: return False, str(e)
+    # la nómina del correo interno se escribe desde la tabla de la sesión, sin volver a leer la BD
+    ok, msg = guardar_ingreso(cliente_supabase(), cliente, sedes, usuarios, notificar=lambda n_sedes, n_reg: procesar_notificaciones(cliente, n_sedes, n_reg, sedes, usuarios),
+                              existente=existente_actual())
+    if ok: cliente_existente.clear(cliente["nit"].strip())  # ids y sedes nuevos
+    return ok, msg
 
 # --- EXCEL ---
-def generar_plantilla_excel():
-    cols = ["Nombres", "Apellidos", "Tipo Doc", "Documento", "Correo", "F. Nacimiento (YYYY-MM-DD)", "Genero", "Nivel Educativo", "Titulo", "Ocupacion", "Area", "Otra Area", "Sede", "Cobertura", "Tecnologia", "Periodicidad", "Ubicaciones", "Mes Inicio", "Año Inicio"]
-    buffer = io.BytesIO()
-    with pd.ExcelWriter(buffer, engine='xlsxwriter') as writer:
-        df = pd.DataFrame(columns=cols); df.to_excel(writer, index=False, sheet_name='Plantilla')
-        wb, ws = writer.book, writer.sheets['Plantilla']; wr = wb.add_worksheet('Listas')
-        sn = [s["nombre"] for s in st.session_state.sedes] if st.session_state.sedes else ["Sin Sedes"]
-        
-        cf = [(2,"D",LISTAS["TIPO_DOC"]),(6,"G",LISTAS["GENERO"]),(7,"N",LISTAS["NIVEL_EDUCATIVO"]),(8,"T",LISTAS["TITULO"]),(9,"O",LISTAS["OCUPACION"]),(10,"A",LISTAS["AREA"]),(12,"S",sn),(13,"L_COB",LISTAS["COBERTURA"]),(14,"TE",LISTAS["TECNOLOGIA"]),(15,"P",LISTAS["PERIODICIDAD"]),(17,"M",LISTAS["MESES"])]
-        
-        for i, (ci, n, d) in enumerate(cf):
-            wr.write(0, i, n); [wr.write(j+1, i, v) for j,v in enumerate(d)]
-            l = chr(ord('A')+i); wb.define_name(n, f'=Listas!${l}$2:${l}${len(d)+1}')
-            ws.data_validation(1, ci, 1000, ci, {'validate':'list','source':f'={n}'})
-        ws.data_validation(1, 5, 1000, 5, {'validate':'date','criteria':'between','minimum':date(1930,1,1),'maximum':date.today()})
-        ws.write_comment('Q1', "Puede poner varias separadas por comas. Ej: TORAX, ANILLO")
-        wr.hide(); ws.set_column('A:S', 20)
-    buffer.seek(0); return buffer
-
-def procesar_excel_masivo(file):
-    try: df = pd.read_excel(file)
-    except Exception as e: return None, [f"Error archivo: {str(e)}"]
-    df.columns = [c.strip() for c in df.columns]
-    sm = {limpiar_texto(s["nombre"]): s["nombre"] for s in st.session_state.sedes}
-    if not sm: return None, ["Cree al menos una sede."]
-    err, pro = [], []
-    for i, r in df.iterrows():
-        f = i + 2
-        nm, ap = limpiar_texto(r.get("Nombres")), limpiar_texto(r.get("Apellidos"))
-        dc = str(r.get("Documento")).split('.')[0]
-        sd = limpiar_texto(r.get("Sede"))
-        ar, oa = limpiar_texto(r.get("Area")), limpiar_texto(r.get("Otra Area"))
-        if ar == "OTRO" and not oa: err.append(f"Fila {f}: Falta 'Otra Area'"); continue
-        if not nm or not ap: err.append(f"Fila {f}: Falta Nombre/Apellido"); continue
-        if not dc or dc == "nan": err.append(f"Fila {f}: Falta Documento"); continue
-        rs = sm.get(sd)
-        if not rs: err.append(f"Fila {f}: Sede '{r.get('Sede')}' no existe."); continue
-        fn = str(r.get("F. Nacimiento (YYYY-MM-DD)")).split()[0]
-        fi = get_primer_dia_mes(limpiar_texto(r.get("Mes Inicio")), r.get("Año Inicio"))
-        ub = str(r.get("Ubicaciones")).upper()
-        if ub in ["NAN", "NONE", ""]: err.append(f"Fila {f}: Falta Ubicación"); continue
-        for ubic in [u.strip() for u in ub.replace(';',',').split(',') if u.strip()]:
-            pro.append({
-                "Nombres":nm,"Apellidos":ap,"Tipo Doc":r.get("Tipo Doc"),"Documento":dc,"Correo":str(r.get("Correo")).lower(),
-                "F. Nacimiento":fn,"Genero":str(r.get("Genero")).upper(),"Nivel":str(r.get("Nivel Educativo")).upper(),"Titulo":str(r.get("Titulo")).upper(),
-                "Ocupacion":str(r.get("Ocupacion")).upper(),"Area":ar,"Otra Area":oa,"Sede":rs,
-                "Cobertura":str(r.get("Cobertura")).upper(),"Tecnologia":str(r.get("Tecnologia")).upper(),"Periodicidad":str(r.get("Periodicidad")).upper(),
-                "Ubicaciones":ubic,"F. Inicio":str(fi)
-            })
-    return pro, err
-
-def descargar_borrador(): return json.dumps({"cliente":st.session_state.cliente,"sedes":st.session_state.sedes,"usuarios":st.session_state.usuarios},default=str)
-def cargar_borrador(f): 
-    try: st.session_state.update(json.load(f)); st.toast("Cargado")
-    except: st.error("Error archivo")
+@st.cache_data(max_entries=32, show_spinner=False)
+def generar_plantilla_excel(nombres_sedes, listas, hoy):
+    from plantilla import construir_plantilla
+    return construir_plantilla(nombres_sedes, listas, hoy=hoy)
+
+@st.cache_resource
+def pool_hojas():
+    """Procesos para leer hojas en paralelo, compartidos por todas las sesiones. spawn: el servidor tiene hilos."""
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+    return ProcessPoolExecutor(max_workers=os.cpu_count() or 2, mp_context=multiprocessing.get_context("spawn"))
+
+def procesar_excel_masivo(files):
+    """Todas las hojas de todos los libros subidos -> (registros, errores, detalle por hoja)."""
+    import tempfile
+    from concurrent.futures import BrokenExecutor
+    with tempfile.TemporaryDirectory() as d:  # los procesos del pool leen del disco, no reciben los bytes
+        archivos = []
+        for i, f in enumerate(files):
+            ruta = os.path.join(d, f"{i}.xlsx")
+            with open(ruta, "wb") as out: out.write(f.getbuffer())
+            archivos.append((f.name, ruta))
+        try: return leer_libros(archivos, st.session_state.sedes, pool_hojas())
+        except BrokenExecutor:
+            pool_hojas.clear(); log.warning("pool de hojas caído; se lee en este proceso")
+            return leer_libros(archivos, st.session_state.sedes)
+
+# --- BORRADOR / AUTOGUARDADO (ver borrador.py) ---
+def descargar_borrador():
+    """Función para el botón de descarga. Streamlit la llama en otro hilo (sin st.session_state):
+    los datos se toman aquí, al pintar, y solo la serialización queda diferida."""
+    from borrador import exportar
+    c, s, u = dict(st.session_state.cliente), [dict(x) for x in st.session_state.sedes], usuarios_actuales() if hay_tabla() else None
+    return lambda: exportar(c, s, u)
+
+def restablecer(d):
+    """Reemplaza cliente, sedes y tabla por un estado ya verificado (borrador o autoguardado)."""
+    st.session_state.cliente, st.session_state.sedes, st.session_state.usuarios = d["cliente"], d["sedes"], d["usuarios"]; soltar_ubicacion()
+    st.session_state.ed_ver += 1; st.session_state.ed_ini = 0; st.session_state.pop("pag", None); st.session_state.pop("memo_usuarios", None)
+    if st.session_state.get("diario"): st.session_state.diario.reiniciar()
+
+def cargar_borrador(f):
+    from borrador import importar
+    try: d = importar(f.getvalue())
+    except Exception as e: st.error(f"Borrador inválido: {e}"); return False
+    GEO.corregir_registros([d["cliente"]] + d["sedes"]); restablecer(d); st.toast("Cargado")
+    return True
+
+def diario():
+    """Autoguardado de la sesión para el NIT actual (None si está desactivado o aún no hay NIT)."""
+    if not AUTOGUARDADO_SEG: return None
+    from borrador import Autoguardado
+    nit = re.sub(r'\D', '', str(st.session_state.cliente.get("nit", "")))
+    if not nit: return None
+    d = st.session_state.get("diario")
+    if d is None or d.nit != nit: d = st.session_state.diario = Autoguardado(nit, intervalo=AUTOGUARDADO_SEG)
+    return d
+
+def autoguardar():
+    d = diario()
+    if not d or (d.existe() and not d.con_base and not st.session_state.get("autoguardado_visto")): return  # primero se ofrece recuperarlo
+    try: d.guardar(st.session_state.cliente, st.session_state.sedes, lambda: st.session_state.usuarios, (st.session_state.ed_ver, st.session_state.ed_ini, st.session_state.get(clave_editor()) or {}))
+    except OSError as e: log.warning("autoguardado: %s", e)
 
 # --- UI DIALOGS ---
 @st.dialog("Nueva Sede")
@@ -376,15 +378,16 @@ def dialog_sede(index=None, d=None):
     if not d: b["nombre"] = ""
     n = st.text_input("Nombre Sede", b.get("nombre","").upper())
     c1,c2 = st.columns(2); dir_ = c1.text_input("Dirección", b.get("direccion","").upper())
-    ld = DEPARTAMENTOS + ["OTRO"]; vd = b.get("departamento", "").upper(); id_d = ld.index(vd) if vd in ld else 0
-    dp = c2.selectbox("Depto", ld, index=id_d); lm = COLOMBIA_DATA.get(dp, []) + ["OTRO"] if dp != "OTRO" else []
-    vm = b.get("municipio", "").upper(); id_m = lm.index(vm) if vm in lm else 0
+    ld = DEPARTAMENTOS + ["OTRO"]; vd = b.get("departamento", "").upper(); vm = b.get("municipio", "").upper(); id_d = posicion_depto(vd)
+    dp = c2.selectbox("Depto", ld, index=id_d); lm = GEO.municipios(dp) + ["OTRO"] if dp != "OTRO" else []
+    id_m = posicion_muni(dp, vm)
     mn = st.selectbox("Muni", lm, index=id_m) if dp != "OTRO" else None
     df, mf = (st.text_input("Escriba Depto").upper() if dp == "OTRO" else dp), (st.text_input("Escriba Muni").upper() if (mn == "OTRO" or dp == "OTRO") else mn)
     c3,c4 = st.columns(2); r = c3.text_input("Resp", b.get("responsable", "").upper()); e = c4.text_input("Mail", b.get("email", "").lower()); t = st.text_input("Tel", b.get("telefono", ""))
     if st.button("Guardar Sede", type="primary"):
         if not n: st.error("Nombre obligatorio")
         else:
+            if (dp == "OTRO" or mn == "OTRO") and (geo := GEO.corregir(df, mf)): df, mf = geo[0], geo[1]  # "Bogotá" escrito a mano -> BOGOTA / BOGOTA, D.C.
             ns = {"nombre": limpiar_texto(n), "direccion": dir_, "departamento": df, "municipio": mf, "responsable": r, "email": e, "telefono": t}
             if index is not None: st.session_state.sedes[index] = ns
             else: st.session_state.sedes.append(ns)
@@ -403,24 +406,29 @@ def dialog_usuario():
     c9,c10,c11=st.columns(3); co=c9.selectbox("Cob", LISTAS["COBERTURA"]); te=c10.selectbox("Tec", LISTAS["TECNOLOGIA"]); pe=c11.selectbox("Per", LISTAS["PERIODICIDAD"])
     ub=st.multiselect("Ubicaciones", LISTAS["UBICACION_CORPO"]); c_m, c_a = st.columns(2); mi = c_m.selectbox("Mes", LISTAS["MESES"]); ai = c_a.number_input("Año", 2024, 2030, date.today().year)
     if st.button("Guardar", type="primary", use_container_width=True):
-        if not all([n,a,dc,em,ub,se]): st.error("Incompleto")
-        elif ar == "OTRO" and not oa: st.error("Falta Otra Área")
+        from validacion import errores_registro
+        er = errores_registro({"Nombres":n,"Apellidos":a,"Documento":dc,"Correo":em,"Sede":se,"Ubicaciones":ub,"Area":ar,"Otra Area":oa})
+        rec = {"Nombres":n,"Apellidos":a,"Tipo Doc":td,"Documento":dc,"Correo":em,"F. Nacimiento":str(fn),"Genero":ge,"Nivel":nv,"Titulo":ti,"Ocupacion":oc,"Area":ar,"Otra Area":oa,"Sede":se,"Cobertura":co,"Tecnologia":te,"Periodicidad":pe,"Ubicaciones":unir_ubicaciones(ub),"F. Inicio":str(get_primer_dia_mes(mi, ai))}
+        if not er: er = indice_duplicados().revisar([rec])
+        if er: st.error(" · ".join(er))
         else:
-            fi = get_primer_dia_mes(mi, ai); st.session_state.last_sede = se; st.session_state.last_area = ar
-            for u in ub: st.session_state.usuarios.append({"Nombres":n,"Apellidos":a,"Tipo Doc":td,"Documento":dc,"Correo":em,"F. Nacimiento":str(fn),"Genero":ge,"Nivel":nv,"Titulo":ti,"Ocupacion":oc,"Area":ar,"Otra Area":oa,"Sede":se,"Cobertura":co,"Tecnologia":te,"Periodicidad":pe,"Ubicaciones":u,"F. Inicio":str(fi)})
+            st.session_state.last_sede = se; st.session_state.last_area = ar
+            agregar_usuarios([rec])
             st.rerun()
 
 # --- CONFIRMACIÓN ---
 @st.dialog("Confirmación de Ingreso")
 def dialog_confirmar_envio():
     st.markdown("#### ¿Está seguro de procesar este ingreso?")
-    cli = st.session_state.cliente
+    from tabla import n_asignaciones
+    cli = st.session_state.cliente; usuarios = usuarios_actuales()
     st.info(f"🏢 **Cliente:** {cli['razon_social']} | NIT: {cli['nit']}")
-    c1,c2,c3 = st.columns(3); c1.metric("Sedes", len(st.session_state.sedes)); c2.metric("Usuarios", len({u['Documento'] for u in st.session_state.usuarios})); c3.metric("Registros", len(st.session_state.usuarios))
+    c1,c2,c3 = st.columns(3); c1.metric("Sedes", len(st.session_state.sedes)); c2.metric("Usuarios", usuarios["Documento"].nunique()); c3.metric("Registros", n_asignaciones(usuarios))
     if st.button("✅ SÍ, REGISTRAR Y NOTIFICAR", type="primary", use_container_width=True):
-        with st.spinner("Guardando en BD y enviando correos..."):
-            ok, msg = guardar_en_base_datos(st.session_state.cliente, st.session_state.sedes, st.session_state.usuarios)
+        with st.spinner("Guardando en BD..."):
+            ok, msg = guardar_en_base_datos(st.session_state.cliente, st.session_state.sedes, usuarios)
         if ok and "error" not in msg.lower(): 
+            if st.session_state.get("diario"): st.session_state.diario.descartar()
             st.session_state.envio_exitoso = True; st.rerun()
         elif ok: # Se guardó en BD pero falló el correo
             st.warning(f"⚠️ Datos guardados, pero alerta de correo: {msg}")
@@ -430,10 +438,10 @@ def dialog_confirmar_envio():
 
 # --- MAIN ---
 c_l, c_t, c_o = st.columns([1, 2, 1])
-if os.path.exists("logo.png"): c_l.image("logo.png", width=180)
+if logo(): c_l.image(logo(), width=180)
 c_t.markdown("<h2 style='text-align:center;color:#002060;'>Ingreso usuarios dosimetría - Sievert S.A.S</h2>", unsafe_allow_html=True)
 
-cli_ok, sed_ok = verificar_estado_general(); usu_ok = len(st.session_state.usuarios) > 0
+cli_ok, sed_ok = verificar_estado_general(); n_reg = n_registros(); usu_ok = n_reg > 0
 nm_cli = st.session_state.cliente["razon_social"] if st.session_state.cliente["razon_social"] else "PENDIENTE"
 nm_short = (nm_cli[:15] + '..') if len(nm_cli) > 15 else nm_cli
 
@@ -441,30 +449,50 @@ c_t.markdown(f"""
     <div style='text-align:center;'>
         <span class='status-badge {'status-ok' if cli_ok else 'status-err'}'>CLI: {nm_short}</span>
         <span class='status-badge {'status-ok' if sed_ok else 'status-err'}'>SEDES: {len(st.session_state.sedes)}</span>
-        <span class='status-badge {'status-ok' if usu_ok else 'status-err'}'>REG: {len(st.session_state.usuarios)}</span>
+        <span class='status-badge {'status-ok' if usu_ok else 'status-err'}'>REG: {n_reg}</span>
     </div>
 """, unsafe_allow_html=True)
+T_PINTADO = time.perf_counter()
 
 with c_o.popover("⚙️"):
-    st.download_button("💾 JSON", descargar_borrador(), "data.json"); u = st.file_uploader("📂"); 
-    if u and st.button("Restaurar"): cargar_borrador(u); st.rerun()
+    st.download_button("💾 Borrador", descargar_borrador(), "borrador.json.gz", mime="application/gzip"); u = st.file_uploader("📂", type=["gz", "json"]); 
+    if u and st.button("Restaurar") and cargar_borrador(u): st.rerun()
+    st.caption(resumen_tiempos())
+    if st.toggle("🩺 Diagnóstico", key="diag"): panel_diagnostico()
 
 st.write("")
-if 'envio_exitoso' in st.session_state: st.success("✅ ¡Datos guardados y notificados exitosamente!"); st.stop()
+if 'envio_exitoso' in st.session_state:
+    st.success("✅ ¡Datos guardados exitosamente!")
+    bandeja = obtener_bandeja()
+    if bandeja:
+        with st.container(border=True):
+            c_n, c_r = st.columns([6,1]); c_n.markdown("#### 📧 Notificaciones"); c_r.button("↻", key="ref_not")
+            for m in bandeja.estado(st.session_state.cliente["nit"]):
+                ic = {"ENVIADO": "✅", "PENDIENTE": "⏳", "ENVIANDO": "📤", "FALLIDO": "❌"}.get(m["estado"], "•")
+                st.markdown(f"{ic} **{m['asunto']}** → {m['destinatario']} · {m['estado']}" + (f" ({m['intentos']} intentos: {m['error']})" if m["error"] else ""))
+    st.stop()
 
 with st.expander("🏢 Cliente / Sedes", expanded=True):
     c1,c2,c3,c4=st.columns(4)
     st.session_state.cliente["razon_social"]=c1.text_input("Razón",st.session_state.cliente["razon_social"]).upper()
     st.session_state.cliente["nit"]=c2.text_input("NIT",st.session_state.cliente["nit"])
+    ag = diario()
+    if ag and ag.existe() and not ag.con_base and not st.session_state.get("autoguardado_visto"):
+        c_i, c_r, c_d = st.columns([4,1,1]); c_i.info("♻️ Hay un autoguardado para este NIT.")
+        if c_r.button("Recuperar", use_container_width=True):
+            try: restablecer(ag.recuperar()); st.session_state.autoguardado_visto = True; st.rerun()
+            except Exception as e: st.error(f"No se pudo recuperar: {e}")
+        if c_d.button("Descartar", use_container_width=True): st.session_state.autoguardado_visto = True; st.rerun()
+    ofrecer_existente()
     st.session_state.cliente["email"]=c3.text_input("Email",st.session_state.cliente["email"]).lower()
     st.session_state.cliente["telefono"]=c4.text_input("Tel",st.session_state.cliente["telefono"])
     c5,c6,c7,c8=st.columns(4)
     st.session_state.cliente["responsable"]=c5.text_input("Resp",st.session_state.cliente["responsable"]).upper()
     st.session_state.cliente["cargo"]=c6.text_input("Cargo",st.session_state.cliente["cargo"]).upper()
     st.session_state.cliente["direccion"]=c7.text_input("Dir",st.session_state.cliente["direccion"]).upper()
-    ld=DEPARTAMENTOS+["OTRO"]; vd=st.session_state.cliente["departamento"].upper(); id_d=ld.index(vd) if vd in ld else 0
-    dp=c8.selectbox("Depto",ld,index=id_d,key="cd"); lm=COLOMBIA_DATA.get(dp,[])+["OTRO"] if dp!="OTRO" else []
-    vm=st.session_state.cliente["municipio"].upper(); id_m=lm.index(vm) if vm in lm else 0
+    ld=DEPARTAMENTOS+["OTRO"]; vd=st.session_state.cliente["departamento"].upper(); vm=st.session_state.cliente["municipio"].upper(); id_d=posicion_depto(vd)
+    dp=c8.selectbox("Depto",ld,index=id_d,key="cd"); lm=GEO.municipios(dp)+["OTRO"] if dp!="OTRO" else []
+    id_m=posicion_muni(dp,vm)
     cm,cf=st.columns([1,3]); mn=cm.selectbox("Muni",lm,index=id_m,key="cm") if dp!="OTRO" else None
     st.session_state.cliente["departamento"]=(st.text_input("TxtDepto",vd).upper() if dp=="OTRO" else dp)
     st.session_state.cliente["municipio"]=(st.text_input("TxtMuni",vm).upper() if (mn=="OTRO" or dp=="OTRO") else mn)
@@ -489,38 +517,74 @@ with t1:
         c1,c2,c3,c4=st.columns(4); nr=c1.number_input("#",1,50,5); sn=[s["nombre"] for s in st.session_state.sedes]; sg=c2.selectbox("Sede",sn) if sn else None; tg=c3.selectbox("Tec",LISTAS["TECNOLOGIA"]); pg=c4.selectbox("Per",LISTAS["PERIODICIDAD"])
         if st.button("Generar", use_container_width=True):
             if not sg: st.error("Falta Sede")
-            else: st.session_state.usuarios.extend([{"Nombres":"","Apellidos":"","Tipo Doc":"CC","Documento":"","Correo":"","F. Nacimiento":str(date(1990,1,1)),"Genero":"OTRO","Nivel":"PROFESIONAL","Titulo":"OTRO","Ocupacion":"OTRO","Area":"RADIOLOGIA","Otra Area":"","Sede":sg,"Cobertura":"ARL","Tecnologia":tg,"Periodicidad":pg,"Ubicaciones":"TORAX","F. Inicio":str(date.today().replace(day=1))} for _ in range(nr)]); st.rerun()
+            else: agregar_usuarios([{"Nombres":"","Apellidos":"","Tipo Doc":"CC","Documento":"","Correo":"","F. Nacimiento":str(date(1990,1,1)),"Genero":"OTRO","Nivel":"PROFESIONAL","Titulo":"OTRO","Ocupacion":"OTRO","Area":"RADIOLOGIA","Otra Area":"","Sede":sg,"Cobertura":"ARL","Tecnologia":tg,"Periodicidad":pg,"Ubicaciones":"TORAX","F. Inicio":str(date.today().replace(day=1))} for _ in range(nr)]); st.rerun()
 
 with t2:
-    c1, c2 = st.columns([1,2]); c1.download_button("📥 Plantilla", generar_plantilla_excel(), "Plantilla.xlsx", use_container_width=True)
-    u = st.file_uploader("Excel", ["xlsx"], label_visibility="collapsed")
+    c1, c2 = st.columns([1,2]); c1.download_button("📥 Plantilla", lambda sn=tuple(s["nombre"] for s in st.session_state.sedes): generar_plantilla_excel(sn, LISTAS, date.today()), "Plantilla.xlsx", use_container_width=True)
+    u = st.file_uploader("Excel", ["xlsx"], accept_multiple_files=True, label_visibility="collapsed", help="Uno o varios libros; se leen todas las hojas con el encabezado de la plantilla.")
+    lotes = c2.toggle("Modo lotes (archivos grandes)", value=bool(u and max(f.size for f in u) > LIMITE_LOTES_MB * 1024 * 1024), help=f"Lee cada hoja en bloques de {TAM_LOTE} filas sin cargarla completa en memoria (una hoja a la vez).")
     if u and st.button("Procesar", type="primary", use_container_width=True):
-        us, er = procesar_excel_masivo(u)
+        detalle = []
+        if lotes:
+            from masivo import SIN_ENCABEZADO, hojas_libro, procesar_excel_por_lotes
+            from tabla import AcumuladorTabla
+            bar = st.progress(0.0, "Leyendo...")
+            acc, er, fallo, leidos = AcumuladorTabla(indice_duplicados().filtrar), [], False, None
+            for f in u:
+                try: hojas = hojas_libro(f, solo_datos=True); leidos = (leidos or 0) + len(hojas)
+                except Exception as e: er.append(f"{f.name}: Error archivo: {str(e)}"); continue
+                for h in hojas:
+                    def avance(leidas, total): bar.progress(min(leidas / total, 1.0) if total else 0.0, f"{f.name} / {h}: {leidas:,} / {total:,} filas")
+                    f.seek(0); n_h, er_h = procesar_excel_por_lotes(f, st.session_state.sedes, acc, progreso=avance, hoja=h); fallo |= n_h is None
+                    er += [f"{f.name} / {h}: {e}" for e in er_h] if len(u) > 1 or len(hojas) > 1 else er_h
+            bar.empty()
+            if leidos == 0: er.append(SIN_ENCABEZADO)  # como en la lectura completa: algún libro abrió pero ninguna hoja sirve
+            tab = acc.tabla(); n = len(tab); er += acc.avisos
+            if n: agregar_usuarios(tab, filtrado=True)
+            if fallo: st.session_state.duplicados.tabla = None  # el filtro registró llaves de lotes descartados: se reconstruye
+            del acc, tab
+        else:
+            with st.spinner("Leyendo hojas..."): us, er, detalle = procesar_excel_masivo(u)
+            if us: us, av = indice_duplicados().filtrar(us); er += av
+            n = len(us or [])
+            if us: agregar_usuarios(us, filtrado=True)
+            del us
+        if len(detalle) > 1: st.dataframe(detalle, hide_index=True, use_container_width=True)
         # 🟢 CORRECCIÓN DEL ERROR VISUAL [...]
         if er:
             for e in er:
                 if "Duplicado" in e: st.warning(e)
                 else: st.error(e)
-        if us: st.session_state.usuarios.extend(us); st.success(f"✅ {len(us)} Registros cargados.")
-
-if st.session_state.usuarios:
-    st.divider(); m1, m2 = st.columns(2); m1.metric("Registros", len(st.session_state.usuarios)); m2.metric("Sedes", len({u["Sede"] for u in st.session_state.usuarios}))
+        if n: st.success(f"✅ {n} Usuarios cargados.")
+
+usuarios = usuarios_actuales() if hay_tabla() else []
+if len(usuarios):
+    from tabla import n_asignaciones
+    st.divider(); m1, m2, m3 = st.columns([1,1,2]); m1.metric("Registros", n_asignaciones(usuarios)); m2.metric("Sedes", usuarios["Sede"].nunique())
+    # Modo paginado: el editor solo recibe una ventana de PAGINA filas
+    n_pag = (len(st.session_state.usuarios) - 1) // PAGINA + 1
+    if st.session_state.get("pag", 1) > n_pag: st.session_state.pag = n_pag
+    pag = m3.number_input(f"Página (de {n_pag})", 1, n_pag, key="pag", on_change=consolidar) - 1 if n_pag > 1 else 0
+    st.session_state.ed_ini = pag * PAGINA
     sn = [s["nombre"] for s in st.session_state.sedes]
-    df_ed = st.data_editor(st.session_state.usuarios, num_rows="dynamic", use_container_width=True, height=500, key="ed", column_config={
+    st.data_editor(st.session_state.usuarios.iloc[st.session_state.ed_ini:st.session_state.ed_ini + PAGINA], num_rows="dynamic", use_container_width=True, height=500, hide_index=True, key=clave_editor(), column_config={
         "Sede": st.column_config.SelectboxColumn(options=sn, required=True), "Genero": st.column_config.SelectboxColumn(options=LISTAS["GENERO"]),
         "Tipo Doc": st.column_config.SelectboxColumn(options=LISTAS["TIPO_DOC"]), "Tecnologia": st.column_config.SelectboxColumn(options=LISTAS["TECNOLOGIA"]),
         "Periodicidad": st.column_config.SelectboxColumn(options=LISTAS["PERIODICIDAD"]), "Cobertura": st.column_config.SelectboxColumn(options=LISTAS["COBERTURA"]),
         "Area": st.column_config.SelectboxColumn(options=LISTAS["AREA"], required=True), "Otra Area": st.column_config.TextColumn(help="Si Área es OTRO"),
-        "Ubicaciones": st.column_config.TextColumn(required=True), "Nombres": st.column_config.TextColumn(required=True),
+        "Ubicaciones": st.column_config.TextColumn(required=True, help="Varias separadas por coma"), "Nombres": st.column_config.TextColumn(required=True),
         "Apellidos": st.column_config.TextColumn(required=True), "Documento": st.column_config.TextColumn(required=True), "Correo": st.column_config.TextColumn(required=True)
     })
-    if len(df_ed) != len(st.session_state.usuarios) or df_ed != st.session_state.usuarios: st.session_state.usuarios = df_ed if isinstance(df_ed, list) else df_ed.to_dict('records')
 
 st.markdown("<br>", unsafe_allow_html=True); c1,c2,c3=st.columns([1,2,1])
 if c2.button("🚀 ENVIAR SOLICITUD DE INGRESO", type="primary", use_container_width=True):
     co, so = verificar_estado_general(); to, tm = validar_tabla_usuarios_estricta()
     if not (co and so): st.error("⚠️ Faltan datos Cliente/Sedes")
-    elif not to: st.error(tm)
+    elif not to:
+        st.error(tm)
+        if len(st.session_state.get("reporte_validacion", [])): st.dataframe(reporte_paginado(st.session_state.reporte_validacion), hide_index=True, use_container_width=True)
     else: dialog_confirmar_envio()
 
 st.markdown("<div class='footer'>© 2025 Sievert S.A.S | v.34.0</div>", unsafe_allow_html=True)
+autoguardar()
+registrar_tiempos(imports=T_IMPORTS, pintado=T_PINTADO, total=time.perf_counter())
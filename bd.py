@@ -0,0 +1,266 @@
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from comun import separar_ubicaciones
+from trazas import tramo, en_contexto, bytes_json
+
+# --- ESCRITURA EN SUPABASE ---
+# Sedes en un solo insert masivo y usuarios en lotes paralelos (pool acotado).
+# El tamaño del lote se calcula a partir del peso JSON de las filas y no con un número fijo.
+
+HILOS_BD = 4
+MAX_BYTES_LOTE = 256 * 1024
+MIN_FILAS_LOTE, MAX_FILAS_LOTE = 50, 1000
+
+def payload_cliente(cliente):
+    return {
+        "razon_social": cliente["razon_social"], "nit": cliente["nit"],
+        "email": cliente["email"], "telefono": cliente["telefono"],
+        "responsable": cliente["responsable"], "cargo_responsable": cliente["cargo"],
+        "direccion": cliente["direccion"], "departamento": cliente["departamento"],
+        "municipio": cliente["municipio"]
+    }
+
+def cliente_desde_bd(c):
+    """Inverso de payload_cliente: fila de 'clientes' -> cliente del formulario."""
+    return {"razon_social": c.get("razon_social") or "", "nit": c.get("nit") or "", "responsable": c.get("responsable") or "",
+            "cargo": c.get("cargo_responsable") or "", "email": c.get("email") or "", "telefono": c.get("telefono") or "",
+            "direccion": c.get("direccion") or "", "municipio": c.get("municipio") or "", "departamento": c.get("departamento") or ""}
+
+CAMPOS_SEDE_BD = ["nombre", "direccion", "departamento", "municipio", "responsable", "email", "telefono"]
+
+def payload_sede(cid, s):
+    return {
+        "cliente_id": cid, "nombre": s["nombre"], "direccion": s["direccion"],
+        "departamento": s["departamento"], "municipio": s["municipio"],
+        "responsable": s["responsable"], "email": s["email"], "telefono": s["telefono"]
+    }
+
+def payload_usuarios(usuarios, map_sid):
+    """Una fila por persona y ubicación: el esquema guarda un dosímetro por fila."""
+    ubd = []
+    for u in usuarios:
+        sid = map_sid.get(u["Sede"])
+        if sid:
+            base = {
+                "sede_id": sid, "nombres": u["Nombres"], "apellidos": u["Apellidos"],
+                "tipo_doc": u["Tipo Doc"], "documento": u["Documento"],
+                "email": u["Correo"], "fecha_nacimiento": u["F. Nacimiento"],
+                "genero": u["Genero"], "nivel_educativo": u["Nivel"],
+                "titulo": u["Titulo"], "ocupacion": u["Ocupacion"],
+                "area": u["Area"], "otra_area": u.get("Otra Area", ""),
+                "cobertura": u["Cobertura"], "tecnologia": u["Tecnologia"],
+                "periodicidad": u["Periodicidad"], "fecha_inicio": u["F. Inicio"]
+            }
+            ubd.extend({**base, "ubicaciones": ub} for ub in separar_ubicaciones(u["Ubicaciones"]))
+    return ubd
+
+def tamano_lote(filas, max_bytes=MAX_BYTES_LOTE, muestra=50):
+    """Filas por lote según el peso promedio de una muestra serializada."""
+    if not filas: return MIN_FILAS_LOTE
+    m = filas[:muestra]
+    prom = max(len(json.dumps(m, default=str).encode()) / len(m), 1)
+    return int(min(max(max_bytes // prom, MIN_FILAS_LOTE), MAX_FILAS_LOTE))
+
+def partir_lotes(filas, n=None):
+    n = n or tamano_lote(filas)
+    return [filas[i:i+n] for i in range(0, len(filas), n)]
+
+def insertar_cliente(sb, cliente):
+    with tramo("bd.clientes", filas=1):
+        return sb.table("clientes").insert(payload_cliente(cliente)).execute().data[0]['id']
+
+def insertar_sedes(sb, cid, sedes):
+    """Un solo insert para todas las sedes; retorna {nombre: id} a partir de lo que devuelve la BD."""
+    if not sedes: return {}
+    filas = [payload_sede(cid, s) for s in sedes]
+    with tramo("bd.sedes", filas=len(filas), bytes=bytes_json(filas)):
+        res = sb.table("sedes").insert(filas).execute()
+    return {r["nombre"]: r["id"] for r in res.data}
+
+def actualizar_cliente(sb, cid, cliente):
+    """Cliente ya registrado (buscar_cliente): se actualizan sus datos en su fila, no se inserta otra."""
+    with tramo("bd.clientes", filas=1, existente=True):
+        sb.table("clientes").update(payload_cliente(cliente)).eq("id", cid).execute()
+    return cid
+
+def guardar_sedes(sb, cid, sedes, existentes=None):
+    """Las sedes con nombre en existentes {nombre: id} se actualizan con su id (un upsert); las demás, insertar_sedes."""
+    existentes = existentes or {}
+    viejas, nuevas = [s for s in sedes if s["nombre"] in existentes], [s for s in sedes if s["nombre"] not in existentes]
+    if viejas:
+        filas = [{"id": existentes[s["nombre"]], **payload_sede(cid, s)} for s in viejas]
+        with tramo("bd.sedes", filas=len(filas), bytes=bytes_json(filas), existente=True):
+            sb.table("sedes").upsert(filas).execute()
+    return {**{s["nombre"]: existentes[s["nombre"]] for s in viejas}, **insertar_sedes(sb, cid, nuevas)}
+
+def insertar_lote(sb, lote):
+    """Retorna los ids que la BD asignó a las filas del lote."""
+    with tramo("bd.usuarios", filas=len(lote), bytes=bytes_json(lote)):
+        res = sb.table("usuarios").insert(lote).execute()
+    return [r["id"] for r in res.data]
+
+def insertar_usuarios(sb, filas, hilos=HILOS_BD, lotes=None, omitir=(), al_terminar=None):
+    """Envía los lotes en paralelo (salvo los índices en omitir) y llama al_terminar(i, ids) por cada lote confirmado.
+    Espera a que todos terminen; si alguno falla se propaga la primera excepción."""
+    lotes = lotes if lotes is not None else partir_lotes(filas)
+    pendientes = [i for i in range(len(lotes)) if i not in omitir]
+    if not pendientes: return 0
+    def enviar(i):
+        ids = insertar_lote(sb, lotes[i])
+        if al_terminar: al_terminar(i, ids)
+        return len(lotes[i])
+    with ThreadPoolExecutor(max_workers=max(1, min(hilos, len(pendientes)))) as ex:
+        futs = [ex.submit(en_contexto(enviar), i) for i in pendientes]  # los tramos de cada lote quedan en la sesión
+    fallos = [f.exception() for f in futs if f.exception()]
+    if fallos: raise fallos[0]
+    return sum(f.result() for f in futs)
+
+# --- ENVÍO REANUDABLE ---
+# Cada fase (cliente, sedes, lotes de usuarios, notificaciones) deja su avance en un archivo
+# identificado por NIT + hash del contenido; un reintento solo envía lo que falta.
+
+# Los archivos van en una carpeta por NIT (.envios/<nit>/<clave>.json): revisar duplicados de un NIT solo lee los suyos.
+# Un envío sin terminar vence a los VIGENCIA_ENVIO segundos: se da por abandonado y sus filas vuelven a contar como registradas.
+# Al terminar, el punto de control se borra y queda una marca vacía <clave>.hecho por VIGENCIA_MARCA segundos,
+# suficiente para que un doble clic no vuelva a enviar lo mismo.
+
+DIR_PUNTOS_CONTROL = ".envios"
+VIGENCIA_ENVIO = 7 * 24 * 3600
+VIGENCIA_MARCA = 600
+
+def carpeta_nit(nit): return re.sub(r'\D', '', str(nit or "")) or "SIN-NIT"
+
+def clave_idempotencia(cliente, sedes, usuarios):
+    h = hashlib.sha256(json.dumps([cliente, sedes, usuarios], sort_keys=True, default=str).encode()).hexdigest()[:16]
+    return f"{carpeta_nit(cliente.get('nit'))}-{h}"
+
+def vencido(ruta, vigencia=VIGENCIA_ENVIO):
+    try: return time.time() - os.path.getmtime(ruta) > vigencia
+    except OSError: return True
+
+class PuntoControl:
+    def __init__(self, clave, directorio=DIR_PUNTOS_CONTROL):
+        self.clave, self.ruta = clave, os.path.join(directorio, clave.rsplit("-", 1)[0], f"{clave}.json")
+        self.marca = self.ruta[:-len(".json")] + ".hecho"
+        self._lock = threading.Lock()
+        self.datos = {"clave": clave, "lotes": []}
+        if not vencido(self.marca, VIGENCIA_MARCA): self.datos["completo"] = True
+        elif os.path.exists(self.ruta) and not vencido(self.ruta):
+            with open(self.ruta, encoding="utf-8") as f: self.datos = json.load(f)
+
+    def get(self, k, d=None): return self.datos.get(k, d)
+
+    def marcar(self, **kv):
+        with self._lock: self.datos.update(kv); self._guardar()
+
+    def marcar_lote(self, i, ids=()):
+        with self._lock:
+            self.datos["lotes"].append(i)
+            if ids: self.datos.setdefault("usuarios", []).extend(ids)
+            self._guardar()
+
+    def terminar(self):
+        """Deja la marca de completo y borra el punto de control."""
+        with self._lock:
+            os.makedirs(os.path.dirname(self.marca) or ".", exist_ok=True)
+            open(self.marca, "w").close()
+            self.datos["completo"] = True
+            if os.path.exists(self.ruta): os.remove(self.ruta)
+
+    def _guardar(self):
+        os.makedirs(os.path.dirname(self.ruta) or ".", exist_ok=True)
+        tmp = self.ruta + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f: json.dump(self.datos, f)
+        os.replace(tmp, self.ruta)
+
+def envios_en_curso(nit, directorio=DIR_PUNTOS_CONTROL):
+    """Lo que dejaron en la BD los envíos sin terminar del NIT, para que no cuente como ya registrado al reintentar:
+    {"clientes": cliente_id nuevos, "sedes": sedes creadas y "usuarios": filas confirmadas sobre un cliente ya existente}.
+    De un cliente existente solo se excluye lo de ese envío: sus usuarios anteriores siguen siendo duplicados.
+    Los puntos de control y marcas de completo vencidos se borran aquí."""
+    en_curso, carpeta = {"clientes": set(), "sedes": set(), "usuarios": set()}, os.path.join(directorio, carpeta_nit(nit))
+    if not os.path.isdir(carpeta): return en_curso
+    for nombre in os.listdir(carpeta):
+        ruta, es_marca = os.path.join(carpeta, nombre), nombre.endswith(".hecho")
+        if not (es_marca or nombre.endswith(".json")): continue
+        if vencido(ruta, VIGENCIA_MARCA if es_marca else VIGENCIA_ENVIO):
+            try: os.remove(ruta)
+            except OSError: pass
+            continue
+        if es_marca: continue
+        try:
+            with open(ruta, encoding="utf-8") as f: d = json.load(f)
+        except (OSError, ValueError): continue
+        if d.get("completo") or d.get("cliente_id") is None: continue
+        if not d.get("existente"): en_curso["clientes"].add(d["cliente_id"]); continue
+        en_curso["sedes"].update(d.get("sedes_nuevas", [])); en_curso["usuarios"].update(d.get("usuarios", []))
+    return en_curso
+
+def guardar_reanudable(sb, cliente, sedes, usuarios, notificar=None, hilos=HILOS_BD, pc=None, existente=None):
+    """Guarda cliente, sedes y usuarios retomando desde el último punto de control.
+    existente (resultado de buscar_cliente): se reutilizan su id y los de sus sedes en vez de insertar otra vez.
+    Retorna la lista de errores de notificar() (vacía si ya se había notificado)."""
+    pc = pc or PuntoControl(clave_idempotencia(cliente, sedes, usuarios))
+    if pc.get("completo"): return []
+    cid = pc.get("cliente_id")
+    if cid is None:
+        if existente: cid = actualizar_cliente(sb, existente["id"], cliente); pc.marcar(cliente_id=cid, existente=True)
+        else: cid = insertar_cliente(sb, cliente); pc.marcar(cliente_id=cid)
+    map_sid = pc.get("sedes")
+    if map_sid is None:
+        previas = (existente or {}).get("ids_sedes") or {}
+        map_sid = guardar_sedes(sb, cid, sedes, previas); pc.marcar(sedes=map_sid, sedes_nuevas=[i for n, i in map_sid.items() if n not in previas])
+    filas = payload_usuarios(usuarios, map_sid)
+    if pc.get("tam_lote") is None: pc.marcar(tam_lote=tamano_lote(filas))
+    # Sobre un cliente existente se anotan los ids de cada lote confirmado (envios_en_curso); en uno nuevo basta cliente_id
+    confirmar = pc.marcar_lote if pc.get("existente") else lambda i, ids: pc.marcar_lote(i)
+    insertar_usuarios(sb, filas, hilos, lotes=partir_lotes(filas, pc.get("tam_lote")), omitir=set(pc.get("lotes")), al_terminar=confirmar)
+    errores = []
+    if not pc.get("notificado"):
+        errores = notificar() if notificar else []
+        pc.marcar(notificado=True, errores_notificacion=errores)
+    pc.terminar()
+    return errores
+
+# --- CONSULTAS ---
+PAGINA_CONSULTA = 1000  # máximo de filas que PostgREST entrega por respuesta
+
+def _paginar(consulta, tabla=""):
+    """consulta(desde, hasta) -> filas; pide páginas hasta recibir una incompleta."""
+    filas, i = [], 0
+    while True:
+        with tramo("bd.consulta", tabla=tabla) as t:
+            pag = consulta(i, i + PAGINA_CONSULTA - 1); t["filas"] = len(pag)
+        filas.extend(pag)
+        if len(pag) < PAGINA_CONSULTA: return filas
+        i += PAGINA_CONSULTA
+
+def usuarios_registrados(sb, nit, en_curso=None):
+    """(documento, sede, ubicación) ya guardados para el NIT, sin lo de en_curso (envios_en_curso).
+    Tres consultas en bloque, no una por fila."""
+    en_curso = en_curso or {}
+    excluir_sedes, excluir_usuarios = en_curso.get("sedes", ()), en_curso.get("usuarios", ())
+    with tramo("bd.consulta", tabla="clientes") as t:
+        cids = [c["id"] for c in sb.table("clientes").select("id").eq("nit", nit).execute().data if c["id"] not in en_curso.get("clientes", ())]; t["filas"] = len(cids)
+    if not cids: return []
+    sedes = {s["id"]: s["nombre"] for s in _paginar(lambda a, b: sb.table("sedes").select("id,nombre").in_("cliente_id", cids).order("id").range(a, b).execute().data, "sedes")
+             if s["id"] not in excluir_sedes}
+    if not sedes: return []
+    filas = _paginar(lambda a, b: sb.table("usuarios").select("id,documento,sede_id,ubicaciones").in_("sede_id", list(sedes)).order("id").range(a, b).execute().data, "usuarios")
+    return [(f["documento"], sedes.get(f["sede_id"]), f["ubicaciones"]) for f in filas if f["id"] not in excluir_usuarios]
+
+def buscar_cliente(sb, nit):
+    """Último cliente registrado con el NIT y todas sus sedes, en una sola consulta (sedes embebidas de PostgREST).
+    -> {"id", "cliente", "sedes" (formato del formulario), "ids_sedes" {nombre: id}} o None."""
+    with tramo("bd.consulta", tabla="clientes+sedes") as t:
+        filas = sb.table("clientes").select(f"*,sedes({','.join(['id'] + CAMPOS_SEDE_BD)})").eq("nit", nit).order("id", desc=True).limit(1).execute().data
+        t["filas"] = sum(1 + len(f.get("sedes") or []) for f in filas)
+    if not filas: return None
+    c = filas[0]; sedes = sorted(c.get("sedes") or [], key=lambda s: s["id"])
+    return {"id": c["id"], "cliente": cliente_desde_bd(c), "sedes": [{k: s.get(k) or "" for k in CAMPOS_SEDE_BD} for s in sedes],
+            "ids_sedes": {s["nombre"]: s["id"] for s in sedes}}
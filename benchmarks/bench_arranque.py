@@ -0,0 +1,56 @@
+"""Arranque en frío de app.py: cada medición es un proceso nuevo que ejecuta la app con AppTest.
+
+Uso: python benchmarks/bench_arranque.py [repeticiones] [--ref REV]   (por defecto 5)
+Con --ref se mide también la versión REV del repositorio (git archive) para comparar.
+Primer rerun = primer pintado de una sesión nueva en un proceso recién iniciado; los reruns siguientes
+reutilizan imports y recursos en caché.
+"""
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RERUNS = 5
+
+MEDIR = """
+import json, sys, time
+from streamlit.testing.v1 import AppTest
+at = AppTest.from_file("app.py", default_timeout=60)
+t0 = time.perf_counter(); at.run(); primero = time.perf_counter() - t0
+assert not at.exception, at.exception
+reruns = []
+for _ in range(%d):
+    t0 = time.perf_counter(); at.run(); reruns.append(time.perf_counter() - t0)
+pesados = [m for m in ("pandas", "supabase", "openpyxl", "xlsxwriter", "smtplib", "email.mime.multipart") if m in sys.modules]
+print(json.dumps({"primero": primero, "rerun": sorted(reruns)[len(reruns) // 2], "pesados": pesados}))
+""" % RERUNS
+
+def medir(directorio, n):
+    res = []
+    for _ in range(n):
+        out = subprocess.run([sys.executable, "-c", MEDIR], cwd=directorio, capture_output=True, text=True, check=True)
+        res.append(json.loads(out.stdout.strip().splitlines()[-1]))
+    return {"primero_ms": statistics.median(r["primero"] for r in res) * 1000,
+            "rerun_ms": statistics.median(r["rerun"] for r in res) * 1000, "pesados": res[-1]["pesados"]}
+
+def extraer(rev, destino):
+    arch = subprocess.run(["git", "archive", rev], cwd=RAIZ, capture_output=True, check=True).stdout
+    subprocess.run(["tar", "-x", "-C", destino], input=arch, check=True)
+    return destino
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    ref = args[args.index("--ref") + 1] if "--ref" in args else None
+    args = [a for i, a in enumerate(args) if a != "--ref" and (i == 0 or args[i - 1] != "--ref")]
+    n = int(args[0]) if args else 5
+    versiones = [("actual", RAIZ)]
+    tmp = tempfile.TemporaryDirectory()
+    if ref: versiones.insert(0, (ref, extraer(ref, tmp.name)))
+    print(f"{'versión':>10} {'primer pintado (ms)':>20} {'rerun p50 (ms)':>15}  módulos pesados cargados")
+    for nombre, d in versiones:
+        r = medir(d, n)
+        print(f"{nombre:>10} {r['primero_ms']:>20.0f} {r['rerun_ms']:>15.1f}  {', '.join(r['pesados']) or '-'}")
+    tmp.cleanup()
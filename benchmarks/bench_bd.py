@@ -0,0 +1,39 @@
+"""Escritura en BD contra SupabaseSimulado: inserts secuenciales (forma original) vs bd.py.
+
+Uso: python benchmarks/bench_bd.py [sedes] [usuarios] [latencia_s]   (por defecto 80 6000 0.05)
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from bd import insertar_cliente, insertar_sedes, insertar_usuarios, payload_cliente, payload_sede, payload_usuarios
+from simuladores import SupabaseSimulado
+
+def datos(n_sedes, n_usuarios):
+    cliente = {k: "X" for k in ["razon_social", "nit", "email", "telefono", "responsable", "cargo", "direccion", "municipio", "departamento"]}
+    sedes = [{"nombre": f"SEDE {i}", "direccion": "CL 1", "departamento": "ANTIOQUIA", "municipio": "MEDELLIN", "responsable": "R", "email": "r@x.co", "telefono": "1"} for i in range(n_sedes)]
+    usuarios = [{"Nombres": "JOSE", "Apellidos": "PEREZ", "Tipo Doc": "CC", "Documento": str(10_000_000 + i), "Correo": f"u{i}@x.co", "F. Nacimiento": "1990-01-01",
+                 "Genero": "MASCULINO", "Nivel": "PROFESIONAL", "Titulo": "FISICOS", "Ocupacion": "FISICO MEDICO", "Area": "RADIOLOGIA", "Otra Area": "",
+                 "Sede": f"SEDE {i % n_sedes}", "Cobertura": "ARL", "Tecnologia": "TLD", "Periodicidad": "MENSUAL", "Ubicaciones": "TORAX", "F. Inicio": "2026-01-01"} for i in range(n_usuarios)]
+    return cliente, sedes, usuarios
+
+def secuencial(sb, cliente, sedes, usuarios):
+    cid = sb.table("clientes").insert(payload_cliente(cliente)).execute().data[0]['id']
+    map_sid = {s["nombre"]: sb.table("sedes").insert(payload_sede(cid, s)).execute().data[0]['id'] for s in sedes}
+    ubd = payload_usuarios(usuarios, map_sid)
+    for i in range(0, len(ubd), 100): sb.table("usuarios").insert(ubd[i:i+100]).execute()
+
+def por_lotes(sb, cliente, sedes, usuarios):
+    cid = insertar_cliente(sb, cliente)
+    insertar_usuarios(sb, payload_usuarios(usuarios, insertar_sedes(sb, cid, sedes)))
+
+if __name__ == "__main__":
+    n_sedes, n_usuarios = (int(a) for a in (sys.argv[1:3] or [80, 6000]))
+    latencia = float(sys.argv[3]) if len(sys.argv) > 3 else 0.05
+    for nombre, fn in [("secuencial", secuencial), ("lotes paralelos", por_lotes)]:
+        sb = SupabaseSimulado(latencia)
+        t0 = time.perf_counter(); fn(sb, *datos(n_sedes, n_usuarios)); t = time.perf_counter() - t0
+        filas = len(sb.tablas.get("usuarios", []))
+        assert filas == n_usuarios and len({u["sede_id"] for u in sb.tablas["usuarios"]}) == n_sedes
+        print(f"{nombre:>16}: {t:7.2f} s  {len(sb.llamadas):4d} llamadas  {filas} usuarios")
@@ -0,0 +1,180 @@
+"""Prueba de carga: muchas sesiones simultáneas de app.py con AppTest, contra Supabase y SMTP simulados.
+
+Uso: python benchmarks/bench_concurrencia.py [--sesiones 1 2 4 8] [--rondas R] [--sedes N] [--usuarios M]
+                                             [--latencia-bd S] [--latencia-smtp S] [--salida archivo.json]
+
+Cada sesión hace el flujo completo de un cliente (datos del cliente, sedes, carga masiva de un .xlsx, enviar y
+confirmar) y cada nivel de --sesiones las lanza a la vez en hilos del mismo proceso, como las sesiones de un
+servidor Streamlit. Todas comparten los recursos en caché (cliente Supabase, índice DANE, bandeja de salida), así
+que una sesión lenta que bloquee a las demás se ve como un aumento de latencia de los pasos con la concurrencia.
+
+Se reporta por nivel y paso p50/p90/p99/máx (ms) y el rendimiento en sesiones completas por minuto.
+Supabase es simuladores.SupabaseSimulado y el SMTP un ServidorSMTPSimulado local, ambos con latencia configurable.
+La app corre en un directorio temporal: .envios, .borradores y la bandeja no tocan los del repositorio.
+
+AppTest no reejecuta los diálogos (fragmentos) por separado: el botón del diálogo se pulsa junto con el que lo
+abre, así que esos pasos incluyen una ejecución completa del script (un poco más caro que en el navegador).
+"""
+import argparse
+import io
+import json
+import logging
+import os
+import shutil
+import smtplib
+import sys
+import tempfile
+import threading
+import time
+import types
+from contextlib import nullcontext
+from unittest.mock import MagicMock
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ); sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from sinteticos import generar_cliente, generar_sedes, generar_df
+from bench_suite import commit
+from simuladores import SupabaseSimulado, ServidorSMTPSimulado
+
+ARCHIVOS_APP = ["ciudades.csv", "logo.png", "Política_Cartera.jpg"]
+PASOS = ["inicio", "cliente", "sede", "carga", "validar", "guardar"]
+MIME_XLSX = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+# --- ENTORNO SIMULADO ---
+def preparar_streamlit(secretos):
+    """AppTest cambia en cada run estado global (Runtime, secrets, config) y recompila el script; con varias
+    sesiones a la vez se fija una sola vez para todo el proceso, como en un servidor real."""
+    import streamlit as st
+    from streamlit import config
+    from streamlit.runtime import Runtime
+    from streamlit.runtime.caching.storage.dummy_cache_storage import MemoryCacheStorageManager
+    from streamlit.runtime.media_file_manager import MediaFileManager
+    from streamlit.runtime.memory_media_file_storage import MemoryMediaFileStorage
+    from streamlit.runtime.secrets import Secrets
+    from streamlit.runtime.dataframe_source_manager import DataframeSourceManager
+    from streamlit.runtime.scriptrunner.script_cache import ScriptCache
+    from streamlit.testing.v1 import app_test, local_script_runner
+    rt = MagicMock(spec=Runtime)
+    rt.media_file_mgr = MediaFileManager(MemoryMediaFileStorage("/mock/media"))
+    rt.dataframe_source_mgr = DataframeSourceManager()
+    rt.cache_storage_manager = MemoryCacheStorageManager()
+    Runtime.instance = classmethod(lambda cls: rt); Runtime.exists = classmethod(lambda cls: True)
+    sec = Secrets(); sec._secrets = secretos; st.secrets = sec
+    config.set_option("global.appTest", True)
+    app_test.patch_config_options = lambda opciones: nullcontext()
+    cache = ScriptCache()  # app.py se compila una vez (ast.parse de 3.11 no es seguro entre hilos)
+    app_test.ScriptCache = local_script_runner.ScriptCache = lambda: cache
+    for nombre in [n for n in logging.root.manager.loggerDict if n.startswith("streamlit")]: logging.getLogger(nombre).setLevel(logging.ERROR)
+
+def preparar_servicios(latencia_bd, latencia_smtp):
+    sb = SupabaseSimulado(latencia_bd)
+    mod = types.ModuleType("supabase"); mod.create_client = lambda url, clave: sb
+    sys.modules["supabase"] = mod  # app.cliente_supabase() lo importa al primer uso
+    smtp = ServidorSMTPSimulado(latencia_smtp).iniciar()
+    smtplib.SMTP_SSL = lambda host, puerto, timeout=30: smtplib.SMTP("127.0.0.1", smtp.puerto, timeout=timeout)
+    return sb, smtp
+
+# --- SESIÓN ---
+def _boton(at, texto): return next(b for b in at.button if texto in b.label)
+def _texto(at, etiqueta): return next(t for t in at.text_input if t.label == etiqueta)
+
+def sesion(nit, sedes, libro):
+    """Flujo completo de un cliente. Retorna ([(paso, segundos)], error o None)."""
+    from streamlit.testing.v1 import AppTest
+    at, tiempos = AppTest.from_file(os.path.join(RAIZ, "app.py"), default_timeout=600), []
+    def paso(nombre, accion):
+        t0 = time.perf_counter(); accion(); tiempos.append((nombre, time.perf_counter() - t0))
+        if at.exception: raise RuntimeError(f"{nombre}: {at.exception[0].message}")
+    try:
+        paso("inicio", at.run)
+        cli = dict(generar_cliente(), nit=nit)
+        def cliente():
+            for etiqueta, k in [("Razón", "razon_social"), ("NIT", "nit"), ("Email", "email"), ("Tel", "telefono"), ("Resp", "responsable"), ("Cargo", "cargo"), ("Dir", "direccion")]:
+                _texto(at, etiqueta).set_value(cli[k])
+            at.selectbox(key="cd").set_value("ANTIOQUIA").run(); at.selectbox(key="cm").set_value("MEDELLIN").run()
+        paso("cliente", cliente)
+        for s in sedes:
+            paso("sede", _boton(at, "➕").click().run)  # abre el diálogo
+            _texto(at, "Nombre Sede").set_value(s["nombre"]); _boton(at, "➕").click(); _boton(at, "Guardar Sede").click()
+            paso("sede", at.run)
+        def carga():
+            next(f for f in at.file_uploader if f.label == "Excel").set_value(("nomina.xlsx", libro, MIME_XLSX)); at.run()
+            _boton(at, "Procesar").click().run()
+        paso("carga", carga)
+        paso("validar", _boton(at, "ENVIAR").click().run)
+        if [e.value for e in at.error]: return tiempos, f"validación: {at.error[0].value}"
+        _boton(at, "ENVIAR").click(); _boton(at, "REGISTRAR").click()
+        paso("guardar", at.run)
+        if "envio_exitoso" not in at.session_state: return tiempos, f"guardar: {[e.value for e in at.error]}"
+        return tiempos, None
+    except Exception as e: return tiempos, f"{type(e).__name__}: {e}"
+
+# --- REPORTE ---
+def percentil(xs, p):
+    xs = sorted(xs)
+    return xs[min(len(xs) - 1, max(0, round(p / 100 * len(xs) + 0.5) - 1))] if xs else 0.0
+
+def nivel(k, rondas, sedes, libro, prefijo):
+    """k sesiones a la vez, cada una con `rondas` clientes seguidos."""
+    muestras, errores, barrera = [], [], threading.Barrier(k)
+    def trabajador(i):
+        barrera.wait()
+        for r in range(rondas):
+            tiempos, err = sesion(f"{prefijo}{i:03d}{r:02d}", sedes, libro)
+            muestras.extend(tiempos)
+            if err: errores.append(err)
+    hilos = [threading.Thread(target=trabajador, args=(i,)) for i in range(k)]
+    t0 = time.perf_counter()
+    for h in hilos: h.start()
+    for h in hilos: h.join()
+    muro = time.perf_counter() - t0
+    pasos = {p: [s for n, s in muestras if n == p] for p in PASOS}
+    return {"sesiones": k, "rondas": rondas, "completas": k * rondas - len(errores), "errores": errores[:5], "muro_s": muro,
+            "sesiones_por_min": (k * rondas - len(errores)) / muro * 60,
+            "pasos": {p: {"n": len(xs), "p50_ms": percentil(xs, 50) * 1000, "p90_ms": percentil(xs, 90) * 1000,
+                          "p99_ms": percentil(xs, 99) * 1000, "max_ms": max(xs, default=0) * 1000} for p, xs in pasos.items() if xs}}
+
+def imprimir(r):
+    print(f"\n{r['sesiones']} sesiones x {r['rondas']}: {r['completas']} completas en {r['muro_s']:.1f} s -> {r['sesiones_por_min']:.1f} sesiones/min")
+    print(f"  {'paso':<9} {'n':>5} {'p50 ms':>9} {'p90 ms':>9} {'p99 ms':>9} {'máx ms':>9}")
+    for p, x in r["pasos"].items(): print(f"  {p:<9} {x['n']:>5} {x['p50_ms']:>9.0f} {x['p90_ms']:>9.0f} {x['p99_ms']:>9.0f} {x['max_ms']:>9.0f}")
+    for e in r["errores"]: print(f"  ⚠️ {e}")
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Sesiones simultáneas de app.py con AppTest.")
+    ap.add_argument("--sesiones", type=int, nargs="+", default=[1, 2, 4, 8])
+    ap.add_argument("--rondas", type=int, default=1, help="clientes seguidos por sesión en cada nivel")
+    ap.add_argument("--sedes", type=int, default=3)
+    ap.add_argument("--usuarios", type=int, default=500, help="filas del .xlsx de carga masiva")
+    ap.add_argument("--latencia-bd", type=float, default=0.05)
+    ap.add_argument("--latencia-smtp", type=float, default=0.2)
+    ap.add_argument("--salida")
+    a = ap.parse_args(argv)
+    salida = os.path.abspath(a.salida) if a.salida else None
+    tmp = tempfile.mkdtemp(prefix="carga-")
+    for f in ARCHIVOS_APP:
+        if os.path.exists(os.path.join(RAIZ, f)): os.symlink(os.path.join(RAIZ, f), os.path.join(tmp, f))
+    os.chdir(tmp)
+    preparar_streamlit({"SUPABASE_URL": "http://supabase.simulado", "SUPABASE_KEY": "simulada", "GMAIL_USER": "sievert@simulado.co",
+                        "GMAIL_PASSWORD": "simulada", "EMAIL_DESTINO_INTERNO": "interno@simulado.co"})
+    sb, smtp = preparar_servicios(a.latencia_bd, a.latencia_smtp)
+    sedes = generar_sedes(a.sedes); buf = io.BytesIO()
+    generar_df(a.usuarios, sedes).to_excel(buf, index=False); libro = buf.getvalue()
+    meta = {"fecha": time.strftime("%Y-%m-%dT%H:%M:%S"), "commit": commit(), "sedes": a.sedes, "usuarios": a.usuarios,
+            "latencia_bd": a.latencia_bd, "latencia_smtp": a.latencia_smtp}
+    resultados = []
+    try:
+        sesion("800000000", sedes, libro)  # calentamiento: imports y recursos en caché, fuera de la medición
+        for j, k in enumerate(a.sesiones, 1):
+            r = nivel(k, a.rondas, sedes, libro, f"8{j:02d}"); resultados.append(r); imprimir(r)
+        print(f"\nBD simulada: {len(sb.llamadas)} llamadas, {len(sb.tablas.get('usuarios', []))} filas de usuarios."
+              f" SMTP simulado: {len(smtp.mensajes)} correos entregados (la bandeja respeta el ritmo de Gmail; el resto queda en cola).")
+        if salida:
+            with open(salida, "w", encoding="utf-8") as f: json.dump({"meta": meta, "niveles": resultados}, f, ensure_ascii=False, indent=1)
+            print(f"Resultados: {salida}")
+    finally:
+        smtp.detener(); os.chdir(RAIZ); shutil.rmtree(tmp, ignore_errors=True)
+    return 0 if all(r["completas"] == r["sesiones"] * r["rondas"] for r in resultados) else 2
+
+if __name__ == "__main__":
+    sys.exit(main())
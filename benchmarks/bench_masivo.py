@@ -0,0 +1,86 @@
+"""Compara procesar_df_masivo (por columnas) contra el recorrido original con df.iterrows().
+
+Uso: python benchmarks/bench_masivo.py [filas ...]   (por defecto 1000 10000 100000)
+"""
+import os
+import random
+import sys
+import time
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from comun import LISTAS, limpiar_texto, get_primer_dia_mes
+from masivo import procesar_df_masivo
+from tabla import expandir
+
+SEDES = [{"nombre": f"SEDE {i}"} for i in range(1, 21)] + [{"nombre": "CLINICA SAN JOSÉ"}]
+NOMBRES = ["José", "María", "Ángela", "Nicolás", "Sofía", "Juan", "Andrés", "Lucía", "Iván", "Camila"]
+APELLIDOS = ["Gómez", "Pérez", "Muñoz", "Rodríguez", "Díaz", "López", "Martínez", "Suárez", "Castaño", "Ríos"]
+
+def generar_df(n, semilla=0):
+    """Hoja sintética con ~3% de filas inválidas y Ubicaciones múltiples."""
+    rnd = random.Random(semilla)
+    ch = lambda l: [rnd.choice(l) for _ in range(n)]
+    df = pd.DataFrame({
+        "Nombres": ch(NOMBRES), "Apellidos": ch(APELLIDOS), "Tipo Doc": ch(LISTAS["TIPO_DOC"]),
+        "Documento": [float(10_000_000 + i) for i in range(n)], "Correo": [f"Usuario{i}@Clinica.com" for i in range(n)],
+        "F. Nacimiento (YYYY-MM-DD)": pd.to_datetime([f"19{rnd.randint(50, 99)}-0{rnd.randint(1, 9)}-1{rnd.randint(0, 9)}" for _ in range(n)]),
+        "Genero": ch(LISTAS["GENERO"]), "Nivel Educativo": ch(LISTAS["NIVEL_EDUCATIVO"]), "Titulo": ch(LISTAS["TITULO"]),
+        "Ocupacion": ch(LISTAS["OCUPACION"]), "Area": ch(LISTAS["AREA"]), "Otra Area": ch(["", "Física", "Laboratorio"]),
+        "Sede": ch([s["nombre"].lower() for s in SEDES]), "Cobertura": ch(LISTAS["COBERTURA"]), "Tecnologia": ch(LISTAS["TECNOLOGIA"]),
+        "Periodicidad": ch(LISTAS["PERIODICIDAD"]), "Ubicaciones": ch(["TORAX", "TORAX, ANILLO", "CRISTALINO; ANILLO", "TORAX,"]),
+        "Mes Inicio": ch([m.capitalize() for m in LISTAS["MESES"]]), "Año Inicio": ch([2025, 2026]),
+    })
+    df = df.replace("", np.nan)
+    for col, val in [("Documento", np.nan), ("Sede", "NO EXISTE"), ("Nombres", np.nan), ("Ubicaciones", np.nan)]:
+        df.loc[df.sample(frac=0.008, random_state=rnd.randint(0, 9999)).index, col] = val
+    return df
+
+def procesar_fila_a_fila(df, sedes):
+    """Implementación original de procesar_excel_masivo (referencia)."""
+    df.columns = [c.strip() for c in df.columns]
+    sm = {limpiar_texto(s["nombre"]): s["nombre"] for s in sedes}
+    if not sm: return None, ["Cree al menos una sede."]
+    err, pro = [], []
+    for i, r in df.iterrows():
+        f = i + 2
+        nm, ap = limpiar_texto(r.get("Nombres")), limpiar_texto(r.get("Apellidos"))
+        dc = str(r.get("Documento")).split('.')[0]
+        sd = limpiar_texto(r.get("Sede"))
+        ar, oa = limpiar_texto(r.get("Area")), limpiar_texto(r.get("Otra Area"))
+        if ar == "OTRO" and not oa: err.append(f"Fila {f}: Falta 'Otra Area'"); continue
+        if not nm or not ap: err.append(f"Fila {f}: Falta Nombre/Apellido"); continue
+        if not dc or dc == "nan": err.append(f"Fila {f}: Falta Documento"); continue
+        rs = sm.get(sd)
+        if not rs: err.append(f"Fila {f}: Sede '{r.get('Sede')}' no existe."); continue
+        fn = str(r.get("F. Nacimiento (YYYY-MM-DD)")).split()[0]
+        fi = get_primer_dia_mes(limpiar_texto(r.get("Mes Inicio")), r.get("Año Inicio"))
+        ub = str(r.get("Ubicaciones")).upper()
+        if ub in ["NAN", "NONE", ""]: err.append(f"Fila {f}: Falta Ubicación"); continue
+        for ubic in [u.strip() for u in ub.replace(';',',').split(',') if u.strip()]:
+            pro.append({
+                "Nombres":nm,"Apellidos":ap,"Tipo Doc":r.get("Tipo Doc"),"Documento":dc,"Correo":str(r.get("Correo")).lower(),
+                "F. Nacimiento":fn,"Genero":str(r.get("Genero")).upper(),"Nivel":str(r.get("Nivel Educativo")).upper(),"Titulo":str(r.get("Titulo")).upper(),
+                "Ocupacion":str(r.get("Ocupacion")).upper(),"Area":ar,"Otra Area":oa,"Sede":rs,
+                "Cobertura":str(r.get("Cobertura")).upper(),"Tecnologia":str(r.get("Tecnologia")).upper(),"Periodicidad":str(r.get("Periodicidad")).upper(),
+                "Ubicaciones":ubic,"F. Inicio":str(fi)
+            })
+    return pro, err
+
+def _normalizar(registros):
+    return [{k: ("" if pd.isna(v) else v) for k, v in r.items()} for r in registros]
+
+def cronometrar(fn, *args):
+    t0 = time.perf_counter(); res = fn(*args); return time.perf_counter() - t0, res
+
+if __name__ == "__main__":
+    tamanos = [int(a) for a in sys.argv[1:]] or [1_000, 10_000, 100_000]
+    print(f"{'filas':>8} {'fila a fila (s)':>16} {'columnas (s)':>13} {'aceleración':>12}  registros  errores")
+    for n in tamanos:
+        df = generar_df(n)
+        t_old, (pro_old, err_old) = cronometrar(procesar_fila_a_fila, df.copy(), SEDES)
+        t_new, (pro_new, err_new) = cronometrar(procesar_df_masivo, df.copy(), SEDES)
+        assert err_old == err_new, "Los mensajes de error difieren"
+        assert _normalizar(pro_old) == _normalizar(expandir(pro_new)), "Los registros difieren"
+        print(f"{n:>8} {t_old:>16.3f} {t_new:>13.3f} {t_old / t_new:>11.1f}x  {len(pro_old):>9}  {len(err_new):>7}")
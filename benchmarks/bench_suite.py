@@ -0,0 +1,227 @@
+"""Micro-benchmarks de los caminos calientes de ingreso y guardado, con datos sintéticos (ver sinteticos.py).
+
+Uso: python benchmarks/bench_suite.py [--sedes N ...] [--usuarios M ...] [--repeticiones R] [--casos texto]
+                                      [--salida archivo.json] [--comparar anterior.json] [--umbral 1.25]
+
+Cada caso mide la función de la que depende el wrapper de app.py (que solo agrega Streamlit encima):
+  cargar_datos_colombia           -> geo.cargar_indice + corregir_registros de las sedes
+  generar_plantilla_excel         -> plantilla.construir_plantilla
+  procesar_excel_masivo           -> ingreso.leer_excel_masivo sobre el .xlsx en memoria; .hojas / .hojas_pool:
+                                     ingreso.leer_libros con un libro de una hoja por sede, en serie y con el pool
+  validar_tabla_usuarios_estricta -> ingreso.validar_usuarios (validador nuevo y revalidación con memo)
+  limpiar_texto                   -> comun.limpiar_texto sobre nombres con tildes
+  guardar_en_base_datos           -> bd.payload_usuarios y bd.guardar_reanudable contra SupabaseSimulado
+  enviar_correo_gmail             -> correo.construir_mensaje + serialización (lo que hace la bandeja por mensaje)
+  procesar_notificaciones.nomina  -> nomina.escribir_nomina (libro por sede del correo interno)
+
+Los resultados quedan en JSON (por defecto benchmarks/resultados/<fecha>-<commit>.json). Con --comparar se
+muestra la razón contra una corrida anterior y el código de salida es 3 si algún caso empeoró más que --umbral.
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from sinteticos import NOMBRES, APELLIDOS, generar_cliente, generar_sedes, generar_df, generar_tabla
+
+# --- CASOS ---
+# Cada caso recibe (sedes, usuarios, tmp) y retorna (fn, unidades): fn() es lo que se cronometra.
+
+def caso_geo(n_sedes, m, tmp):
+    from geo import cargar_indice
+    sedes = generar_sedes(n_sedes)
+    def fn():
+        geo = cargar_indice("ciudades.csv")
+        geo.corregir_registros([dict(s) for s in sedes])
+    return fn, 1
+
+def caso_plantilla(n_sedes, m, tmp):
+    from plantilla import construir_plantilla
+    nombres = [s["nombre"] for s in generar_sedes(n_sedes)]
+    return (lambda: construir_plantilla(nombres)), 1
+
+def caso_excel(n_sedes, m, tmp):
+    from ingreso import leer_excel_masivo
+    sedes = generar_sedes(n_sedes); buf = io.BytesIO()
+    generar_df(m, sedes, errores=0.01).to_excel(buf, index=False)
+    datos = buf.getvalue()
+    return (lambda: leer_excel_masivo(io.BytesIO(datos), sedes)), m
+
+_POOL = []
+
+def libro_por_sede(n_sedes, m, tmp):
+    """Libro con una hoja por sede (m usuarios repartidos) más la hoja 'Listas' de la plantilla."""
+    import pandas as pd
+    sedes, ruta = generar_sedes(n_sedes), os.path.join(tmp, f"hojas-{n_sedes}-{m}.xlsx")
+    with pd.ExcelWriter(ruta) as w:
+        for i, s in enumerate(sedes): generar_df(max(1, m // n_sedes), [s], semilla=i).to_excel(w, sheet_name=f"Sede {i + 1}", index=False)
+        pd.DataFrame({"S": [s["nombre"] for s in sedes]}).to_excel(w, sheet_name="Listas", index=False)
+    return sedes, ruta
+
+def caso_hojas(n_sedes, m, tmp):
+    from ingreso import leer_libros
+    sedes, ruta = libro_por_sede(n_sedes, m, tmp)
+    return (lambda: leer_libros([("libro.xlsx", ruta)], sedes)), m
+
+def caso_hojas_pool(n_sedes, m, tmp):
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+    from ingreso import leer_libros
+    if not _POOL: _POOL.append(ProcessPoolExecutor(max_workers=os.cpu_count() or 2, mp_context=multiprocessing.get_context("spawn")))
+    sedes, ruta = libro_por_sede(n_sedes, m, tmp)
+    leer_libros([("libro.xlsx", ruta)], sedes, _POOL[0])  # procesos ya iniciados, como en el servidor
+    return (lambda: leer_libros([("libro.xlsx", ruta)], sedes, _POOL[0])), m
+
+def caso_nomina(n_sedes, m, tmp):
+    from nomina import escribir_nomina
+    sedes = generar_sedes(n_sedes); tabla = generar_tabla(m, sedes)
+    return (lambda: escribir_nomina(tmp, generar_cliente(), sedes, tabla)), m
+
+def caso_validar(n_sedes, m, tmp):
+    from ingreso import validar_usuarios
+    from validacion import ValidadorUsuarios
+    tabla = generar_tabla(m, generar_sedes(n_sedes))
+    return (lambda: validar_usuarios(tabla, ValidadorUsuarios())), m
+
+def caso_revalidar(n_sedes, m, tmp):
+    from ingreso import validar_usuarios
+    from validacion import ValidadorUsuarios
+    tabla, v = generar_tabla(m, generar_sedes(n_sedes)), ValidadorUsuarios()
+    validar_usuarios(tabla, v)  # el formulario revalida con el memo de la corrida anterior
+    return (lambda: validar_usuarios(tabla, v)), m
+
+def caso_limpiar(n_sedes, m, tmp):
+    from comun import limpiar_texto
+    textos = [f" {NOMBRES[i % len(NOMBRES)]} {APELLIDOS[i % len(APELLIDOS)]} " for i in range(m)]
+    return (lambda: [limpiar_texto(t) for t in textos]), m
+
+def caso_payload(n_sedes, m, tmp):
+    from bd import payload_usuarios
+    from tabla import a_registros
+    sedes = generar_sedes(n_sedes); tabla = generar_tabla(m, sedes)
+    map_sid = {s["nombre"]: i for i, s in enumerate(sedes, 1)}
+    return (lambda: payload_usuarios(a_registros(tabla), map_sid)), m
+
+def caso_guardar(n_sedes, m, tmp):
+    from bd import PuntoControl, clave_idempotencia, guardar_reanudable
+    from simuladores import SupabaseSimulado
+    from tabla import a_registros
+    cliente, sedes = generar_cliente(), generar_sedes(n_sedes)
+    usuarios = a_registros(generar_tabla(m, sedes))
+    clave = clave_idempotencia(cliente, sedes, usuarios)
+    def fn():  # punto de control nuevo en cada repetición: si no, la segunda ya estaría "completa"
+        guardar_reanudable(SupabaseSimulado(), cliente, sedes, usuarios, pc=PuntoControl(clave, tempfile.mkdtemp(dir=tmp)))
+    return fn, m
+
+def caso_mime(n_sedes, m, tmp):
+    from correo import HTML_BIENVENIDA, construir_mensaje
+    from ingreso import ADJUNTO_POLITICA, ASUNTO_BIENVENIDA
+    cliente = generar_cliente()
+    html = HTML_BIENVENIDA.render(responsable=cliente["responsable"], n_usuarios=m, nit_limpio="900123456")
+    hacer = lambda: construir_mensaje("sievert@gmail.com", cliente["email"], ASUNTO_BIENVENIDA, html, [ADJUNTO_POLITICA]).as_bytes()
+    hacer()  # el adjunto se codifica una vez por proceso
+    return hacer, 1
+
+# (nombre, función, usa sedes, usa usuarios): los que no dependen de un parámetro no se repiten por él
+CASOS = [
+    ("cargar_datos_colombia", caso_geo, True, False),
+    ("generar_plantilla_excel", caso_plantilla, True, False),
+    ("procesar_excel_masivo", caso_excel, True, True),
+    ("procesar_excel_masivo.hojas", caso_hojas, True, True),
+    ("procesar_excel_masivo.hojas_pool", caso_hojas_pool, True, True),
+    ("validar_tabla_usuarios_estricta", caso_validar, True, True),
+    ("validar_tabla_usuarios_estricta.memo", caso_revalidar, True, True),
+    ("limpiar_texto", caso_limpiar, False, True),
+    ("guardar_en_base_datos.payload", caso_payload, True, True),
+    ("guardar_en_base_datos.simulado", caso_guardar, True, True),
+    ("enviar_correo_gmail.mime", caso_mime, False, False),
+    ("procesar_notificaciones.nomina", caso_nomina, True, True),
+]
+
+def cronometrar(fn, repeticiones):
+    tiempos = []
+    for _ in range(repeticiones):
+        t0 = time.perf_counter(); fn(); tiempos.append(time.perf_counter() - t0)
+    return tiempos
+
+def commit():
+    try: return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=RAIZ, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError): return "sin-git"
+
+def correr(sedes, usuarios, repeticiones, filtro=""):
+    resultados, tmp = [], tempfile.mkdtemp(prefix="bench-")
+    try:
+        for nombre, caso, usa_sedes, usa_usuarios in CASOS:
+            if filtro and filtro not in nombre: continue
+            vistos = set()
+            for n in sedes:
+                for m in usuarios:
+                    clave = (n if usa_sedes else None, m if usa_usuarios else None)
+                    if clave in vistos: continue
+                    vistos.add(clave)
+                    fn, unidades = caso(n, m, tmp)
+                    t = cronometrar(fn, repeticiones)
+                    r = {"caso": nombre, "sedes": clave[0], "usuarios": clave[1], "repeticiones": repeticiones,
+                         "min_s": min(t), "mediana_s": statistics.median(t), "max_s": max(t), "us_por_unidad": statistics.median(t) / unidades * 1e6}
+                    resultados.append(r); print(formato(r), flush=True)
+    finally: shutil.rmtree(tmp, ignore_errors=True)
+    return resultados
+
+def llave(r): return (r["caso"], r["sedes"], r["usuarios"])
+
+def formato(r, previo=None, umbral=None):
+    linea = f"{r['caso']:<38} {str(r['sedes'] or '-'):>6} {str(r['usuarios'] or '-'):>8} {r['mediana_s'] * 1000:>11.2f} {r['min_s'] * 1000:>11.2f} {r['us_por_unidad']:>10.2f}"
+    if previo:
+        razon = r["mediana_s"] / previo["mediana_s"] if previo["mediana_s"] else float("inf")
+        linea += f" {razon:>7.2f}x" + ("  REGRESIÓN" if razon > umbral else "")
+    return linea
+
+def comparar(resultados, anterior, umbral):
+    """Imprime la tabla con la razón contra la corrida anterior; retorna los casos que empeoraron."""
+    previos = {llave(r): r for r in anterior["resultados"]}
+    print(f"\nContra {anterior['meta']['commit']} ({anterior['meta']['fecha']}):")
+    peores = []
+    for r in resultados:
+        p = previos.get(llave(r))
+        print(formato(r, p, umbral) if p else formato(r) + "    nuevo")
+        if p and p["mediana_s"] and r["mediana_s"] / p["mediana_s"] > umbral: peores.append(r)
+    return peores
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Micro-benchmarks de ingreso y guardado.")
+    ap.add_argument("--sedes", type=int, nargs="+", default=[5, 50])
+    ap.add_argument("--usuarios", type=int, nargs="+", default=[1_000, 10_000])
+    ap.add_argument("--repeticiones", type=int, default=5)
+    ap.add_argument("--casos", default="", help="solo los casos cuyo nombre contiene este texto")
+    ap.add_argument("--salida")
+    ap.add_argument("--comparar")
+    ap.add_argument("--umbral", type=float, default=1.25, help="razón de la mediana a partir de la cual se marca regresión")
+    a = ap.parse_args(argv)
+    salida = os.path.abspath(a.salida) if a.salida else None
+    anterior = None
+    if a.comparar:
+        with open(a.comparar, encoding="utf-8") as f: anterior = json.load(f)
+    os.chdir(RAIZ)  # ciudades.csv y el adjunto se buscan relativos a la app
+    meta = {"fecha": time.strftime("%Y-%m-%dT%H:%M:%S"), "commit": commit(), "python": platform.python_version(),
+            "plataforma": platform.platform(), "sedes": a.sedes, "usuarios": a.usuarios, "repeticiones": a.repeticiones}
+    print(f"{'caso':<38} {'sedes':>6} {'usuarios':>8} {'mediana ms':>11} {'mín ms':>11} {'µs/unidad':>10}")
+    resultados = correr(a.sedes, a.usuarios, a.repeticiones, a.casos)
+    if not salida:
+        os.makedirs(os.path.join(RAIZ, "benchmarks", "resultados"), exist_ok=True)
+        salida = os.path.join(RAIZ, "benchmarks", "resultados", f"{time.strftime('%Y%m%d-%H%M%S')}-{meta['commit']}.json")
+    with open(salida, "w", encoding="utf-8") as f: json.dump({"meta": meta, "resultados": resultados}, f, ensure_ascii=False, indent=1)
+    print(f"\nResultados: {salida}")
+    if anterior and comparar(resultados, anterior, a.umbral): return 3
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,64 @@
+"""Datos sintéticos para los benchmarks: cliente, N sedes y M usuarios con valores de LISTAS y nombres con tildes.
+
+Todo es determinista para una semilla dada, así dos corridas miden exactamente la misma entrada.
+"""
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from comun import LISTAS
+
+NOMBRES = ["José", "María", "Ángela", "Nicolás", "Sofía", "Juan", "Andrés", "Lucía", "Iván", "Camila", "Martín", "Inés", "Óscar", "Mónica", "Ramón", "Zoé"]
+APELLIDOS = ["Gómez", "Pérez", "Muñoz", "Rodríguez", "Díaz", "López", "Martínez", "Suárez", "Castaño", "Ríos", "Peña", "Ibáñez", "Ordóñez", "Nariño"]
+SEDES_TIPO = ["Clínica", "Hospital", "Unidad Médica", "Centro Oncológico", "Consultorio Odontológico", "IPS"]
+MUNICIPIOS = [("Antioquia", "Medellín"), ("ANTIOQUIA", "ENVIGADO"), ("Bogotá D.C.", "Bogotá D.C."), ("Valle del Cauca", "Cali"),
+              ("Atlántico", "Barranquilla"), ("Santander", "Bucaramanga"), ("Boyacá", "Tunja"), ("Nariño", "Pasto"), ("Córdoba", "Montería")]
+UBICACIONES = ["TORAX", "TORAX, ANILLO", "CRISTALINO; ANILLO", "TORAX,", "MUÑECA", "TORAX, CRISTALINO, ANILLO"]
+
+def generar_cliente(semilla=0):
+    rnd = random.Random(semilla)
+    return {"razon_social": f"{rnd.choice(SEDES_TIPO)} {rnd.choice(APELLIDOS)} S.A.S.", "nit": f"900.{rnd.randint(100, 999)}.{rnd.randint(100, 999)}-{rnd.randint(0, 9)}",
+            "responsable": f"{rnd.choice(NOMBRES)} {rnd.choice(APELLIDOS)}", "cargo": "Oficial de Protección Radiológica", "email": "opr@clinica.com.co",
+            "telefono": "6041234567", "direccion": "Calle 10 # 43-12", "municipio": "Medellín", "departamento": "Antioquia"}
+
+def generar_sedes(n, semilla=0):
+    """n sedes con nombres únicos y departamento/municipio escritos como los digitaría un usuario."""
+    rnd = random.Random(semilla)
+    sedes = []
+    for i in range(1, n + 1):
+        dep, mun = rnd.choice(MUNICIPIOS)
+        sedes.append({"nombre": f"{rnd.choice(SEDES_TIPO).upper()} {rnd.choice(APELLIDOS).upper()} {i}", "direccion": f"Carrera {i} # {rnd.randint(1, 99)}-{rnd.randint(1, 99)}",
+                      "departamento": dep, "municipio": mun, "responsable": f"{rnd.choice(NOMBRES)} {rnd.choice(APELLIDOS)}",
+                      "email": f"sede{i}@clinica.com.co", "telefono": "6041234567"})
+    return sedes
+
+def generar_df(m, sedes, semilla=0, errores=0.0):
+    """Hoja de la plantilla de carga masiva con m filas; 'errores' es la fracción de filas con un dato faltante."""
+    import numpy as np
+    import pandas as pd
+    rnd = random.Random(semilla)
+    ch = lambda l: [rnd.choice(l) for _ in range(m)]
+    area = ch(LISTAS["AREA"])
+    df = pd.DataFrame({
+        "Nombres": ch(NOMBRES), "Apellidos": [f"{a} {b}" for a, b in zip(ch(APELLIDOS), ch(APELLIDOS))], "Tipo Doc": ch(LISTAS["TIPO_DOC"]),
+        "Documento": [float(10_000_000 + i) for i in range(m)], "Correo": [f"Usuario{i}@Clinica.com.co" for i in range(m)],
+        "F. Nacimiento (YYYY-MM-DD)": pd.to_datetime([f"19{rnd.randint(50, 99)}-{rnd.randint(1, 12):02d}-{rnd.randint(1, 28):02d}" for _ in range(m)]),
+        "Genero": ch(LISTAS["GENERO"]), "Nivel Educativo": ch(LISTAS["NIVEL_EDUCATIVO"]), "Titulo": ch(LISTAS["TITULO"]),
+        "Ocupacion": ch(LISTAS["OCUPACION"]), "Area": area, "Otra Area": ["Física Médica" if a == "OTRO" else "" for a in area],
+        "Sede": [s.lower() for s in ch([s["nombre"] for s in sedes])], "Cobertura": ch(LISTAS["COBERTURA"]), "Tecnologia": ch(LISTAS["TECNOLOGIA"]),
+        "Periodicidad": ch(LISTAS["PERIODICIDAD"]), "Ubicaciones": ch(UBICACIONES),
+        "Mes Inicio": ch([x.capitalize() for x in LISTAS["MESES"]]), "Año Inicio": ch([2025, 2026]),
+    })
+    df = df.replace("", np.nan)
+    if errores:
+        for col in ("Documento", "Nombres", "Ubicaciones"):
+            df.loc[df.sample(frac=errores / 3, random_state=rnd.randint(0, 9999)).index, col] = np.nan
+    return df
+
+def generar_tabla(m, sedes, semilla=0):
+    """Tabla de usuarios (una fila por persona) como la deja la carga masiva."""
+    from masivo import procesar_df_masivo
+    from tabla import a_tabla, compactar
+    us, _ = procesar_df_masivo(generar_df(m, sedes, semilla), sedes)
+    return a_tabla(compactar(us))
@@ -0,0 +1,168 @@
+import gzip
+import io
+import json
+import os
+import re
+import time
+from comun import CAMPOS_USUARIO
+
+# --- BORRADOR ---
+# Archivo gzip con JSON versionado; los usuarios van por columnas con diccionario (tabla.a_columnas).
+# Todo lo que se carga pasa por las mismas verificaciones de esquema (descarga manual y autoguardado).
+
+FORMATO, VERSION = "sievert-borrador", 2
+MAX_BYTES_BORRADOR = 256 * 1024 * 1024  # descomprimido
+CAMPOS_CLIENTE = ["razon_social", "nit", "responsable", "cargo", "email", "telefono", "direccion", "municipio", "departamento"]
+CAMPOS_SEDE = ["nombre", "direccion", "departamento", "municipio", "responsable", "email", "telefono"]
+
+class BorradorInvalido(ValueError): pass
+
+def _texto(v, donde):
+    if v is None: return ""
+    if isinstance(v, bool) or not isinstance(v, (str, int, float)): raise BorradorInvalido(f"{donde}: valor no es texto")
+    return str(v)
+
+def _cliente(d):
+    if not isinstance(d, dict): raise BorradorInvalido("'cliente' debe ser un objeto")
+    return {k: _texto(d.get(k), f"cliente.{k}") for k in CAMPOS_CLIENTE}
+
+def _sedes(lista):
+    if not isinstance(lista, list): raise BorradorInvalido("'sedes' debe ser una lista")
+    out, vistos = [], set()
+    for i, s in enumerate(lista, 1):
+        if not isinstance(s, dict): raise BorradorInvalido(f"sede {i}: debe ser un objeto")
+        s = {k: _texto(s.get(k), f"sede {i}.{k}") for k in CAMPOS_SEDE}
+        if not s["nombre"]: raise BorradorInvalido(f"sede {i}: falta 'nombre'")
+        if s["nombre"] in vistos: raise BorradorInvalido(f"sede {i}: nombre repetido '{s['nombre']}'")
+        vistos.add(s["nombre"]); out.append(s)
+    return out
+
+def _usuarios_columnas(d):
+    """Verifica el bloque {"n", "columnas"} de tabla.a_columnas."""
+    if not isinstance(d, dict) or not isinstance(d.get("columnas"), dict) or not isinstance(d.get("n"), int): raise BorradorInvalido("'usuarios' no tiene el formato por columnas")
+    n = d["n"]
+    for c, x in d["columnas"].items():
+        if c not in CAMPOS_USUARIO: raise BorradorInvalido(f"columna desconocida '{c}'")
+        if not isinstance(x, dict) or not isinstance(x.get("v"), list) or not isinstance(x.get("c"), list): raise BorradorInvalido(f"columna '{c}' mal formada")
+        if len(x["c"]) != n: raise BorradorInvalido(f"columna '{c}': {len(x['c'])} filas, se esperaban {n}")
+        x["v"] = [None if v is None else _texto(v, f"columna '{c}'") for v in x["v"]]
+        if any(not isinstance(i, int) or not 0 <= i < len(x["v"]) for i in x["c"]): raise BorradorInvalido(f"columna '{c}': códigos fuera de rango")
+    return d
+
+def _usuarios_registros(lista):
+    """Formato 1 (data.json): lista de registros, una fila por ubicación."""
+    if not isinstance(lista, list) or any(not isinstance(r, dict) for r in lista): raise BorradorInvalido("'usuarios' debe ser una lista de registros")
+    return [{c: None if r.get(c) is None else _texto(r.get(c), f"usuario {i}.{c}") for c in CAMPOS_USUARIO} for i, r in enumerate(lista, 1)]
+
+def _leer(datos):
+    """bytes (gzip o JSON plano del formato 1) -> objeto JSON, con tope de tamaño descomprimido."""
+    if datos[:2] == b"\x1f\x8b":
+        with gzip.GzipFile(fileobj=io.BytesIO(datos)) as f: datos = f.read(MAX_BYTES_BORRADOR + 1)
+    if len(datos) > MAX_BYTES_BORRADOR: raise BorradorInvalido("borrador demasiado grande")
+    try: return json.loads(datos)
+    except ValueError as e: raise BorradorInvalido(f"JSON inválido: {e}")
+
+def exportar(cliente, sedes, usuarios=None):
+    """bytes gzip del borrador; usuarios es la tabla (DataFrame) o None si está vacía."""
+    from tabla import a_columnas, tabla_vacia
+    d = {"formato": FORMATO, "version": VERSION, "creado": time.strftime("%Y-%m-%dT%H:%M:%S"),
+         "cliente": cliente, "sedes": sedes, "usuarios": a_columnas(usuarios if usuarios is not None else tabla_vacia())}
+    return gzip.compress(json.dumps(d, separators=(",", ":"), default=str).encode("utf-8"), compresslevel=6)
+
+def importar(datos):
+    """-> {"cliente", "sedes", "usuarios" (DataFrame)}. Lanza BorradorInvalido si algo no cumple el esquema."""
+    from tabla import a_tabla, compactar, desde_columnas
+    d = _leer(datos)
+    if not isinstance(d, dict): raise BorradorInvalido("el borrador debe ser un objeto JSON")
+    version = d.get("version", 1) if d.get("formato", FORMATO) == FORMATO else None
+    if version not in (1, VERSION): raise BorradorInvalido(f"formato/versión no soportado: {d.get('formato')} {d.get('version')}")
+    cliente, sedes = _cliente(d.get("cliente", {})), _sedes(d.get("sedes", []))
+    if version == 1: usuarios = a_tabla(compactar(_usuarios_registros(d.get("usuarios", []))))
+    else: usuarios = desde_columnas(_usuarios_columnas(d.get("usuarios")))
+    return {"cliente": cliente, "sedes": sedes, "usuarios": usuarios}
+
+# --- AUTOGUARDADO ---
+# Diario por NIT en DIR_AUTOGUARDADO/<nit>.jsonl.gz: una foto "base" y después solo operaciones
+# (cliente, sedes, filas agregadas, delta del editor), cada escritura como un miembro gzip anexado.
+# Al superar max_ops se reescribe con una foto nueva.
+
+DIR_AUTOGUARDADO = ".borradores"
+
+class Autoguardado:
+    def __init__(self, nit, directorio=DIR_AUTOGUARDADO, intervalo=30, max_ops=500):
+        self.nit = re.sub(r"\D", "", str(nit or ""))
+        self.ruta = os.path.join(directorio, f"{self.nit}.jsonl.gz")
+        self.intervalo, self.max_ops = intervalo, max_ops
+        self.pendientes, self.ultimo, self.n_ops, self.con_base = [], 0.0, 0, False
+        self._cliente = self._sedes = self._delta = None
+
+    def existe(self): return bool(self.nit) and os.path.exists(self.ruta)
+
+    def anotar(self, op, **datos):
+        """Operación ya aplicada a la tabla base: agregar (usuarios por columnas) o delta (ver, inicio, cambios)."""
+        if self.con_base: self.pendientes.append(json.loads(json.dumps({"op": op, **datos}, default=str)))  # copia
+
+    def reiniciar(self):
+        """La próxima escritura será una foto nueva (p. ej. tras cargar un borrador)."""
+        self.con_base, self.pendientes = False, []
+
+    def guardar(self, cliente, sedes, base, delta=None, forzar=False):
+        """base() -> tabla base (DataFrame o None), solo se pide para la foto. delta: (ver, inicio, cambios) del editor.
+        Retorna True si escribió."""
+        from tabla import a_columnas, tabla_vacia
+        if not self.nit or (not forzar and time.time() - self.ultimo < self.intervalo): return False
+        ops, nuevo = [], not self.con_base or self.n_ops >= self.max_ops
+        if nuevo:
+            b = base(); ops.append({"op": "base", "cliente": cliente, "sedes": sedes, "usuarios": a_columnas(b if b is not None else tabla_vacia())})
+            self._delta = None
+        else:
+            if cliente != self._cliente: ops.append({"op": "cliente", "cliente": cliente})
+            if sedes != self._sedes: ops.append({"op": "sedes", "sedes": sedes})
+            ops += self.pendientes
+        self._cliente, self._sedes = dict(cliente), [dict(s) for s in sedes]  # copias: la sesión los modifica en su lugar
+        firma = json.dumps(delta, sort_keys=True, default=str) if delta and any(delta[2].get(k) for k in ("edited_rows", "added_rows", "deleted_rows")) else None
+        if firma and firma != self._delta:
+            ops.append({"op": "delta", "ver": delta[0], "inicio": delta[1], "cambios": delta[2]}); self._delta = firma
+        self.pendientes, self.ultimo = [], time.time()
+        if not ops: return False
+        self._escribir(ops, nuevo); self.con_base = True
+        self.n_ops = len(ops) if nuevo else self.n_ops + len(ops)
+        return True
+
+    def _escribir(self, ops, nuevo):
+        os.makedirs(os.path.dirname(self.ruta) or ".", exist_ok=True)
+        datos = gzip.compress("".join(json.dumps(o, separators=(",", ":"), default=str) + "\n" for o in ops).encode("utf-8"))
+        if nuevo:
+            tmp = self.ruta + ".tmp"
+            with open(tmp, "wb") as f: f.write(datos)
+            os.replace(tmp, self.ruta)
+        else:
+            with open(self.ruta, "ab") as f: f.write(datos)
+
+    def recuperar(self):
+        """Reconstruye {"cliente", "sedes", "usuarios"} repitiendo el diario; una línea final cortada se descarta."""
+        from tabla import agregar, aplicar_cambios, desde_columnas
+        ops = []
+        try:
+            with gzip.open(self.ruta, "rt", encoding="utf-8") as f:
+                for linea in f: ops.append(json.loads(linea))
+        except (OSError, EOFError, ValueError): pass  # escritura interrumpida: se usa lo leído hasta ahí
+        if not ops or ops[0].get("op") != "base": raise BorradorInvalido("autoguardado sin foto base")
+        estado, pend = {}, None
+        def aplicar(p):
+            if p: estado["usuarios"] = aplicar_cambios(estado["usuarios"], p["cambios"], p["inicio"])
+        for o in ops:
+            if o["op"] == "delta":
+                if pend and pend["ver"] != o["ver"]: aplicar(pend)
+                pend = o; continue  # el delta de una versión es acumulado: vale el último
+            if o["op"] in ("base", "agregar"): aplicar(pend); pend = None
+            if o["op"] == "base": estado = {"cliente": _cliente(o["cliente"]), "sedes": _sedes(o["sedes"]), "usuarios": desde_columnas(_usuarios_columnas(o["usuarios"]))}
+            elif o["op"] == "cliente": estado["cliente"] = _cliente(o["cliente"])
+            elif o["op"] == "sedes": estado["sedes"] = _sedes(o["sedes"])
+            elif o["op"] == "agregar": estado["usuarios"] = agregar(estado["usuarios"], desde_columnas(_usuarios_columnas(o["usuarios"])))
+        aplicar(pend)
+        return estado
+
+    def descartar(self):
+        if self.existe(): os.remove(self.ruta)
+        self.reiniciar()
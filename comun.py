@@ -0,0 +1,51 @@
+import re
+import unicodedata
+from datetime import date
+
+# --- LISTAS MAESTRAS ---
+LISTAS = {
+    "TIPO_DOC": ["CC", "CE", "TI", "PA (PASAPORTE)", "PEP", "PPT"],
+    "NIVEL_EDUCATIVO": ["PRIMARIA", "SECUNDARIA", "TECNICO", "TECNOLOGO", "PROFESIONAL", "ESPECIALISTA", "MAGISTER", "DOCTORADO"],
+    "TITULO": ["MIEMBROS FUERZAS MILITARES, POLICIA", "DIRECTORES, GERENTES Y PERSONAL ADMINISTRATIVO", "FISICOS", "FISICOS MEDICOS", "MEDICOS GENERALES", "MEDICOS ESPECIALISTAS", "MEDICOS NUCLEARES", "MEDICOS RADIONCOLOGOS", "MEDICOS RADIOLOGOS", "TECNICOS Y TECNOLOGOS EN IMAGENES DIAGNOSTICAS", "TECNICOS EN TECNOLOGOS EN RADIOTERAPIA", "TECNICOS Y TECNOLOGOS EN MEDICINA NUCLEAR", "OTROS TECNICOS Y TECNOLOGOS EN SALUD", "ODONTOLOGOS", "PROFESIONALES DE ENFERMERIA", "TECNICOS Y PROFESIONALES DEL NIVEL MEDIO DE ENFERMERIA", "PARAMEDICOS E INSTRUMENTADORES QUIRURGICOS", "OTROS PROFESIONALES DE LA SALUD", "VETERINARIOS", "TECNICOS Y ASISTENTES VETERINARIOS", "PROFESIONALES DE LA INGENIERIA", "QUIMICOS Y QUIMICOS FARMACEUTICOS", "PROFESIONALES DE LAS CIENCIAS NATURALES", "PROFESIONALES DE LA PROTECCION MEDIOAMBIENTAL", "DOCENTES E INVESTIGADORES", "TECNICOS Y TECNOLOGOS EN CIENCIAS NATURALES E INGENIERIA", "TECNICOS Y CONTROLADORES EN NAVEGACION MARITIMA Y AERONAUTICA", "FUNCIONARIOS E INSPECTORES GUBERNAMENTALES", "EMPLEADOS TRANSPORTE MATERIAL RADIACTIVO", "BOMBEROS", "MINEROS", "OBREROS MINAS", "OPERADORES PORTUARIOS", "OTROS TRABAJADORES INDUSTRIALES", "OTROS TRABAJADORES NIVEL TECNICO"],
+    "OCUPACION": ["MEDICO RADIOLOGO" ,"MEDICO CARDIOLOGO", "MEDICO ONCOLOGO", "MEDICO NUCLEAR", "MEDICO CIRUJANO", "MEDICO HEMODINAMISTA", "NEUROCIRUJANO", "CIRUJANO VASCULAR", "RESIDENTE", "ORTOPEDISTA", "ANESTESIOLOGO", "INSTRUMENTADOR QUIRURGICO", "JEFE ENFERMERIA", "AUX. ENFERMERIA", "TEC. EN IMAGENES", "TRANCRIPTOR", "ODONTOLOGO", "PERIODONCISTA", "ENDODONCISTA", "AUX. ODONTOLOGIA", "HIGIENE ORAL", "ING. BIOMEDICO", "FISICO MEDICO", "DOCENCIA", "INVESTIGACION", "OTRO"],
+    "AREA": ["RADIOLOGIA", "HEMODINAMIA", "CIRUGIA", "ODONTOLOGIA", "MEDICINA NUCLEAR", "RADIOTERAPIA", "VETERINARIA", "INDUSTRIA EQUIPOS", "INDUSTRIA FUENTES", "OTRO"],
+    "COBERTURA": ["ARL","PARTICULAR"],
+    "TECNOLOGIA": ["TLD", "OSL", "DIS"],
+    "UBICACION_CORPO": ["TORAX (CUERPO ENTERO)", "CRISTALINO", "ANILLO", "FETAL", "ZONA CONTROLADA", "ZONA SUPERVISADA"],
+    "PERIODICIDAD": ["MENSUAL", "BIMENSUAL", "TRIMESTRAL"],
+    "GENERO": ["FEMENINO", "MASCULINO", "OTRO"],
+    "MESES": ["ENERO", "FEBRERO", "MARZO", "ABRIL", "MAYO", "JUNIO", "JULIO", "AGOSTO", "SEPTIEMBRE", "OCTUBRE", "NOVIEMBRE", "DICIEMBRE"]
+}
+
+CAMPOS_USUARIO = ["Nombres", "Apellidos", "Tipo Doc", "Documento", "Correo", "F. Nacimiento", "Genero", "Nivel", "Titulo", "Ocupacion", "Area", "Otra Area", "Sede", "Cobertura", "Tecnologia", "Periodicidad", "Ubicaciones", "F. Inicio"]
+
+TAM_LOTE = 5000  # filas por bloque en la carga masiva por lotes (masivo.leer_excel_por_lotes)
+
+COLUMNAS_PLANTILLA = ["Nombres", "Apellidos", "Tipo Doc", "Documento", "Correo", "F. Nacimiento (YYYY-MM-DD)", "Genero", "Nivel Educativo", "Titulo", "Ocupacion", "Area", "Otra Area", "Sede", "Cobertura", "Tecnologia", "Periodicidad", "Ubicaciones", "Mes Inicio", "Año Inicio"]
+
+# --- FUNCIONES ---
+def es_nulo(v):
+    """None, NaN, NaT o pd.NA sin importar pandas (comun/geo/bd se cargan en el primer pintado)."""
+    if v is None: return True
+    try: return bool(v != v)
+    except TypeError: return True  # pd.NA no tiene valor de verdad
+
+def limpiar_texto(texto):
+    if es_nulo(texto): return ""
+    texto = str(texto).strip().upper()
+    return ''.join(c for c in unicodedata.normalize('NFD', texto) if unicodedata.category(c) != 'Mn')
+
+def validar_email(email):
+    return re.match(r"^[\w\.-]+@[\w\.-]+\.\w+$", str(email)) is not None
+
+def separar_ubicaciones(v):
+    """'TORAX, anillo' -> ['TORAX', 'ANILLO']. Acepta también listas (multiselect)."""
+    if isinstance(v, (list, tuple)): v = ",".join(map(str, v))
+    if es_nulo(v): return []
+    return [u.strip() for u in str(v).upper().replace(';',',').split(',') if u.strip()]
+
+def unir_ubicaciones(lista): return ", ".join(lista)
+
+def get_primer_dia_mes(mes_nombre, anio):
+    try: return date(anio, LISTAS["MESES"].index(mes_nombre.upper()) + 1, 1)
+    except: return date.today().replace(day=1)
@@ -0,0 +1,290 @@
+import io
+import json
+import logging
+import os
+import smtplib
+import sqlite3
+import threading
+import time
+from email.mime.text import MIMEText
+from email.mime.multipart import MIMEMultipart
+from email.mime.application import MIMEApplication
+from email import charset
+from string import Formatter
+from trazas import tramo
+
+log = logging.getLogger("sievert.correo")
+
+# --- 📧 BANDEJA DE SALIDA ---
+# Los correos se guardan en SQLite y un hilo en segundo plano los envía reutilizando una sola
+# conexión SMTP autenticada, con reintentos (backoff exponencial) y respetando el ritmo de Gmail.
+# Varias bandejas pueden compartir la base: cada mensaje se reclama (PENDIENTE -> ENVIANDO) antes de enviarlo.
+
+RUTA_BANDEJA = "bandeja_salida.db"
+MAX_POR_MINUTO = 20
+MAX_POR_CONEXION = 50
+MAX_INTENTOS = 6
+ESPERA_BASE, ESPERA_MAX = 30, 3600
+INACTIVIDAD_CONEXION = 60
+ESPERA_CICLO_MAX = 60  # tope de la espera tras un error del ciclo (p. ej. "database is locked")
+RECLAMO_VENCE = 600  # un mensaje ENVIANDO más viejo que esto es de un trabajador caído: vuelve a PENDIENTE
+DIR_ADJUNTOS = ".adjuntos"  # adjuntos de un solo mensaje (nóminas): no se cachean y se borran al enviarse
+
+# HTML en quoted-printable: para texto casi ASCII pesa ~1x en vez de ~1.33x de base64
+UTF8_QP = charset.Charset('utf-8'); UTF8_QP.body_encoding = charset.QP
+
+# --- ADJUNTOS PRECODIFICADOS ---
+_ADJUNTOS, _lock_adjuntos = {}, threading.Lock()
+
+def recomprimir_imagen(datos, lado_max=1600, calidad=80):
+    """JPEG reducido/recomprimido con Pillow; None si Pillow no está o no se gana tamaño."""
+    try: from PIL import Image
+    except ImportError: return None
+    try:
+        im = Image.open(io.BytesIO(datos)); im.thumbnail((lado_max, lado_max))
+        buf = io.BytesIO(); im.convert("RGB").save(buf, "JPEG", quality=calidad, optimize=True, progressive=True)
+        return buf.getvalue() if buf.tell() < len(datos) else None
+    except Exception as e: log.warning("No se pudo recomprimir: %s", e); return None
+
+def es_temporal(nombre_archivo):
+    return os.path.abspath(nombre_archivo).startswith(os.path.abspath(DIR_ADJUNTOS) + os.sep)
+
+def _parte(nombre_archivo, optimizar=False):
+    if not os.path.exists(nombre_archivo): log.warning("Archivo no encontrado: %s", nombre_archivo); return None
+    with open(nombre_archivo, "rb") as f: datos = f.read()
+    if optimizar and nombre_archivo.lower().endswith((".jpg", ".jpeg", ".png")): datos = recomprimir_imagen(datos) or datos
+    nombre = os.path.basename(nombre_archivo)
+    part = MIMEApplication(datos, Name=nombre)
+    part['Content-Disposition'] = f'attachment; filename="{nombre}"'
+    return part
+
+def adjunto_preparado(nombre_archivo, optimizar=False):
+    """Parte MIME leída y codificada en base64 una sola vez por proceso; se reutiliza en cada mensaje.
+    Los de DIR_ADJUNTOS son de un solo mensaje y se leen en cada envío."""
+    if es_temporal(nombre_archivo): return _parte(nombre_archivo)
+    clave = (nombre_archivo, optimizar)
+    with _lock_adjuntos:
+        if clave not in _ADJUNTOS:
+            part = _parte(nombre_archivo, optimizar)
+            if part is None: return None
+            _ADJUNTOS[clave] = part
+        return _ADJUNTOS[clave]
+
+def borrar_temporales(archivos_adjuntos):
+    for a in archivos_adjuntos or []:
+        if not es_temporal(a): continue
+        try: os.remove(a); os.rmdir(os.path.dirname(a))  # cada nómina va en su propia subcarpeta
+        except OSError: pass
+
+def construir_mensaje(remitente, destinatario, asunto, cuerpo_html, archivos_adjuntos=(), optimizar=False):
+    msg = MIMEMultipart()
+    msg['From'] = f"Sievert Dosimetría <{remitente}>"
+    msg['To'] = destinatario
+    msg['Subject'] = asunto
+    msg.attach(MIMEText(cuerpo_html, 'html', UTF8_QP))
+    for nombre_archivo in archivos_adjuntos or []:
+        try:
+            part = adjunto_preparado(nombre_archivo, optimizar)
+            if part is not None: msg.attach(part)
+        except Exception as e: log.warning("Error adjuntando %s: %s", nombre_archivo, e)
+    return msg
+
+# --- PLANTILLAS ---
+# Se analizan una sola vez; renderizar es unir los tramos fijos con los valores del cliente.
+class PlantillaHTML:
+    def __init__(self, texto):
+        self.tramos = [(lit, campo) for lit, campo, _, _ in Formatter().parse(texto)]
+
+    def render(self, **valores):
+        return "".join(lit + (str(valores[c]) if c is not None else "") for lit, c in self.tramos)
+
+HTML_INTERNO = PlantillaHTML("""
+    <div style="font-family: Arial; color: #333;">
+        <h2 style="color: #d9534f;">⚠️ ACCIÓN REQUERIDA: Creación nuevo cliente</h2>
+        <p>Pendiente de validación en plataforma.</p>
+        <ul>
+            <li><b>Cliente:</b> {razon_social}</li>
+            <li><b>NIT:</b> {nit}</li>
+            <li><b>Servicios:</b> {n_usuarios}</li>
+            <li><b>Sedes:</b> {n_sedes}</li>
+        </ul>
+    </div>
+    """)
+
+HTML_BIENVENIDA = PlantillaHTML("""
+        <div style="font-family: 'Helvetica Neue', Helvetica, Arial, sans-serif; color: #333; line-height: 1.6; max-width: 600px; margin: 0 auto; background-color: #ffffff;">
+            <div style="background-color: #002060; padding: 25px; text-align: center; border-radius: 8px 8px 0 0;">
+                <h1 style="color: white; margin: 0; font-size: 24px;">¡Bienvenido a Sievert S.A.S!</h1>
+                <p style="color: #e0e0e0; margin: 5px 0 0; font-size: 14px;">Expertos en Protección Radiológica</p>
+            </div>
+            
+            <div style="padding: 30px; border: 1px solid #e0e0e0; border-top: none;">
+                <p style="font-size: 16px;">Hola <b>{responsable}</b>,</p>
+                <p>Es un gusto saludarte. Confirmamos que hemos recibido exitosamente la información de tu personal ({n_usuarios} usuarios) para el inicio del servicio.</p>
+
+                <div style="background-color: #f0f7ff; padding: 20px; border-radius: 8px; margin: 25px 0; border-left: 5px solid #002060;">
+                    <h3 style="color: #002060; margin-top: 0; font-size: 18px;">🔐 Tus Credenciales de Acceso</h3>
+                    <p style="margin-bottom: 15px;">Ya puedes ingresar a nuestra plataforma de gestión de dosimetría:</p>
+                    
+                    <div style="background-color: white; padding: 15px; border-radius: 6px; text-align: center; border: 1px solid #ddd;">
+                        <p style="margin: 5px; font-size: 15px;">👤 <b>Usuario:</b> <span style="font-family: monospace; font-size: 16px; color: #002060;">{nit_limpio}</span></p>
+                        <p style="margin: 5px; font-size: 15px;">🔑 <b>Contraseña:</b> <span style="font-family: monospace; font-size: 16px; color: #002060;">{nit_limpio}</span></p>
+                    </div>
+
+                    <div style="text-align: center; margin-top: 20px;">
+                        <a href="https://dosimetria.sievert.com.co/" style="background-color: #002060; color: white; padding: 12px 30px; text-decoration: none; border-radius: 50px; font-weight: bold; display: inline-block; font-size: 14px;">Ingresar al Software</a>
+                    </div>
+                </div>
+
+                <div style="background-color: #fff3cd; padding: 20px; border-radius: 8px; margin: 25px 0; border-left: 5px solid #ffc107;">
+                    <h3 style="color: #856404; margin-top: 0; font-size: 18px;">☢️ El Dosímetro de Control es Vital</h3>
+                    <p style="font-size: 14px; color: #856404; margin-bottom: 10px;">
+                        Con el envío de los dosímetros personales, recibirás un <b>Dosímetro de Control</b>. Este permite registrar la dosis no ocupacional (transporte y almacenamiento) y es indispensable para el análisis correcto.
+                    </p>
+                    <ul style="font-size: 14px; color: #856404; padding-left: 20px;">
+                        <li>📍 <b>Ubicación:</b> Guárdalo lejos del equipo de Rayos X (fuera de la sala).</li>
+                        <li>📦 <b>Devolución:</b> Envíalo de regreso junto con los dosímetros personales de cada periodo.</li>
+                        <li>🚫 <b>Uso:</b> NUNCA lo asignes a una persona.</li>
+                    </ul>
+                </div>
+
+                <div style="margin-top: 30px; padding-top: 20px; border-top: 1px solid #eee;">
+                    <h4 style="color: #002060; margin: 0 0 10px 0;">📋 Política de Devolución y Pérdida</h4>
+                    <p style="font-size: 13px; color: #666; line-height: 1.5;">
+                        La devolución oportuna de los dosímetros es necesaria para el cumplimiento normativo. Recuerda que la pérdida, daño o no devolución de los equipos genera costos de reposición. Te invitamos a revisar la <b>Política de Cartera</b> adjunta (Imagen) para más detalles.
+                    </p>
+                </div>
+                
+                <p style="margin-top: 30px; font-size: 14px; color: #555;">
+                    Cualquier inquietud técnica, estoy a tu disposición:<br>
+                    <b>Diego Orjuela</b> - Coordinador Técnico<br>
+                    <a href="mailto:diego@sievert.com.co" style="color: #002060;">diego@sievert.com.co</a> | +57 318 3731885
+                </p>
+            </div>
+            
+            <div style="background-color: #f8f9fa; padding: 15px; text-align: center; font-size: 11px; color: #999; border-radius: 0 0 8px 8px;">
+                <p>Sievert S.A.S - Protección Radiológica<br>Medellín, Colombia | <a href="https://www.sievert.com.co" style="color: #999;">www.sievert.com.co</a></p>
+            </div>
+        </div>
+        """)
+
+class BandejaSalida:
+    def __init__(self, usuario, clave, ruta=RUTA_BANDEJA, host='smtp.gmail.com', puerto=465, ssl=True,
+                 max_por_minuto=MAX_POR_MINUTO, max_por_conexion=MAX_POR_CONEXION, max_intentos=MAX_INTENTOS, espera_base=ESPERA_BASE,
+                 optimizar_adjuntos=False):
+        self.usuario, self.clave, self.ruta, self.optimizar_adjuntos = usuario, clave, ruta, optimizar_adjuntos
+        self.host, self.puerto, self.ssl = host, puerto, ssl
+        self.intervalo = 60 / max_por_minuto
+        self.max_por_conexion, self.max_intentos, self.espera_base = max_por_conexion, max_intentos, espera_base
+        self._lock, self._despertar, self._parar = threading.Lock(), threading.Event(), threading.Event()
+        self._hilo, self._smtp, self._enviados_conexion, self._ultimo_envio, self._ultimo_uso = None, None, 0, 0.0, 0.0
+        with self._db() as db:
+            db.execute("""CREATE TABLE IF NOT EXISTS mensajes (
+                id INTEGER PRIMARY KEY AUTOINCREMENT, referencia TEXT, destinatario TEXT, asunto TEXT, html TEXT,
+                adjuntos TEXT, estado TEXT DEFAULT 'PENDIENTE', intentos INTEGER DEFAULT 0, proximo REAL DEFAULT 0,
+                error TEXT DEFAULT '', creado REAL, enviado REAL, reclamado REAL DEFAULT 0)""")
+            if "reclamado" not in {c[1] for c in db.execute("PRAGMA table_info(mensajes)")}:  # bandejas creadas antes del reclamo
+                db.execute("ALTER TABLE mensajes ADD COLUMN reclamado REAL DEFAULT 0")
+
+    def _db(self):
+        db = sqlite3.connect(self.ruta, timeout=30); db.row_factory = sqlite3.Row
+        return db
+
+    # --- API ---
+    def encolar(self, destinatario, asunto, cuerpo_html, archivos_adjuntos=(), referencia=""):
+        with self._lock, self._db() as db:
+            cur = db.execute("INSERT INTO mensajes (referencia, destinatario, asunto, html, adjuntos, creado) VALUES (?,?,?,?,?,?)",
+                             (referencia, destinatario, asunto, cuerpo_html, json.dumps(list(archivos_adjuntos or [])), time.time()))
+            mid = cur.lastrowid
+        self._despertar.set()
+        return mid
+
+    def estado(self, referencia):
+        with self._db() as db:
+            return [dict(r) for r in db.execute("SELECT id, destinatario, asunto, estado, intentos, error, enviado FROM mensajes WHERE referencia=? ORDER BY id", (referencia,))]
+
+    def precargar(self, archivos_adjuntos):
+        for a in archivos_adjuntos: adjunto_preparado(a, self.optimizar_adjuntos)
+        return self
+
+    def iniciar(self):
+        with self._lock:  # varias sesiones pueden llamarlo a la vez: un solo hilo
+            if self._hilo and self._hilo.is_alive(): return self
+            self._parar.clear()
+            self._hilo = threading.Thread(target=self._ciclo, name="bandeja-salida", daemon=True); self._hilo.start()
+        return self
+
+    def detener(self, espera=5):
+        self._parar.set(); self._despertar.set()
+        if self._hilo: self._hilo.join(espera)
+        self._cerrar()
+
+    # --- TRABAJADOR ---
+    def _pendientes(self, limite=20):
+        with self._lock, self._db() as db:
+            db.execute("UPDATE mensajes SET estado='PENDIENTE' WHERE estado='ENVIANDO' AND reclamado<?", (time.time() - RECLAMO_VENCE,))
+            return [dict(r) for r in db.execute("SELECT * FROM mensajes WHERE estado='PENDIENTE' AND proximo<=? ORDER BY id LIMIT ?", (time.time(), limite))]
+
+    def _ciclo(self):
+        """Un error de una vuelta (SQLite bloqueado, etc.) se registra y se reintenta con espera creciente:
+        el hilo no debe morir, o la cola quedaría sin enviar."""
+        fallos = 0
+        while not self._parar.is_set():
+            try:
+                lote = self._pendientes()
+                if not lote:
+                    if self._smtp and time.time() - self._ultimo_uso > INACTIVIDAD_CONEXION: self._cerrar()
+                    self._despertar.wait(1.0); self._despertar.clear(); fallos = 0; continue
+                for m in lote:
+                    if self._parar.is_set(): break
+                    self._enviar(m)
+                fallos = 0
+            except Exception:
+                fallos += 1; log.exception("bandeja de salida: error en el ciclo (intento %d)", fallos)
+                self._cerrar(); self._parar.wait(min(2 ** fallos, ESPERA_CICLO_MAX))
+
+    def _conexion(self):
+        if self._smtp and self._enviados_conexion >= self.max_por_conexion: self._cerrar()
+        if not self._smtp:
+            with tramo("smtp.conexion", host=self.host):
+                cls = smtplib.SMTP_SSL if self.ssl else smtplib.SMTP
+                self._smtp = cls(self.host, self.puerto, timeout=30)
+                self._smtp.login(self.usuario, self.clave)
+            self._enviados_conexion = 0
+        return self._smtp
+
+    def _cerrar(self):
+        if self._smtp:
+            try: self._smtp.quit()
+            except Exception: pass
+        self._smtp = None
+
+    def _reclamar(self, m):
+        """Marca el mensaje ENVIANDO solo si sigue como se leyó (PENDIENTE, mismo intento): True si esta bandeja lo ganó."""
+        with self._lock, self._db() as db:
+            cur = db.execute("UPDATE mensajes SET estado='ENVIANDO', reclamado=? WHERE id=? AND estado='PENDIENTE' AND intentos=?",
+                             (time.time(), m["id"], m["intentos"]))
+            return cur.rowcount == 1
+
+    def _enviar(self, m):
+        espera = self._ultimo_envio + self.intervalo - time.time()
+        if espera > 0: self._parar.wait(espera)
+        if not self._reclamar(m): return  # otra bandeja sobre la misma base ya lo tomó
+        adjuntos = json.loads(m["adjuntos"] or "[]")
+        try:
+            with tramo("smtp.envio", referencia=m["referencia"], intento=m["intentos"] + 1) as t:
+                texto = construir_mensaje(self.usuario, m["destinatario"], m["asunto"], m["html"], adjuntos, self.optimizar_adjuntos).as_string()
+                t["bytes"] = len(texto)
+                self._conexion().sendmail(self.usuario, m["destinatario"], texto)
+            self._enviados_conexion += 1; self._ultimo_envio = self._ultimo_uso = time.time()
+            with self._lock, self._db() as db:
+                db.execute("UPDATE mensajes SET estado='ENVIADO', intentos=intentos+1, error='', enviado=? WHERE id=?", (time.time(), m["id"]))
+            borrar_temporales(adjuntos)
+        except Exception as e:
+            self._cerrar()  # la conexión puede haber quedado inválida
+            n = m["intentos"] + 1
+            estado = "FALLIDO" if n >= self.max_intentos else "PENDIENTE"
+            proximo = time.time() + min(self.espera_base * 2 ** (n - 1), ESPERA_MAX)
+            with self._lock, self._db() as db:
+                db.execute("UPDATE mensajes SET estado=?, intentos=?, proximo=?, error=? WHERE id=?", (estado, n, proximo, f"Error SMTP: {str(e)}", m["id"]))
+            if estado == "FALLIDO": borrar_temporales(adjuntos)  # ya no se reintenta: la nómina temporal no se vuelve a leer
@@ -0,0 +1,71 @@
+import re
+import pandas as pd
+from comun import limpiar_texto, separar_ubicaciones, unir_ubicaciones
+from validacion import COLUMNAS_REPORTE
+
+# --- DUPLICADOS ---
+# Índice hash de (Documento, Sede, Ubicación) sobre la tabla en sesión y sobre lo ya guardado
+# en la BD para el NIT. Cada lote nuevo se revisa en O(1) por ubicación; el índice solo se
+# reconstruye si la tabla cambió por otra vía (editor, borrador).
+
+def _doc(v): return re.sub(r"[^0-9A-Z]", "", limpiar_texto(v))  # "1.234.567" == "1234567"
+
+def llaves(doc, sede, ubicaciones):
+    d = _doc(doc)
+    return [(d, limpiar_texto(sede), u) for u in separar_ubicaciones(ubicaciones)] if d else []  # sin documento no hay llave
+
+class IndiceDuplicados:
+    def __init__(self):
+        self.llaves = set()  # llaves de la tabla en sesión
+        self.bd, self.nit = set(), None  # llaves ya registradas para self.nit
+        self.tabla = None  # DataFrame que refleja self.llaves
+
+    def sincronizar(self, df):
+        if df is not self.tabla:
+            self.llaves = {k for d, s, u in zip(df["Documento"], df["Sede"], df["Ubicaciones"]) for k in llaves(d, s, u)}
+            self.tabla = df
+        return self
+
+    def cargar_bd(self, nit, consulta):
+        """consulta() -> [(documento, sede, ubicación)]; se ejecuta una vez por NIT."""
+        if nit and nit != self.nit:
+            self.bd = {k for d, s, u in consulta() for k in llaves(d, s, u)}; self.nit = nit
+        return self
+
+    def _aviso(self, r, u, k):
+        donde = "ya está registrado para este NIT" if k in self.bd else "ya está en la tabla"
+        return f"Duplicado: documento {r.get('Documento')} en '{r.get('Sede')}' ({u}) {donde}."
+
+    def revisar(self, registros):
+        """Avisos de duplicado sin modificar el índice (formulario manual)."""
+        vistos, avisos = set(), []
+        for r in registros:
+            for k in llaves(r.get("Documento"), r.get("Sede"), r.get("Ubicaciones")):
+                if k in self.llaves or k in self.bd or k in vistos: avisos.append(self._aviso(r, k[2], k))
+                vistos.add(k)
+        return avisos
+
+    def filtrar(self, registros):
+        """Quita las ubicaciones repetidas (contra la tabla, la BD o el mismo lote) y registra las nuevas.
+        Retorna (registros, avisos)."""
+        out, avisos = [], []
+        for r in registros:
+            d = _doc(r.get("Documento"))
+            if not d: out.append(r); continue
+            s, nuevas = limpiar_texto(r.get("Sede")), []
+            for u in separar_ubicaciones(r.get("Ubicaciones")):
+                k = (d, s, u)
+                if k in self.llaves or k in self.bd: avisos.append(self._aviso(r, u, k))
+                else: self.llaves.add(k); nuevas.append(u)
+            if nuevas: out.append(dict(r, Ubicaciones=unir_ubicaciones(nuevas)))
+        return out, avisos
+
+    def reporte(self, df):
+        """Filas de la tabla con ubicaciones repetidas o ya registradas, en el formato de ValidadorUsuarios."""
+        primera, filas = {}, []
+        for i, (d, s, u) in enumerate(zip(df["Documento"], df["Sede"], df["Ubicaciones"]), 1):
+            for k in llaves(d, s, u):
+                if k in self.bd: filas.append((i, "Documento", f"Duplicado: ya registrado para este NIT ({k[2]})"))
+                elif k in primera: filas.append((i, "Documento", f"Duplicado de la fila {primera[k]} ({k[2]})"))
+                else: primera[k] = i
+        return pd.DataFrame(filas, columns=COLUMNAS_REPORTE)
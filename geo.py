@@ -0,0 +1,135 @@
+import bisect
+import csv
+import difflib
+import os
+import re
+from comun import limpiar_texto
+
+# --- ÍNDICE GEOGRÁFICO (DANE) ---
+# Se construye una vez por proceso a partir de ciudades.csv. Las llaves se normalizan
+# sin tildes ni puntuación ("Bogotá, D.C." -> "BOGOTA D C") y todas las búsquedas exactas son O(1).
+
+TOPE_MEMO = {"dep": 4096, "mun": 16384}  # búsquedas memorizadas por índice; al llenarse, esa memoria se vacía
+_FALTA = object()
+
+RESPALDO = [("11", "BOGOTA D.C.", "001", "BOGOTA D.C."), ("05", "ANTIOQUIA", "001", "MEDELLIN")]
+
+def llave(texto):
+    return " ".join(re.sub(r"[^A-Z0-9]+", " ", limpiar_texto(texto)).split())
+
+class IndiceGeo:
+    def __init__(self, filas):
+        self.muns, self.codigos, self.por_cod = {}, {}, {}
+        for cd, dep, cm, mun in filas:
+            dep, mun = str(dep).strip().upper(), str(mun).strip().upper()
+            self.muns.setdefault(dep, []).append(mun)
+            cod = f"{str(cd).zfill(2)}{str(cm).zfill(3)}" if cd and cm else None
+            self.codigos[(dep, mun)] = cod
+            if cod: self.por_cod[cod] = (dep, mun)
+        for dep in self.muns: self.muns[dep] = sorted(set(self.muns[dep]))
+        self.departamentos = sorted(self.muns)
+        self._dep = {llave(d): d for d in self.departamentos}
+        self._pos_dep = {d: i for i, d in enumerate(self.departamentos)}
+        self._mun = {(d, llave(m)): m for d in self.departamentos for m in self.muns[d]}
+        self._pos_mun = {(d, m): i for d in self.departamentos for i, m in enumerate(self.muns[d])}
+        self._mun_global = {}
+        for d in self.departamentos:
+            for m in self.muns[d]: self._mun_global.setdefault(llave(m), []).append((d, m))
+        self._llaves_dep = sorted(self._dep)
+        self._llaves_mun = {d: sorted(llave(m) for m in self.muns[d]) for d in self.departamentos}
+        self._llaves_mun_global = sorted(self._mun_global)
+        self._memo = {"dep": {}, "mun": {}}  # por instancia: un lru_cache en el método se comparte entre índices y los retiene
+
+    def _memorizado(self, tipo, clave, fn, *args):
+        memo = self._memo[tipo]
+        r = memo.get(clave, _FALTA)
+        if r is _FALTA:
+            if len(memo) >= TOPE_MEMO[tipo]: memo.clear()
+            r = memo[clave] = fn(*args)
+        return r
+
+    # --- Exactas ---
+    def municipios(self, dep): return self.muns.get(dep, [])
+    def posicion_departamento(self, dep, defecto=0): return self._pos_dep.get(self.buscar_departamento(dep), defecto)
+    def posicion_municipio(self, dep, mun, defecto=0):
+        r = self.buscar_municipio(mun, dep)
+        return self._pos_mun.get(r, defecto) if r else defecto
+    def codigo(self, dep, mun): return self.codigos.get((dep, mun))
+    def desde_codigo(self, codigo): return self.por_cod.get(str(codigo).zfill(5))
+
+    # --- Prefijo y aproximadas ---
+    @staticmethod
+    def _prefijo(llaves, p, limite):
+        i = bisect.bisect_left(llaves, p); out = []
+        while i < len(llaves) and llaves[i].startswith(p) and len(out) < limite: out.append(llaves[i]); i += 1
+        return out
+
+    def sugerir_departamentos(self, texto, limite=10):
+        return [self._dep[k] for k in self._prefijo(self._llaves_dep, llave(texto), limite)]
+
+    def sugerir_municipios(self, texto, dep=None, limite=10):
+        k = llave(texto)
+        if dep in self.muns: return [self._mun[(dep, x)] for x in self._prefijo(self._llaves_mun[dep], k, limite)]
+        return [dm for x in self._prefijo(self._llaves_mun_global, k, limite) for dm in self._mun_global[x]][:limite]
+
+    def buscar_departamento(self, texto):
+        """Nombre canónico del departamento (exacto, prefijo único o aproximado) o None."""
+        return self._memorizado("dep", texto, self._buscar_departamento, texto)
+
+    def _buscar_departamento(self, texto):
+        k = llave(texto)
+        if not k: return None
+        if k in self._dep: return self._dep[k]
+        p = self._prefijo(self._llaves_dep, k, 2)
+        if len(p) == 1: return self._dep[p[0]]
+        f = difflib.get_close_matches(k, self._llaves_dep, n=1, cutoff=0.8)
+        return self._dep[f[0]] if f else None
+
+    def buscar_municipio(self, texto, dep=None):
+        """(departamento, municipio) canónicos o None. Con dep se busca solo dentro de ese departamento."""
+        return self._memorizado("mun", (texto, dep), self._buscar_municipio, texto, dep)
+
+    def _buscar_municipio(self, texto, dep):
+        k = llave(texto)
+        if not k: return None
+        dep = self.buscar_departamento(dep) if dep else None
+        if dep: llaves, mapa, exacto = self._llaves_mun[dep], lambda x: [(dep, self._mun[(dep, x)])], (dep, k) in self._mun
+        else: llaves, mapa, exacto = self._llaves_mun_global, lambda x: self._mun_global[x], k in self._mun_global
+        cand = mapa(k) if exacto else None
+        if not cand:
+            p = self._prefijo(llaves, k, 2)
+            if len(p) == 1: cand = mapa(p[0])
+        if not cand:
+            f = difflib.get_close_matches(k, llaves, n=1, cutoff=0.8)
+            cand = mapa(f[0]) if f else None
+        return cand[0] if cand and len(cand) == 1 else None
+
+    def corregir(self, dep, mun):
+        """Para formularios y cargas masivas: (dep, mun, codigo_dane) canónicos o None si no se reconoce."""
+        r = self.buscar_municipio(mun, dep) if dep else None
+        if not r and not self.buscar_departamento(dep): r = self.buscar_municipio(mun)
+        return (*r, self.codigo(*r)) if r else None
+
+    def corregir_columnas(self, deps, muns):
+        """corregir() sobre columnas completas; cada par distinto se resuelve una sola vez."""
+        memo = {}
+        return [memo[p] if p in memo else memo.setdefault(p, self.corregir(*p)) for p in zip(deps, muns)]
+
+    def corregir_registros(self, registros, dep="departamento", mun="municipio"):
+        """Reemplaza en su lugar dep/mun por los nombres canónicos; retorna los índices no reconocidos."""
+        res = self.corregir_columnas([r.get(dep, "") for r in registros], [r.get(mun, "") for r in registros])
+        for r, c in zip(registros, res):
+            if c: r[dep], r[mun] = c[0], c[1]
+        return [i for i, c in enumerate(res) if not c]
+
+def cargar_indice(archivo="ciudades.csv"):
+    if not os.path.exists(archivo): return IndiceGeo(RESPALDO)
+    for enc in ("utf-8", "latin-1"):
+        try:
+            with open(archivo, encoding=enc, newline="") as f:
+                r = csv.DictReader(f, delimiter=";")
+                if not {"Nombre Departamento", "Nombre Municipio"}.issubset(r.fieldnames or []): return IndiceGeo(RESPALDO)
+                return IndiceGeo([(x.get("Código Departamento"), x["Nombre Departamento"], x.get("Código Municipio"), x["Nombre Municipio"]) for x in r])
+        except UnicodeDecodeError: continue
+        except Exception: break
+    return IndiceGeo(RESPALDO)
@@ -0,0 +1,135 @@
+"""Importación por lotes sin Streamlit: una carpeta de libros Excel (plantilla de carga masiva) en paralelo.
+
+Cada libro X.xlsx necesita al lado su borrador X.json.gz / X.json (el que descarga la app desde ⚙️) con el
+cliente y las sedes; los usuarios del borrador, si trae, se suman a los del libro.
+
+Uso: python importar_lote.py CARPETA [--validar] [--procesos N] [--salida DIR] [--notificar] [--secrets RUTA]
+  --validar    solo lee y valida (también revisa duplicados contra la BD si hay credenciales)
+  --notificar  encola los correos en la bandeja de salida; los envía la app (o cualquier BandejaSalida iniciada sobre
+               la misma base: cada mensaje se reclama antes de enviarlo, así varias no lo duplican)
+Rutas relativas de la app (ciudades.csv, adjuntos, .envios) se resuelven en la carpeta de este archivo.
+Credenciales: SUPABASE_URL / SUPABASE_KEY (y GMAIL_USER, GMAIL_PASSWORD, EMAIL_DESTINO_INTERNO) del entorno
+o de .streamlit/secrets.toml.
+
+Se leen todas las hojas de cada libro que tengan el encabezado de la plantilla (una por sede, p. ej.).
+Deja en --salida (por defecto CARPETA/reporte) reporte.csv con una fila por libro y <libro>.errores.csv
+con los errores de lectura (con su hoja) y de validación de cada libro que los tenga.
+"""
+import argparse
+import csv
+import glob
+import os
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from bd import buscar_cliente
+from ingreso import leer_libros, indice_duplicados, validar_usuarios, notificar_ingreso, guardar_ingreso, ADJUNTO_POLITICA
+
+COLUMNAS_RESUMEN = ["archivo", "estado", "nit", "sedes", "usuarios", "registros", "errores", "avisos", "segundos", "mensaje"]
+_CTX = {}  # recursos de cada proceso del pool (cliente Supabase, bandeja, índice DANE)
+
+def leer_secretos(ruta):
+    claves = ["SUPABASE_URL", "SUPABASE_KEY", "GMAIL_USER", "GMAIL_PASSWORD", "EMAIL_DESTINO_INTERNO"]
+    sec = {}
+    if ruta and os.path.exists(ruta):
+        import tomllib
+        with open(ruta, "rb") as f: sec = tomllib.load(f)
+    return {k: os.environ.get(k, sec.get(k, "")) for k in claves}
+
+def iniciar_proceso(secretos, notificar, ruta_bandeja):
+    from geo import cargar_indice
+    _CTX["geo"] = cargar_indice("ciudades.csv")
+    _CTX["sb"] = None
+    if secretos["SUPABASE_URL"] and secretos["SUPABASE_KEY"]:
+        from supabase import create_client
+        _CTX["sb"] = create_client(secretos["SUPABASE_URL"], secretos["SUPABASE_KEY"])
+    _CTX["bandeja"] = None
+    if notificar:
+        from correo import BandejaSalida
+        _CTX["bandeja"] = BandejaSalida(secretos["GMAIL_USER"], secretos["GMAIL_PASSWORD"], ruta=ruta_bandeja)  # solo encola
+    _CTX["destino"] = secretos["EMAIL_DESTINO_INTERNO"] or secretos["GMAIL_USER"]
+
+def borrador_de(ruta):
+    base = os.path.splitext(ruta)[0]
+    for ext in (".json.gz", ".json"):
+        if os.path.exists(base + ext): return base + ext
+    return None
+
+def encolar(destinatario, asunto, html, archivos_adjuntos=(), referencia=""):
+    try: return True, f"En cola (#{_CTX['bandeja'].encolar(destinatario, asunto, html, archivos_adjuntos, referencia=referencia)})"
+    except Exception as e: return False, f"Error bandeja: {str(e)}"
+
+def procesar_archivo(ruta, solo_validar, salida):
+    """Lee, valida y (si no es solo_validar) guarda un libro. Retorna la fila del resumen."""
+    from borrador import importar
+    from tabla import agregar, n_asignaciones
+    t0, nombre = time.perf_counter(), os.path.basename(ruta)
+    res = dict.fromkeys(COLUMNAS_RESUMEN, ""); res.update(archivo=nombre, errores=0, avisos=0)
+    def fin(estado, mensaje="", errores=()):
+        if errores:
+            with open(os.path.join(salida, f"{nombre}.errores.csv"), "w", newline="", encoding="utf-8-sig") as f:
+                w = csv.writer(f); w.writerow(["Hoja", "Fila", "Columna", "Error"]); w.writerows(errores)
+        res.update(estado=estado, mensaje=mensaje, errores=len(errores), segundos=round(time.perf_counter() - t0, 2))
+        return res
+    try:
+        rb = borrador_de(ruta)
+        if not rb: return fin("FALLO", "falta el borrador con cliente y sedes (.json.gz o .json con el mismo nombre)")
+        with open(rb, "rb") as f: d = importar(f.read())
+        cliente, sedes = d["cliente"], d["sedes"]
+        _CTX["geo"].corregir_registros([cliente] + sedes)
+        res.update(nit=cliente["nit"], sedes=len(sedes))
+        us, er, _ = leer_libros([(nombre, ruta)], sedes)
+        errores = [((m[1] or "").split(" / ", 1)[-1], int(m[2]), "", m[3]) if (m := re.match(r"(?:(.*?): )?Fila (\d+): (.*)", e)) else ("", "", "", e) for e in er]
+        if us is None or (not us and er and not any(e[1] for e in errores)): return fin("FALLO", er[0] if er else "no se pudo leer", errores)
+        idx = indice_duplicados(d["usuarios"], _CTX["sb"], cliente["nit"])
+        us, avisos = idx.filtrar(us)
+        tabla = agregar(d["usuarios"], us); idx.tabla = tabla
+        res.update(usuarios=len(tabla), registros=n_asignaciones(tabla), avisos=len(avisos))
+        if not len(tabla) and avisos: return fin("ERRORES", "todo el libro ya está registrado para este NIT", [("", "", "Documento", x) for x in avisos])
+        ok, msg, rep = validar_usuarios(tabla, duplicados=idx)
+        if rep is not None: errores += [("",) + tuple(r) for r in rep.itertuples(index=False)]
+        errores += [("", "", "Documento", a) for a in avisos]
+        if er or not ok: return fin("ERRORES", msg if not ok else f"{len(er)} filas del libro con errores", errores)
+        if solo_validar: return fin("VALIDADO", "OK", errores)
+        notificar = (lambda n_sedes, n_reg: notificar_ingreso(cliente, n_sedes, n_reg, encolar, _CTX["destino"], [ADJUNTO_POLITICA], sedes=sedes, usuarios=tabla)) if _CTX["bandeja"] else None
+        existente = buscar_cliente(_CTX["sb"], cliente["nit"])  # cliente ya registrado: se reutilizan su fila y sus sedes
+        ok, msg = guardar_ingreso(_CTX["sb"], cliente, sedes, tabla, notificar=notificar, existente=existente)
+        return fin("GUARDADO" if ok else "FALLO", msg, errores)
+    except Exception as e:
+        return fin("FALLO", f"{type(e).__name__}: {e}")
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Importación por lotes de libros de carga masiva.")
+    ap.add_argument("carpeta")
+    ap.add_argument("--validar", action="store_true", help="solo leer y validar (no guarda)")
+    ap.add_argument("--procesos", type=int, default=os.cpu_count() or 2)
+    ap.add_argument("--salida")
+    ap.add_argument("--notificar", action="store_true")
+    ap.add_argument("--bandeja", default="bandeja_salida.db")
+    ap.add_argument("--secrets", help="por defecto .streamlit/secrets.toml de la app")
+    a = ap.parse_args(argv)
+    carpeta = os.path.abspath(a.carpeta); salida = os.path.abspath(a.salida or os.path.join(carpeta, "reporte"))
+    bandeja, secrets = os.path.abspath(a.bandeja), a.secrets and os.path.abspath(a.secrets)
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+    secrets = secrets or os.path.join(".streamlit", "secrets.toml")
+    libros = sorted(f for f in glob.glob(os.path.join(carpeta, "*.xlsx")) if not os.path.basename(f).startswith("~$"))
+    if not libros: print(f"Sin libros .xlsx en {carpeta}"); return 1
+    os.makedirs(salida, exist_ok=True)
+    secretos = leer_secretos(secrets)
+    if not a.validar and not (secretos["SUPABASE_URL"] and secretos["SUPABASE_KEY"]): print("Faltan SUPABASE_URL / SUPABASE_KEY (use --validar para solo validar)."); return 1
+    t0, filas = time.perf_counter(), []
+    with ProcessPoolExecutor(max_workers=max(1, min(a.procesos, len(libros))), initializer=iniciar_proceso, initargs=(secretos, a.notificar, bandeja)) as ex:
+        futs = [ex.submit(procesar_archivo, l, a.validar, salida) for l in libros]
+        for i, f in enumerate(as_completed(futs), 1):
+            r = f.result(); filas.append(r)
+            print(f"[{i}/{len(libros)}] {r['archivo']}: {r['estado']} ({r['registros'] or 0} registros, {r['errores']} errores) {r['mensaje']}")
+    filas.sort(key=lambda r: r["archivo"])
+    with open(os.path.join(salida, "reporte.csv"), "w", newline="", encoding="utf-8-sig") as f:
+        w = csv.DictWriter(f, fieldnames=COLUMNAS_RESUMEN); w.writeheader(); w.writerows(filas)
+    estados = {e: sum(r["estado"] == e for r in filas) for e in ("GUARDADO", "VALIDADO", "ERRORES", "FALLO")}
+    print(f"{len(libros)} libros en {time.perf_counter() - t0:.1f} s: " + ", ".join(f"{k} {v}" for k, v in estados.items() if v) + f". Reporte: {salida}")
+    return 0 if not (estados["ERRORES"] or estados["FALLO"]) else 2
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,135 @@
+import logging
+import os
+import re
+from concurrent.futures import BrokenExecutor
+from comun import validar_email
+from bd import guardar_reanudable, usuarios_registrados, envios_en_curso
+from trazas import tramo, registrar
+
+log_nomina = logging.getLogger("sievert.nomina")
+
+# --- FLUJO DE INGRESO (SIN UI) ---
+# Lectura del Excel, validación, guardado y notificación de un ingreso sin depender de Streamlit.
+# app.py (una sesión) e importar_lote.py (carpetas de libros) son capas encima de estas funciones.
+
+ASUNTO_BIENVENIDA = "✨ Bienvenida al servicio de dosimetría - Sievert S.A.S"
+ADJUNTO_POLITICA = "Política_Cartera.jpg"
+
+def leer_excel_masivo(file, sedes):
+    """(registros por persona, errores) de la primera hoja del libro; registros es None si no se pudo leer."""
+    import pandas as pd
+    from masivo import procesar_df_masivo
+    from tabla import compactar
+    with tramo("excel.leer", bytes=tamano_archivo(file)) as t:
+        try: df = pd.read_excel(file)
+        except Exception as e: t["error"] = f"{type(e).__name__}: {e}"; return None, [f"Error archivo: {str(e)}"]
+        t["filas"] = len(df)
+    with tramo("excel.procesar", filas=len(df)) as t:
+        us, er = procesar_df_masivo(df, sedes); t.update(registros=len(us or []), errores=len(er))
+    return (compactar(us) if us else us), er
+
+def leer_libros(archivos, sedes, ejecutor=None):
+    """Todas las hojas con el encabezado de la plantilla de todos los libros [(nombre, ruta)]; con ejecutor
+    (ProcessPoolExecutor) cada hoja va a un proceso. Retorna (registros por persona, errores, detalle por hoja);
+    con más de una hoja los errores llevan delante 'libro / hoja: '."""
+    from masivo import SIN_ENCABEZADO, hojas_libro, procesar_hoja
+    from tabla import compactar
+    if not sedes: return None, ["Cree al menos una sede."], []
+    tareas, errores, detalle = [], [], []
+    for nombre, ruta in archivos:
+        try: tareas += [(nombre, ruta, h) for h in hojas_libro(ruta)]
+        except Exception as e: errores.append(f"{nombre}: Error archivo: {str(e)}"); detalle.append({"archivo": nombre, "hoja": "", "filas": 0, "registros": 0, "errores": 1})
+    with tramo("excel.libros", archivos=len(archivos), hojas=len(tareas), bytes=sum(tamano_archivo(r) or 0 for _, r in archivos)) as t:
+        futs = [ejecutor.submit(procesar_hoja, r, h, sedes) for _, r, h in tareas] if ejecutor and len(tareas) > 1 else None
+        res = []
+        for i, (_, ruta, hoja) in enumerate(tareas):
+            try: res.append(futs[i].result() if futs else procesar_hoja(ruta, hoja, sedes))
+            except BrokenExecutor: raise  # el pool murió: quien lo creó decide (recrearlo o leer aquí)
+            except Exception as e: res.append(e)
+        varias = len(archivos) > 1 or sum(r is not None for r in res) > 1
+        us = []
+        for (nombre, _, hoja), r in zip(tareas, res):
+            if r is None: continue  # hoja sin el encabezado de la plantilla ('Listas', portadas)
+            pre = f"{nombre} / {hoja}: " if varias else ""
+            if isinstance(r, Exception):
+                errores.append(f"{pre}Error archivo: {str(r)}"); detalle.append({"archivo": nombre, "hoja": hoja, "filas": 0, "registros": 0, "errores": 1}); continue
+            registrar("excel.hoja", r["ms"], hoja=hoja, filas=r["filas"], registros=len(r["registros"]), errores=len(r["errores"]))
+            us += r["registros"]; errores += [pre + e for e in r["errores"]]
+            detalle.append({"archivo": nombre, "hoja": hoja, "filas": r["filas"], "registros": len(r["registros"]), "errores": len(r["errores"])})
+        if tareas and not detalle: errores.append(SIN_ENCABEZADO)
+        t.update(filas=sum(d["filas"] for d in detalle), registros=len(us), errores=len(errores))
+    return (compactar(us) if us else us), errores, detalle
+
+def tamano_archivo(file):
+    if isinstance(file, (str, os.PathLike)): return os.path.getsize(file)
+    return getattr(file, "size", None) or (len(file.getbuffer()) if hasattr(file, "getbuffer") else None)
+
+def indice_duplicados(usuarios, sb=None, nit=None):
+    """IndiceDuplicados sobre la tabla y, con sb y NIT, sobre lo ya guardado (una consulta en bloque)."""
+    from duplicados import IndiceDuplicados
+    idx = IndiceDuplicados().sincronizar(usuarios)
+    if sb and nit: idx.cargar_bd(nit, lambda: usuarios_registrados(sb, nit, envios_en_curso(nit)))
+    return idx
+
+def validar_usuarios(usuarios, validador=None, duplicados=None):
+    """(ok, mensaje, reporte). reporte une ValidadorUsuarios y, si se da, el de duplicados (Fila, Columna, Error)."""
+    import pandas as pd
+    from validacion import ValidadorUsuarios
+    if usuarios is None or not len(usuarios): return False, "⚠️ Tabla vacía.", None
+    validador = validador or ValidadorUsuarios()
+    with tramo("validar", filas=len(usuarios)) as t:
+        rep = validador.validar(usuarios)
+        if duplicados is not None:
+            dup = duplicados.reporte(usuarios)
+            if len(dup): rep = pd.concat([rep, dup], ignore_index=True).sort_values("Fila", kind="stable", ignore_index=True)
+        t.update(revisadas=validador.revisadas, errores=len(rep))
+    if len(rep): return False, f"⛔ {len(rep)} errores en {rep['Fila'].nunique()} filas. Corríjalos todos y vuelva a enviar.", rep
+    return True, "OK", rep
+
+def nomina_interna(cliente, sedes, usuarios):
+    """[ruta] de la nómina por sede (nomina.py) para el correo interno; [] si no se pudo escribir."""
+    from correo import DIR_ADJUNTOS
+    from nomina import escribir_nomina
+    try: return [escribir_nomina(DIR_ADJUNTOS, cliente, sedes, usuarios)]
+    except Exception: log_nomina.exception("No se pudo generar la nómina"); return []
+
+def notificar_ingreso(cliente, n_sedes, n_usuarios, enviar, destino_interno, adjuntos=(), sedes=None, usuarios=None):
+    """enviar(destinatario, asunto, html, archivos_adjuntos=..., referencia=...) -> (ok, msg). Retorna los errores.
+    Con sedes y usuarios (tabla) la alerta interna lleva adjunta la nómina por sede."""
+    from correo import HTML_INTERNO, HTML_BIENVENIDA, borrar_temporales
+    errores = []
+    def enviar_trazado(destinatario, asunto, html, **k):
+        with tramo("correo.encolar", bytes=len(html.encode()), adjuntos=len(k.get("archivos_adjuntos", ()))) as t:
+            ok, msg = enviar(destinatario, asunto, html, **k)
+            if not ok: t["error"] = msg
+        return ok, msg
+
+    # 1. Alerta Interna
+    html_interno = HTML_INTERNO.render(razon_social=cliente['razon_social'], nit=cliente['nit'], n_usuarios=n_usuarios, n_sedes=n_sedes)
+    nomina = nomina_interna(cliente, sedes or [], usuarios) if usuarios is not None else []
+    ok_int, msg_int = enviar_trazado(destino_interno, f"🔔 Ingreso: {cliente['razon_social']}", html_interno, archivos_adjuntos=nomina, referencia=cliente['nit'])
+    if not ok_int: errores.append(f"Fallo correo interno: {msg_int}"); borrar_temporales(nomina)
+
+    # 2. Bienvenida Cliente
+    if validar_email(cliente['email']):
+        # Limpieza de NIT para credenciales
+        nit_limpio = re.sub(r'\D', '', str(cliente['nit']))
+        html_cliente = HTML_BIENVENIDA.render(responsable=cliente['responsable'], n_usuarios=n_usuarios, nit_limpio=nit_limpio)
+        ok_cli, msg_cli = enviar_trazado(cliente['email'], ASUNTO_BIENVENIDA, html_cliente, archivos_adjuntos=list(adjuntos), referencia=cliente['nit'])
+        if not ok_cli: errores.append(f"Fallo correo cliente: {msg_cli}")
+
+    return errores
+
+def guardar_ingreso(sb, cliente, sedes, usuarios, notificar=None, existente=None):
+    """Guarda con guardar_reanudable; notificar(n_sedes, n_registros) -> errores. Retorna (ok, mensaje).
+    existente: ids del cliente ya registrado (bd.buscar_cliente) para no insertarlo otra vez."""
+    if not sb: return False, "Sin conexión a BD."
+    from tabla import a_registros, n_asignaciones
+    try:
+        n_reg = n_asignaciones(usuarios); usuarios = a_registros(usuarios)
+        # Reanudable: si un lote falla, el reintento solo envía lo pendiente (cliente/sedes no se duplican)
+        with tramo("guardar", sedes=len(sedes), filas=n_reg):
+            lista_errores = guardar_reanudable(sb, cliente, sedes, usuarios, notificar=(lambda: notificar(len(sedes), n_reg)) if notificar else None, existente=existente)
+        if lista_errores: return True, f"Datos guardados, pero hubo errores de correo: {'; '.join(lista_errores)}"
+        return True, "OK"
+    except Exception as e: return False, f"{str(e)} (puede reintentar: solo se enviará lo pendiente)"
@@ -0,0 +1,147 @@
+import time
+import numpy as np
+import pandas as pd
+import openpyxl
+from comun import CAMPOS_USUARIO, TAM_LOTE, limpiar_texto, get_primer_dia_mes, separar_ubicaciones, unir_ubicaciones
+from validacion import requiere_otra_area
+from trazas import tramo
+
+# Motor de carga masiva por columnas: mismas reglas y mensajes que el recorrido fila a fila
+# (df.iterrows), pero cada regla se evalúa una sola vez por valor distinto de la columna
+# y los resultados se reparten con índices de numpy.
+
+MSG_ERROR = {1: "Falta 'Otra Area'", 2: "Falta Nombre/Apellido", 3: "Falta Documento", 5: "Falta Ubicación"}
+
+def por_valor(valores, fn):
+    """Aplica fn una vez por valor distinto y devuelve un arreglo alineado con valores."""
+    codigos, unicos = pd.factorize(valores, use_na_sentinel=False)
+    res = np.empty(len(unicos), dtype=object)
+    for i, u in enumerate(unicos): res[i] = fn(u)
+    return res[codigos]
+
+def _anio(v):
+    # Excel entrega 2025.0 cuando la columna tiene celdas vacías
+    return int(v) if isinstance(v, float) and v.is_integer() else v
+
+def _fecha_inicio(par): return str(get_primer_dia_mes(par[0], _anio(par[1])))
+
+def procesar_df_masivo(df, sedes):
+    """Retorna (registros, errores) con el mismo formato que procesar_excel_masivo.
+    Un registro por persona: sus ubicaciones quedan juntas en 'Ubicaciones' ("TORAX, ANILLO")."""
+    df = df.rename(columns=lambda c: str(c).strip())
+    sm = {limpiar_texto(s["nombre"]): s["nombre"] for s in sedes}
+    if not sm: return None, ["Cree al menos una sede."]
+    n = len(df)
+    if not n: return [], []
+    col = lambda c: df[c] if c in df.columns else pd.Series([None] * n, index=df.index, dtype=object)
+    limpio = lambda c: por_valor(col(c), limpiar_texto)
+    crudo = lambda c, fn=str: por_valor(col(c), fn)
+
+    nm, ap = limpio("Nombres"), limpio("Apellidos")
+    dc = crudo("Documento", lambda v: str(v).split('.')[0])
+    rs = crudo("Sede", lambda v: sm.get(limpiar_texto(v)))
+    ar, oa = limpio("Area"), limpio("Otra Area")
+    ub = crudo("Ubicaciones", lambda v: str(v).upper())
+
+    # Código del primer error por fila, en el mismo orden de verificación que el recorrido original
+    cod = np.select([
+        requiere_otra_area(ar, oa),
+        (nm == "") | (ap == ""),
+        (dc == "") | (dc == "nan"),
+        pd.isna(rs),
+        np.isin(ub, ["NAN", "NONE", ""]),
+    ], [1, 2, 3, 4, 5], 0)
+    filas, sede_raw = np.asarray(df.index) + 2, col("Sede").to_numpy(dtype=object)
+    err = [f"Fila {filas[i]}: Sede '{sede_raw[i]}' no existe." if cod[i] == 4 else f"Fila {filas[i]}: {MSG_ERROR[cod[i]]}" for i in np.flatnonzero(cod)]
+
+    idx = np.flatnonzero(cod == 0)
+    if not len(idx): return [], err
+    mes = limpio("Mes Inicio"); pares = np.empty(n, dtype=object); pares[:] = list(zip(mes, col("Año Inicio").to_numpy(dtype=object)))
+    partes = crudo("Ubicaciones", separar_ubicaciones)[idx]
+    rep = idx[np.fromiter((len(p) > 0 for p in partes), dtype=bool, count=len(idx))]  # ' , ' no genera registro
+    columnas = [
+        nm, ap, col("Tipo Doc").to_numpy(dtype=object), dc, crudo("Correo", lambda v: str(v).lower()),
+        crudo("F. Nacimiento (YYYY-MM-DD)", lambda v: (str(v).split() or [""])[0]),
+        crudo("Genero", lambda v: str(v).upper()), crudo("Nivel Educativo", lambda v: str(v).upper()),
+        crudo("Titulo", lambda v: str(v).upper()), crudo("Ocupacion", lambda v: str(v).upper()),
+        ar, oa, rs, crudo("Cobertura", lambda v: str(v).upper()), crudo("Tecnologia", lambda v: str(v).upper()),
+        crudo("Periodicidad", lambda v: str(v).upper()), None, por_valor(pares, _fecha_inicio),
+    ]
+    valores = [[unir_ubicaciones(p) for p in partes if p] if c is None else c[rep].tolist() for c in columnas]
+    return [dict(zip(CAMPOS_USUARIO, v)) for v in zip(*valores)], err
+
+# --- VARIOS LIBROS Y HOJAS ---
+# Cada hoja es una unidad de trabajo independiente (cabe en un proceso del pool); solo cuentan las hojas
+# con el encabezado de la plantilla, así 'Listas' (oculta) o una portada no generan errores.
+
+COLUMNAS_CLAVE = ["Nombres", "Documento", "Sede", "Ubicaciones"]
+
+SIN_ENCABEZADO = f"Ninguna hoja tiene el encabezado de la plantilla ({', '.join(COLUMNAS_CLAVE)})."
+
+def es_hoja_de_datos(columnas): return set(COLUMNAS_CLAVE) <= {str(c).strip() for c in columnas}
+
+def hojas_libro(file, solo_datos=False):
+    """Nombres de las hojas; en solo lectura openpyxl no carga su contenido (con solo_datos lee solo la primera fila
+    de cada hoja y deja las que tienen el encabezado de la plantilla)."""
+    wb = openpyxl.load_workbook(file, read_only=True)
+    try:
+        if not solo_datos: return wb.sheetnames
+        return [ws.title for ws in wb.worksheets if es_hoja_de_datos(c for c in next(ws.iter_rows(max_row=1, values_only=True), ()) if c is not None)]
+    finally: wb.close()
+
+def procesar_hoja(ruta, hoja, sedes):
+    """Lee y procesa una hoja (se ejecuta en un proceso del pool). None si no tiene el encabezado de la plantilla."""
+    t0 = time.perf_counter()
+    df = pd.read_excel(ruta, sheet_name=hoja)  # pandas abre el libro en solo lectura: solo se parsea esta hoja
+    if not es_hoja_de_datos(df.columns): return None
+    us, er = procesar_df_masivo(df, sedes)
+    return {"registros": us, "errores": er, "filas": len(df), "ms": (time.perf_counter() - t0) * 1000}
+
+# --- LECTURA POR LOTES (ARCHIVOS GRANDES) ---
+def leer_excel_por_lotes(file, tam_lote=TAM_LOTE, hoja=None):
+    """Genera (df_lote, filas_leidas, total_estimado) con el iterador de solo lectura de openpyxl.
+    El índice de cada lote es la posición de la fila en la hoja, así los mensajes 'Fila N' coinciden con Excel.
+    Con hoja se lee esa hoja y se omite si no tiene el encabezado de la plantilla; sin hoja, la primera."""
+    wb = openpyxl.load_workbook(file, read_only=True, data_only=True)
+    try:
+        ws = wb[hoja] if hoja else wb.worksheets[0]
+        it = ws.iter_rows(values_only=True)
+        enc = next(it, None)
+        if enc is None: return
+        enc = [f"Unnamed: {i}" if c is None else str(c).strip() for i, c in enumerate(enc)]
+        if hoja and not es_hoja_de_datos(enc): return
+        total = max((ws.max_row or 1) - 1, 0)
+        lote, pos, leidas = [], [], 0
+        for leidas, fila in enumerate(it, 1):
+            if all(v is None for v in fila): continue  # filas vacías (formato sin datos) no son errores
+            lote.append(fila[:len(enc)]); pos.append(leidas - 1)
+            if len(lote) >= tam_lote:
+                yield _df_lote(lote, enc, pos), leidas, total
+                lote, pos = [], []
+        if lote: yield _df_lote(lote, enc, pos), leidas, total
+    finally: wb.close()
+
+def _df_lote(lote, enc, pos):
+    df = pd.DataFrame(lote, columns=enc, index=pos)
+    return df.where(df.notna(), np.nan)
+
+def procesar_excel_por_lotes(file, sedes, destino, tam_lote=TAM_LOTE, progreso=None, hoja=None):
+    """Procesa la hoja lote a lote agregando los registros directamente a destino (lista o tabla.AcumuladorTabla).
+    Solo un lote vive en memoria a la vez. Retorna (n_registros, errores); n_registros es None si la lectura
+    falló a mitad de hoja: lo ya agregado a destino desde esta hoja se descarta, como en la lectura completa."""
+    if not sedes: return 0, ["Cree al menos una sede."]
+    n, err, marca = 0, [], destino.marca() if hasattr(destino, "marca") else len(destino)
+    with tramo("excel.lotes", bytes=getattr(file, "size", None), hoja=hoja) as t:
+        try:
+            for df, leidas, total in leer_excel_por_lotes(file, tam_lote, hoja):
+                with tramo("excel.lote", filas=len(df)) as tl:
+                    pro, er = procesar_df_masivo(df, sedes); tl.update(registros=len(pro), errores=len(er))
+                destino.extend(pro); err.extend(er); n += len(pro)
+                del df, pro
+                if progreso: progreso(leidas, total)
+        except Exception as e:
+            t["error"] = f"{type(e).__name__}: {e}"; err = [f"Error archivo: {str(e)}"]; n = None
+            if hasattr(destino, "descartar"): destino.descartar(marca)
+            else: del destino[marca:]
+        t.update(registros=n or 0, errores=len(err))
+    return n, err
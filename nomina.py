@@ -0,0 +1,95 @@
+import csv
+import logging
+import os
+import re
+import uuid
+from comun import CAMPOS_USUARIO
+from trazas import tramo
+
+log = logging.getLogger("sievert.nomina")
+
+# --- NÓMINA ENVIADA (EQUIPO INTERNO) ---
+# Libro con la hoja 'Resumen' (cliente y sedes) y una hoja por sede con sus usuarios, escrito con el modo
+# constant_memory de xlsxwriter: cada fila va a disco al escribir la siguiente, y la tabla de la sesión se
+# recorre por tramos, así 20k usuarios no hacen una segunda copia completa en memoria ni otra lectura de la BD.
+# Si xlsxwriter no está o falla, se escribe un .csv con todas las sedes (una columna 'Sede').
+
+TAM_TRAMO = 2000
+COLUMNAS_HOJA = [c for c in CAMPOS_USUARIO if c != "Sede"]
+COLUMNAS_SEDES = [("Sede", "nombre"), ("Dirección", "direccion"), ("Municipio", "municipio"), ("Departamento", "departamento"),
+                  ("Responsable", "responsable"), ("Email", "email"), ("Teléfono", "telefono")]
+SIN_SEDE = "(sin sede)"
+
+def nombre_hoja(nombre, usados):
+    """Nombre válido para Excel (≤31 caracteres, sin []:*?/\\) y único sin distinguir mayúsculas."""
+    base = re.sub(r"[\[\]:*?/\\]", " ", str(nombre)).strip(" '")[:31] or "Sede"
+    n, i = base, 2
+    while n.lower() in usados: sufijo = f" ({i})"; n = base[:31 - len(sufijo)] + sufijo; i += 1
+    usados.add(n.lower())
+    return n
+
+def grupos_por_sede(tabla):
+    """[(sede, posiciones)] en el orden de la tabla; los usuarios sin sede van al final."""
+    if not len(tabla): return []
+    grupos = list(tabla.groupby("Sede", observed=True, sort=False).indices.items())
+    sin_sede = tabla["Sede"].isna().to_numpy().nonzero()[0]
+    return grupos + ([(SIN_SEDE, sin_sede)] if len(sin_sede) else [])
+
+def filas(tabla, posiciones, columnas, tam=TAM_TRAMO):
+    """Filas (listas, NaN -> None) de tabla.iloc[posiciones] tramo a tramo."""
+    for i in range(0, len(posiciones), tam):
+        parte = tabla.iloc[posiciones[i:i + tam]][columnas].astype(object)
+        yield from parte.where(parte.notna(), None).itertuples(index=False, name=None)
+
+def _dosimetros(tabla, posiciones):
+    from tabla import n_asignaciones
+    return n_asignaciones(tabla.iloc[posiciones][["Ubicaciones"]])
+
+def escribir_nomina(carpeta, cliente, sedes, tabla):
+    """Escribe la nómina en una subcarpeta nueva de carpeta y retorna la ruta (.xlsx, o .csv si xlsxwriter falla)."""
+    destino = os.path.join(carpeta, uuid.uuid4().hex[:12]); os.makedirs(destino, exist_ok=True)
+    nit = re.sub(r"\D", "", str(cliente.get("nit", ""))) or "cliente"
+    base = os.path.join(destino, f"Nomina_{nit}")
+    grupos = grupos_por_sede(tabla)
+    with tramo("nomina", sedes=len(grupos), filas=len(tabla)) as t:
+        try: ruta = _xlsx(base + ".xlsx", cliente, sedes, tabla, grupos); t["formato"] = "xlsx"
+        except Exception as e:
+            log.warning("Nómina en CSV (%s: %s)", type(e).__name__, e)
+            if os.path.exists(base + ".xlsx"): os.remove(base + ".xlsx")
+            ruta = _csv(base + ".csv", tabla, grupos); t["formato"] = "csv"
+        t["bytes"] = os.path.getsize(ruta)
+    return ruta
+
+def _xlsx(ruta, cliente, sedes, tabla, grupos):
+    import xlsxwriter
+    wb = xlsxwriter.Workbook(ruta, {"constant_memory": True, "tmpdir": os.path.dirname(ruta), "strings_to_formulas": False})
+    try:
+        enc, titulo = wb.add_format({"bold": True, "border": 1, "bg_color": "#DDEBF7"}), wb.add_format({"bold": True, "font_size": 14})
+        # Resumen: cliente y una fila por sede con sus usuarios y dosímetros (las sedes sin usuarios, al final)
+        ws, usados, datos = wb.add_worksheet("Resumen"), {"resumen"}, {str(s["nombre"]).strip().upper(): s for s in sedes}
+        ws.write(0, 0, cliente.get("razon_social", ""), titulo)
+        for i, (et, k) in enumerate([("NIT", "nit"), ("Responsable", "responsable"), ("Email", "email"), ("Teléfono", "telefono"),
+                                     ("Dirección", "direccion"), ("Municipio", "municipio"), ("Departamento", "departamento")], 1):
+            ws.write_row(i, 0, [et, cliente.get(k, "")])
+        r0 = 9
+        ws.write_row(r0, 0, [c for c, _ in COLUMNAS_SEDES] + ["Usuarios", "Dosímetros", "Hoja"], enc)
+        hojas = []
+        for i, (sede, pos) in enumerate(grupos, r0 + 1):
+            s = datos.pop(str(sede).strip().upper(), {}); hojas.append(nombre_hoja(sede, usados))
+            ws.write_row(i, 0, [sede] + [s.get(k, "") for _, k in COLUMNAS_SEDES[1:]] + [len(pos), _dosimetros(tabla, pos), hojas[-1]])
+        for i, s in enumerate(datos.values(), r0 + 1 + len(grupos)): ws.write_row(i, 0, [s.get(k, "") for _, k in COLUMNAS_SEDES] + [0, 0, ""])
+        ws.set_column(0, 0, 40); ws.set_column(1, len(COLUMNAS_SEDES) + 2, 18)
+        # Una hoja por sede
+        for (sede, pos), hoja in zip(grupos, hojas):
+            ws = wb.add_worksheet(hoja)
+            ws.write_row(0, 0, COLUMNAS_HOJA, enc); ws.freeze_panes(1, 0); ws.set_column(0, len(COLUMNAS_HOJA) - 1, 16)
+            ws.autofilter(0, 0, len(pos), len(COLUMNAS_HOJA) - 1)
+            for i, fila in enumerate(filas(tabla, pos, COLUMNAS_HOJA), 1): ws.write_row(i, 0, fila)
+    finally: wb.close()
+    return ruta
+
+def _csv(ruta, tabla, grupos):
+    with open(ruta, "w", newline="", encoding="utf-8-sig") as f:
+        w = csv.writer(f); w.writerow(CAMPOS_USUARIO)
+        for _, pos in grupos: w.writerows(filas(tabla, pos, CAMPOS_USUARIO))
+    return ruta
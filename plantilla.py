@@ -0,0 +1,32 @@
+import io
+from datetime import date
+import xlsxwriter
+from comun import LISTAS, COLUMNAS_PLANTILLA
+
+# --- PLANTILLA EXCEL ---
+# Las validaciones cubren hasta la última fila de Excel: en el archivo es un solo rango
+# (no crece el tamaño) y las nóminas grandes no se quedan sin listas desplegables.
+
+MAX_FILAS_EXCEL = 1048575
+
+def construir_plantilla(nombres_sedes, listas=LISTAS, filas=MAX_FILAS_EXCEL, hoy=None):
+    """Retorna los bytes del .xlsx con hoja 'Plantilla' y listas de validación en la hoja oculta 'Listas'."""
+    hoy = hoy or date.today()
+    buffer = io.BytesIO()
+    wb = xlsxwriter.Workbook(buffer, {'in_memory': True})
+    ws = wb.add_worksheet('Plantilla'); wr = wb.add_worksheet('Listas')
+    enc = wb.add_format({'bold': True, 'border': 1, 'align': 'center', 'valign': 'top'})
+    for i, c in enumerate(COLUMNAS_PLANTILLA): ws.write(0, i, c, enc)
+    sn = list(nombres_sedes) or ["Sin Sedes"]
+
+    cf = [(2,"D",listas["TIPO_DOC"]),(6,"G",listas["GENERO"]),(7,"N",listas["NIVEL_EDUCATIVO"]),(8,"T",listas["TITULO"]),(9,"O",listas["OCUPACION"]),(10,"A",listas["AREA"]),(12,"S",sn),(13,"L_COB",listas["COBERTURA"]),(14,"TE",listas["TECNOLOGIA"]),(15,"P",listas["PERIODICIDAD"]),(17,"M",listas["MESES"])]
+
+    for i, (ci, n, d) in enumerate(cf):
+        wr.write(0, i, n); wr.write_column(1, i, d)
+        l = chr(ord('A')+i); wb.define_name(n, f'=Listas!${l}$2:${l}${len(d)+1}')
+        ws.data_validation(1, ci, filas, ci, {'validate':'list','source':f'={n}'})
+    ws.data_validation(1, 5, filas, 5, {'validate':'date','criteria':'between','minimum':date(1930,1,1),'maximum':hoy})
+    ws.write_comment('Q1', "Puede poner varias separadas por comas. Ej: TORAX, ANILLO")
+    wr.hide(); ws.set_column('A:S', 20)
+    wb.close()
+    return buffer.getvalue()
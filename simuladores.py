@@ -0,0 +1,148 @@
+import re
+import socketserver
+import threading
+import time
+from types import SimpleNamespace
+
+# --- SUPABASE SIMULADO ---
+# Cliente en memoria con la misma forma de uso que supabase-py (table().insert()/update()/upsert().execute() y
+# table().select().eq()/in_()/order()/limit()/range().execute()) para medir latencia y orden de llamadas sin red.
+# select("*,sedes(id,nombre)") embebe las filas hijas por su llave <tabla en singular>_id, como PostgREST.
+
+class SupabaseSimulado:
+    def __init__(self, latencia=0.0, fallar_en=None):
+        self.latencia = latencia
+        self.fallar_en = fallar_en or {}  # {tabla: {n° de llamada (1..)}} para simular caídas
+        self.tablas = {}
+        self.llamadas = []  # (tabla, operacion, n_filas, inicio, fin)
+        self._lock = threading.Lock()
+        self._ids = {}
+
+    def table(self, nombre): return _Consulta(self, nombre)
+
+    def _insertar(self, tabla, filas):
+        inicio = time.perf_counter()
+        if self.latencia: time.sleep(self.latencia)
+        with self._lock:
+            n = sum(1 for l in self.llamadas if l[0] == tabla) + 1
+            if n in self.fallar_en.get(tabla, ()):
+                self.llamadas.append((tabla, "error", len(filas), inicio, time.perf_counter()))
+                raise ConnectionError(f"Fallo simulado en {tabla} (llamada {n})")
+            out = []
+            for f in filas:
+                self._ids[tabla] = self._ids.get(tabla, 0) + 1
+                out.append({**f, "id": self._ids[tabla]})
+            self.tablas.setdefault(tabla, []).extend(out)
+            self.llamadas.append((tabla, "insert", len(filas), inicio, time.perf_counter()))
+        return out
+
+    def _actualizar(self, tabla, datos, filtros=None, upsert=False):
+        """update (datos: dict, filas que cumplen filtros) o upsert (datos: lista con 'id')."""
+        inicio = time.perf_counter()
+        if self.latencia: time.sleep(self.latencia)
+        with self._lock:
+            filas, out = self.tablas.setdefault(tabla, []), []
+            if upsert:
+                por_id = {f["id"]: f for f in filas}
+                for d in datos:
+                    if d["id"] in por_id: por_id[d["id"]].update(d); out.append(dict(por_id[d["id"]]))
+                    else: filas.append(dict(d)); out.append(dict(d))
+            else:
+                for f in filas:
+                    if all(fn(f.get(c)) for c, fn in filtros): f.update(datos); out.append(dict(f))
+            self.llamadas.append((tabla, "upsert" if upsert else "update", len(out), inicio, time.perf_counter()))
+        return out
+
+    def _consultar(self, tabla, columnas, filtros, rango, orden=None, embebidas=()):
+        inicio = time.perf_counter()
+        if self.latencia: time.sleep(self.latencia)
+        with self._lock:
+            filas = [f for f in self.tablas.get(tabla, []) if all(fn(f.get(c)) for c, fn in filtros)]
+            if orden: filas.sort(key=lambda f: f.get(orden[0]), reverse=orden[1])
+            if rango: filas = filas[rango[0]:rango[1] + 1]
+            out = [{c: f.get(c) for c in columnas} if columnas else dict(f) for f in filas]
+            llave = tabla[:-1] + "_id"  # clientes -> cliente_id
+            for hija, cols in embebidas:
+                for f, o in zip(filas, out):
+                    o[hija] = [{c: h.get(c) for c in cols} if cols else dict(h) for h in self.tablas.get(hija, []) if h.get(llave) == f.get("id")]
+            self.llamadas.append((tabla, "select", len(out), inicio, time.perf_counter()))
+        return out
+
+class _Consulta:
+    def __init__(self, sb, tabla): self.sb, self.tabla, self._op, self._filtros, self._rango, self._orden, self._embebidas = sb, tabla, None, [], None, None, []
+
+    def insert(self, data):
+        self._op = ("insert", data if isinstance(data, list) else [data]); return self
+
+    def update(self, data): self._op = ("update", data); return self
+    def upsert(self, data): self._op = ("upsert", data if isinstance(data, list) else [data]); return self
+
+    def select(self, columnas="*"):
+        cols = []
+        for nombre, sub, col in re.findall(r"(\w+)\(([^)]*)\)|([\w*]+)", columnas):
+            if nombre: self._embebidas.append((nombre, [] if sub.strip() == "*" else [c.strip() for c in sub.split(",")]))
+            elif col != "*": cols.append(col)
+        self._op = ("select", [] if "*" in columnas.split(",") else cols); return self
+
+    def eq(self, columna, valor): self._filtros.append((columna, lambda v: v == valor)); return self
+    def in_(self, columna, valores): valores = set(valores); self._filtros.append((columna, lambda v: v in valores)); return self
+    def order(self, columna, desc=False): self._orden = (columna, desc); return self
+    def limit(self, n): self._rango = (0, n - 1); return self
+    def range(self, desde, hasta): self._rango = (desde, hasta); return self
+
+    def execute(self):
+        op, arg = self._op
+        if op == "insert": return SimpleNamespace(data=self.sb._insertar(self.tabla, arg))
+        if op in ("update", "upsert"): return SimpleNamespace(data=self.sb._actualizar(self.tabla, arg, self._filtros, upsert=op == "upsert"))
+        if op == "select": return SimpleNamespace(data=self.sb._consultar(self.tabla, arg, self._filtros, self._rango, self._orden, self._embebidas))
+        raise ValueError(f"Operación no soportada: {op}")
+
+# --- SMTP SIMULADO ---
+# Servidor SMTP mínimo (sin TLS) en localhost: acepta cualquier AUTH y guarda los mensajes.
+# Uso: srv = ServidorSMTPSimulado(latencia=0.05).iniciar(); BandejaSalida(..., host="127.0.0.1", puerto=srv.puerto, ssl=False)
+
+class ServidorSMTPSimulado:
+    def __init__(self, latencia=0.0, rechazar=0):
+        self.latencia, self.rechazar = latencia, rechazar  # rechazar: n° de DATA que se responden con error 451
+        self.mensajes, self.conexiones = [], 0
+        self._lock = threading.Lock()
+        srv = self
+        class Manejador(socketserver.StreamRequestHandler):
+            def handle(self): srv._sesion(self)
+        self._servidor = socketserver.ThreadingTCPServer(("127.0.0.1", 0), Manejador)
+        self._servidor.daemon_threads = True
+        self.puerto = self._servidor.server_address[1]
+
+    def iniciar(self):
+        threading.Thread(target=self._servidor.serve_forever, daemon=True).start(); return self
+
+    def detener(self): self._servidor.shutdown(); self._servidor.server_close()
+
+    def _sesion(self, h):
+        responder = lambda t: h.wfile.write((t + "\r\n").encode())
+        with self._lock: self.conexiones += 1
+        responder("220 simulado ESMTP")
+        remitente, destinos = None, []
+        while True:
+            linea = h.rfile.readline()
+            if not linea: return
+            cmd = linea.decode(errors="replace").strip(); up = cmd.upper()
+            if self.latencia: time.sleep(self.latencia)
+            if up.startswith(("EHLO", "HELO")): responder("250-simulado\r\n250 AUTH PLAIN LOGIN")
+            elif up.startswith("AUTH LOGIN"):
+                responder("334 VXNlcm5hbWU6"); h.rfile.readline(); responder("334 UGFzc3dvcmQ6"); h.rfile.readline(); responder("235 OK")
+            elif up.startswith("AUTH"): responder("235 OK")
+            elif up.startswith("MAIL FROM"): remitente, destinos = cmd[10:].strip(), []; responder("250 OK")
+            elif up.startswith("RCPT TO"): destinos.append(cmd[8:].strip()); responder("250 OK")
+            elif up == "DATA":
+                responder("354 Fin con <CRLF>.<CRLF>"); datos = []
+                while True:
+                    l = h.rfile.readline()
+                    if not l or l in (b".\r\n", b".\n"): break
+                    datos.append(l)
+                with self._lock:
+                    if self.rechazar > 0: self.rechazar -= 1; responder("451 Fallo temporal simulado"); continue
+                    self.mensajes.append({"de": remitente, "para": destinos, "datos": b"".join(datos)})
+                responder("250 OK")
+            elif up == "QUIT": responder("221 Adios"); return
+            else: responder("250 OK")
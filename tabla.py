@@ -0,0 +1,122 @@
+import pandas as pd
+from comun import LISTAS, CAMPOS_USUARIO, separar_ubicaciones, unir_ubicaciones
+
+# --- TABLA DE USUARIOS (COLUMNAR) ---
+# Los usuarios viven en un solo DataFrame con categorías para los campos de LISTAS.
+# Las ediciones del st.data_editor se aplican desde su delta (editadas / agregadas / borradas)
+# en vez de comparar la tabla completa en cada rerun.
+# Una fila por persona: sus dosímetros van juntos en 'Ubicaciones' ("TORAX (CUERPO ENTERO), ANILLO")
+# y solo se separan en una fila por ubicación al armar el payload de la BD (expandir).
+
+CATEGORICAS = {"Tipo Doc": "TIPO_DOC", "Genero": "GENERO", "Nivel": "NIVEL_EDUCATIVO", "Titulo": "TITULO", "Ocupacion": "OCUPACION",
+               "Area": "AREA", "Cobertura": "COBERTURA", "Tecnologia": "TECNOLOGIA", "Periodicidad": "PERIODICIDAD"}
+
+def _categoria(s, base):
+    """Categoría con las opciones de LISTAS primero; valores fuera de la lista se conservan como categorías extra."""
+    s = s.astype(object)
+    extra = sorted({v for v in s.dropna().unique() if v not in base}, key=str)
+    return pd.Categorical(s, categories=list(base) + extra)
+
+def tabla_vacia(): return a_tabla([])
+
+def a_tabla(registros):
+    df = registros.copy() if isinstance(registros, pd.DataFrame) else pd.DataFrame(list(registros))
+    df = df.reindex(columns=CAMPOS_USUARIO + [c for c in df.columns if c not in CAMPOS_USUARIO])
+    for c, lista in CATEGORICAS.items(): df[c] = _categoria(df[c], LISTAS[lista])
+    df["Sede"] = df["Sede"].astype("category")
+    return df.reset_index(drop=True)
+
+def concatenar(partes):
+    """Concat que une las categorías (pd.concat las convertiría a object si difieren)."""
+    partes = [p for p in partes if len(p)]
+    if not partes: return tabla_vacia()
+    if len(partes) == 1: return partes[0].reset_index(drop=True)
+    for c in list(CATEGORICAS) + ["Sede"]:
+        cats = list(dict.fromkeys(v for p in partes for v in p[c].cat.categories))
+        partes = [p.assign(**{c: p[c].cat.set_categories(cats)}) for p in partes]
+    return pd.concat(partes, ignore_index=True)
+
+def agregar(df, registros): return concatenar([df, a_tabla(registros)])
+
+def _asignar(df, filas, col, valor):
+    if col not in df.columns: return
+    if isinstance(df[col].dtype, pd.CategoricalDtype) and valor is not None and valor not in df[col].cat.categories:
+        df[col] = df[col].cat.add_categories([valor])
+    df.loc[filas, col] = valor
+
+def aplicar_cambios(df, cambios, inicio=0):
+    """Aplica el delta de st.data_editor (posiciones relativas a la página que empieza en inicio)."""
+    if not cambios: return df
+    editadas, agregadas, borradas = cambios.get("edited_rows", {}), cambios.get("added_rows", []), cambios.get("deleted_rows", [])
+    if not (editadas or agregadas or borradas): return df
+    df = df.copy()
+    for pos, campos in editadas.items():
+        for col, valor in campos.items(): _asignar(df, inicio + int(pos), col, valor)
+    if borradas: df = df.drop(index=[inicio + int(p) for p in borradas])
+    if agregadas: df = agregar(df, agregadas)
+    return df.reset_index(drop=True)
+
+def a_registros(df):
+    """Lista de dicts (formato del payload y del borrador); NaN -> None."""
+    if not isinstance(df, pd.DataFrame): return list(df)
+    return df.astype(object).where(df.notna(), None).to_dict("records")
+
+def a_columnas(df):
+    """Columnas con diccionario: {col: {"v": valores distintos, "c": códigos por fila}} (borrador y autoguardado)."""
+    out = {}
+    for c in CAMPOS_USUARIO:
+        s = df[c].astype(object).where(df[c].notna(), None) if c in df.columns else pd.Series([None] * len(df), dtype=object)
+        codigos, valores = pd.factorize(s, use_na_sentinel=False)
+        out[c] = {"v": [None if v is None or v != v else v for v in valores.tolist()], "c": codigos.tolist()}
+    return {"n": len(df), "columnas": out}
+
+def desde_columnas(d):
+    """Inverso de a_columnas; las columnas ya vienen validadas (borrador.py)."""
+    cols = {c: [x["v"][i] for i in x["c"]] for c, x in d["columnas"].items()}
+    return a_tabla(pd.DataFrame(cols, columns=list(cols)) if cols else [])
+
+# --- PERSONAS / UBICACIONES ---
+PERSONA = [c for c in CAMPOS_USUARIO if c != "Ubicaciones"]
+
+def compactar(registros):
+    """Une los registros que solo difieren en 'Ubicaciones' (borradores antiguos: una fila por ubicación).
+    Las ubicaciones repetidas se conservan para que IndiceDuplicados las reporte."""
+    personas, ubic = {}, {}
+    for r in registros:
+        k = tuple(r.get(c) for c in PERSONA)
+        if k not in personas: personas[k], ubic[k] = r, []
+        ubic[k].extend(separar_ubicaciones(r.get("Ubicaciones")))
+    return [dict(r, Ubicaciones=unir_ubicaciones(ubic[k])) for k, r in personas.items()]
+
+def expandir(registros):
+    """Una copia del registro por ubicación (forma que exige la tabla usuarios de la BD)."""
+    return [dict(r, Ubicaciones=u) for r in registros for u in separar_ubicaciones(r.get("Ubicaciones"))]
+
+def n_asignaciones(df):
+    """Dosímetros de la tabla (filas que tendrá la BD) sin expandirla."""
+    if not len(df): return 0
+    return int(sum(len(separar_ubicaciones(v)) * n for v, n in df["Ubicaciones"].value_counts(dropna=True).items()))
+
+class AcumuladorTabla:
+    """Destino para procesar_excel_por_lotes: cada lote se guarda ya en forma columnar.
+    filtro(registros) -> (registros, avisos), p. ej. IndiceDuplicados.filtrar."""
+    def __init__(self, filtro=None): self.partes, self.filtro, self.avisos = [], filtro, []
+    def extend(self, registros):
+        registros = compactar(registros)
+        if self.filtro: registros, avisos = self.filtro(registros); self.avisos.extend(avisos)
+        if registros: self.partes.append(a_tabla(registros))
+    def marca(self): return len(self.partes), len(self.avisos)
+    def descartar(self, marca):
+        """Quita lo agregado desde marca (hoja que falló a mitad de lectura)."""
+        del self.partes[marca[0]:]; del self.avisos[marca[1]:]
+    def tabla(self):
+        """Une las partes; una persona con filas en varios lotes queda en una sola fila, como con compactar sobre
+        el archivo completo (sus ubicaciones se juntan en la fila de su primera aparición)."""
+        df = concatenar(self.partes)
+        if len(self.partes) < 2: return df
+        rep = df.duplicated(PERSONA, keep=False)
+        if not rep.any(): return df
+        primeras = rep & ~df.duplicated(PERSONA, keep="first")
+        unidos = compactar(a_registros(df[rep]))  # en orden de primera aparición, igual que df[primeras]
+        df.loc[primeras, "Ubicaciones"] = [r["Ubicaciones"] for r in unidos]
+        return df[~rep | primeras].reset_index(drop=True)
@@ -0,0 +1,45 @@
+"""correo.BandejaSalida contra ServidorSMTPSimulado: varias bandejas sobre la misma base no duplican envíos.
+
+Uso: python -m pytest tests
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import pytest
+from correo import RECLAMO_VENCE, BandejaSalida
+from simuladores import ServidorSMTPSimulado
+
+@pytest.fixture
+def servidor():
+    srv = ServidorSMTPSimulado(latencia=0.02).iniciar()
+    yield srv
+    srv.detener()
+
+def bandeja(ruta, srv): return BandejaSalida("sievert@x.co", "clave", ruta=str(ruta), host="127.0.0.1", puerto=srv.puerto, ssl=False, max_por_minuto=6000)
+
+def esperar(b, n, limite=30):
+    t0 = time.time()
+    while time.time() - t0 < limite:
+        if sum(m["estado"] == "ENVIADO" for m in b.estado("t")) == n: return True
+        time.sleep(0.1)
+    return False
+
+def test_dos_bandejas_envian_cada_mensaje_una_vez(tmp_path, servidor):
+    a, b = bandeja(tmp_path / "b.db", servidor), bandeja(tmp_path / "b.db", servidor)
+    for i in range(12): a.encolar(f"d{i}@x.co", f"Asunto {i}", "<p>Hola</p>", referencia="t")
+    a.iniciar(); b.iniciar()
+    try: assert esperar(a, 12)
+    finally: a.detener(); b.detener()
+    time.sleep(0.2)
+    assert len(servidor.mensajes) == 12
+    assert sorted(m["para"][0] for m in servidor.mensajes) == sorted(f"<d{i}@x.co>" for i in range(12))
+
+def test_reclamo_vencido_vuelve_a_pendiente(tmp_path, servidor):
+    b = bandeja(tmp_path / "b.db", servidor)
+    b.encolar("d@x.co", "Asunto", "<p>Hola</p>", referencia="t")
+    m = b._pendientes()[0]
+    assert b._reclamar(m) and not b._reclamar(m) and b._pendientes() == []  # ENVIANDO: nadie más lo toma
+    with b._db() as db: db.execute("UPDATE mensajes SET reclamado=?", (time.time() - RECLAMO_VENCE - 1,))
+    assert [p["id"] for p in b._pendientes()] == [m["id"]]  # la bandeja que lo tomó se cayó
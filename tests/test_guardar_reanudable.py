@@ -0,0 +1,95 @@
+"""bd.guardar_reanudable contra SupabaseSimulado: reanudación tras una caída, exclusiones de envios_en_curso y doble clic.
+
+Uso: python -m pytest tests
+"""
+import os
+import sys
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ); sys.path.insert(0, os.path.join(RAIZ, "benchmarks"))
+import pytest
+import bd
+from bd import PuntoControl, buscar_cliente, clave_idempotencia, envios_en_curso, guardar_reanudable, payload_usuarios, usuarios_registrados
+from simuladores import SupabaseSimulado
+from sinteticos import generar_cliente, generar_sedes, generar_tabla
+from tabla import a_registros
+
+TAM_LOTE = 40
+
+def datos(m=120, n_sedes=2, semilla=0):
+    sedes = generar_sedes(n_sedes, semilla)
+    return generar_cliente(semilla), sedes, a_registros(generar_tabla(m, sedes, semilla))
+
+def punto(directorio, cliente, sedes, usuarios):
+    pc = PuntoControl(clave_idempotencia(cliente, sedes, usuarios), str(directorio))
+    if pc.get("tam_lote") is None and not pc.get("completo"): pc.marcar(tam_lote=TAM_LOTE)  # lotes chicos: varios lotes con pocos usuarios
+    return pc
+
+def inserts(sb, tabla="usuarios"): return [l for l in sb.llamadas if l[0] == tabla and l[1] == "insert"]
+
+def test_reanuda_solo_los_lotes_que_faltan(tmp_path):
+    cliente, sedes, usuarios = datos()
+    sb = SupabaseSimulado(fallar_en={"usuarios": {3}})
+    with pytest.raises(ConnectionError): guardar_reanudable(sb, cliente, sedes, usuarios, hilos=1, pc=punto(tmp_path, cliente, sedes, usuarios))
+    pc = punto(tmp_path, cliente, sedes, usuarios)  # otro proceso: se relee del disco
+    n_lotes = len(bd.partir_lotes(payload_usuarios(usuarios, pc.get("sedes")), TAM_LOTE))
+    assert n_lotes > 3
+    assert sorted(pc.get("lotes")) == [i for i in range(n_lotes) if i != 2]
+
+    sb.fallar_en, antes = {}, len(inserts(sb))
+    assert guardar_reanudable(sb, cliente, sedes, usuarios, hilos=1, pc=pc) == []
+    assert len(inserts(sb)) - antes == 1  # solo el lote caído
+    assert len(inserts(sb, "clientes")) == 1 and len(inserts(sb, "sedes")) == 1
+    filas = payload_usuarios(usuarios, pc.get("sedes"))
+    assert sorted(map(str, ((f["documento"], f["sede_id"], f["ubicaciones"]) for f in sb.tablas["usuarios"]))) == \
+           sorted(map(str, ((f["documento"], f["sede_id"], f["ubicaciones"]) for f in filas)))
+    assert not os.path.exists(pc.ruta) and os.path.exists(pc.marca)
+
+def test_cliente_existente_excluye_solo_lo_de_su_envio(tmp_path):
+    cliente, sedes, usuarios = datos()
+    sb = SupabaseSimulado()
+    guardar_reanudable(sb, cliente, sedes, usuarios, pc=punto(tmp_path, cliente, sedes, usuarios))
+    nit = cliente["nit"]
+    previos = usuarios_registrados(sb, nit, envios_en_curso(nit, str(tmp_path)))
+    assert len(previos) == len(sb.tablas["usuarios"])
+
+    ex = buscar_cliente(sb, nit)
+    nueva = dict(generar_sedes(1, semilla=5)[0], nombre="SEDE NUEVA")
+    sedes2 = ex["sedes"] + [nueva]; usuarios2 = a_registros(generar_tabla(150, sedes2, semilla=7))
+    sb.fallar_en = {"usuarios": {sum(1 for l in sb.llamadas if l[0] == "usuarios") + 2}}
+    with pytest.raises(ConnectionError):
+        guardar_reanudable(sb, ex["cliente"], sedes2, usuarios2, hilos=1, pc=punto(tmp_path, ex["cliente"], sedes2, usuarios2), existente=ex)
+    en_curso = envios_en_curso(nit, str(tmp_path))
+    assert not en_curso["clientes"] and len(en_curso["sedes"]) == 1 and en_curso["usuarios"]
+    assert len(sb.tablas["usuarios"]) > len(previos)
+    assert sorted(map(str, usuarios_registrados(sb, nit, en_curso))) == sorted(map(str, previos))  # lo anterior sigue siendo duplicado
+
+    sb.fallar_en = {}
+    guardar_reanudable(sb, ex["cliente"], sedes2, usuarios2, hilos=1, pc=punto(tmp_path, ex["cliente"], sedes2, usuarios2), existente=ex)
+    assert len(inserts(sb, "clientes")) == 1 and envios_en_curso(nit, str(tmp_path)) == {"clientes": set(), "sedes": set(), "usuarios": set()}
+    assert len(usuarios_registrados(sb, nit, envios_en_curso(nit, str(tmp_path)))) == len(sb.tablas["usuarios"])
+
+def test_doble_clic_no_vuelve_a_enviar(tmp_path):
+    cliente, sedes, usuarios = datos(40)
+    sb = SupabaseSimulado()
+    guardar_reanudable(sb, cliente, sedes, usuarios, pc=punto(tmp_path, cliente, sedes, usuarios))
+    n = len(sb.llamadas)
+    assert guardar_reanudable(sb, cliente, sedes, usuarios, pc=punto(tmp_path, cliente, sedes, usuarios)) == []
+    assert len(sb.llamadas) == n
+
+    pc = punto(tmp_path, cliente, sedes, usuarios); viejo = time.time() - bd.VIGENCIA_MARCA - 1
+    os.utime(pc.marca, (viejo, viejo))
+    envios_en_curso(cliente["nit"], str(tmp_path))
+    assert not os.path.exists(pc.marca) and not PuntoControl(pc.clave, str(tmp_path)).get("completo")
+
+def test_envio_sin_terminar_vence(tmp_path):
+    cliente, sedes, usuarios = datos(40)
+    sb = SupabaseSimulado(fallar_en={"usuarios": {1}})
+    pc = punto(tmp_path, cliente, sedes, usuarios)
+    with pytest.raises(ConnectionError): guardar_reanudable(sb, cliente, sedes, usuarios, hilos=1, pc=pc)
+    assert envios_en_curso(cliente["nit"], str(tmp_path))["clientes"] == {pc.get("cliente_id")}
+    assert envios_en_curso("111", str(tmp_path))["clientes"] == set()  # solo se leen los del NIT
+    viejo = time.time() - bd.VIGENCIA_ENVIO - 1
+    os.utime(pc.ruta, (viejo, viejo))
+    assert envios_en_curso(cliente["nit"], str(tmp_path))["clientes"] == set() and not os.path.exists(pc.ruta)
@@ -0,0 +1,52 @@
+import contextvars
+import json
+import logging
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+# --- TRAZAS ---
+# Tramos cronometrados de cada fase (Excel, validación, BD, SMTP) con filas y bytes adjuntos.
+# Cada tramo sale al log "sievert.trazas" como una línea JSON y queda en un buffer acotado del proceso,
+# que resume el panel de diagnóstico de ⚙️. Los errores se anotan en el tramo y la excepción sigue su curso.
+
+log = logging.getLogger("sievert.trazas")
+SESION = contextvars.ContextVar("sesion", default="")  # la app la fija en cada rerun
+MAX_TRAZAS = 2000
+RECIENTES, _lock = deque(maxlen=MAX_TRAZAS), threading.Lock()
+
+def registrar(fase, ms, **datos):
+    t = {"ts": round(time.time(), 3), "fase": fase, "ms": round(ms, 2), "sesion": SESION.get(), **datos}
+    with _lock: RECIENTES.append(t)
+    (log.warning if "error" in t else log.info)("%s", json.dumps(t, ensure_ascii=False, default=str))
+    return t
+
+@contextmanager
+def tramo(fase, **datos):
+    """Cronometra el bloque. El bloque recibe un dict donde puede agregar datos (filas, bytes) al terminar."""
+    t0, d = time.perf_counter(), dict(datos)
+    try: yield d
+    except Exception as e: d["error"] = f"{type(e).__name__}: {e}"; raise
+    finally: registrar(fase, (time.perf_counter() - t0) * 1000, **d)
+
+def en_contexto(fn):
+    """fn atada al contexto actual (sesión) para correr en otro hilo; un contexto nuevo por llamada."""
+    ctx = contextvars.copy_context()
+    return lambda *a, **k: ctx.run(fn, *a, **k)
+
+def bytes_json(filas): return len(json.dumps(filas, separators=(",", ":"), default=str).encode())
+
+def trazas(sesion=None):
+    with _lock: return [t for t in RECIENTES if sesion is None or t["sesion"] == sesion]
+
+def resumen(lista):
+    """Por fase: n, p50/p90/máx ms, filas y bytes sumados y n° de errores."""
+    fases = {}
+    for t in lista: fases.setdefault(t["fase"], []).append(t)
+    out = []
+    for f, ts in sorted(fases.items()):
+        ms = sorted(t["ms"] for t in ts)
+        out.append({"fase": f, "n": len(ts), "p50 ms": ms[len(ms) // 2], "p90 ms": ms[min(len(ms) - 1, int(len(ms) * 0.9))], "máx ms": ms[-1],
+                    "filas": sum(t.get("filas", 0) for t in ts), "bytes": sum(t.get("bytes", 0) for t in ts), "errores": sum("error" in t for t in ts)})
+    return out
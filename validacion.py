@@ -0,0 +1,60 @@
+import numpy as np
+import pandas as pd
+from comun import validar_email
+
+# --- VALIDACIÓN DE LA TABLA DE USUARIOS ---
+# Reglas únicas para el formulario manual, la carga masiva y la tabla completa.
+# La tabla se valida por columnas y se reportan todos los errores a la vez; las filas
+# que no cambiaron desde la validación anterior se reutilizan por su hash.
+
+CAMPOS_REQUERIDOS = ["Nombres", "Apellidos", "Documento", "Correo", "Sede", "Ubicaciones"]
+CAMPOS_VALIDADOS = CAMPOS_REQUERIDOS + ["Area", "Otra Area"]
+RE_EMAIL = r"^[\w\.-]+@[\w\.-]+\.\w+$"
+COLUMNAS_REPORTE = ["Fila", "Columna", "Error"]
+
+def requiere_otra_area(area, otra_area):
+    """Área OTRO exige 'Otra Area'. Sirve con escalares o con arreglos/columnas."""
+    return (area == "OTRO") & (otra_area == "")
+
+def errores_registro(u):
+    """Errores de un registro suelto (formulario manual)."""
+    err = [f"Falta '{c}'" for c in CAMPOS_REQUERIDOS if not u.get(c) or str(u.get(c)).strip() == ""]
+    if u.get("Correo") and not validar_email(u["Correo"]): err.append("Email inválido")
+    if requiere_otra_area(u.get("Area"), u.get("Otra Area") or ""): err.append("Falta 'Otra Area'")
+    return err
+
+def _texto(s): return s.astype(object).where(s.notna(), "").map(str).str.strip()
+
+def validar_columnas(df):
+    """Errores de todas las filas de df como (posición 0..n-1, columna, mensaje)."""
+    t = {c: _texto(df[c]) if c in df.columns else pd.Series("", index=df.index, dtype=object) for c in CAMPOS_VALIDADOS}
+    partes = [(t[c] == "", c, f"Falta '{c}'") for c in CAMPOS_REQUERIDOS]
+    partes.append(((t["Correo"] != "") & ~t["Correo"].str.match(RE_EMAIL).astype(bool), "Correo", "Email inválido"))
+    partes.append((requiere_otra_area(t["Area"], t["Otra Area"]), "Otra Area", "Falta 'Otra Area'"))
+    return [(int(p), c, m) for mask, c, m in partes for p in np.flatnonzero(mask.to_numpy())]
+
+def hash_filas(df):
+    return pd.util.hash_pandas_object(df.reindex(columns=CAMPOS_VALIDADOS), index=False).to_numpy()
+
+class ValidadorUsuarios:
+    def __init__(self):
+        self._memo = {}  # hash de fila -> [(columna, mensaje)]
+        self.revisadas = 0  # filas realmente evaluadas en la última corrida
+
+    def validar(self, usuarios):
+        """Reporte DataFrame (Fila, Columna, Error) con Fila 1-based; vacío si todo está bien."""
+        df = usuarios if isinstance(usuarios, pd.DataFrame) else pd.DataFrame(list(usuarios))
+        if df.empty: self._memo = {}; return pd.DataFrame(columns=COLUMNAS_REPORTE)
+        h = hash_filas(df)
+        pend = {}
+        for i, x in enumerate(h):
+            if x not in self._memo and x not in pend: pend[x] = i  # filas idénticas se evalúan una vez
+        nuevas = np.fromiter(pend.values(), dtype=np.intp, count=len(pend))
+        self.revisadas = len(nuevas)
+        if len(nuevas):
+            memo_nuevo = {h[i]: [] for i in nuevas}
+            for p, c, m in validar_columnas(df.iloc[nuevas]): memo_nuevo[h[nuevas[p]]].append((c, m))
+            self._memo.update(memo_nuevo)
+        self._memo = {x: self._memo[x] for x in h}  # solo las filas vigentes
+        filas = [(i + 1, c, m) for i, x in enumerate(h) for c, m in self._memo[x]]
+        return pd.DataFrame(filas, columns=COLUMNAS_REPORTE)